@@ -0,0 +1,5 @@
+#!/bin/bash
+
+set -e
+source /home/molonews/molonews/venv/bin/activate
+python /home/molonews/molonews/manage.py age_articles
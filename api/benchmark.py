@@ -0,0 +1,212 @@
+from collections import Counter, namedtuple
+from datetime import datetime, timezone
+from logging import getLogger
+from random import Random
+from statistics import mean, median
+from time import perf_counter
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from content.models import AppUser, Article, EventV4
+from content.synthetic import SYNTHETIC_PREFIX
+
+logger = getLogger(__name__)
+
+# Endpoints of the app driven through the DRF test client. Paths are
+# relative to the API prefix, {article} and {event} are replaced with ids of
+# published content and every request is sent with the device id of an app
+# user, so the per-user filters and flags are part of the measurement.
+Scenario = namedtuple("Scenario", ["name", "path"])
+
+SCENARIOS = (
+    Scenario("article_feed", "articles/"),
+    Scenario("article_similar", "articles/{article}/similar/"),
+    Scenario("event_feed", "events/"),
+    Scenario("event_similar", "events/{event}/similar/"),
+    Scenario("summary", "users/summary/"),
+    Scenario("organizations", "organizations/"),
+    Scenario("article_bookmarks", "users/article-bookmarks/"),
+    Scenario("event_bookmarks", "users/event-bookmarks/"),
+)
+DEFAULT_PREFIX = "/api/v4/"
+PERCENTILES = (50, 90, 95, 99)
+POOL_SIZE = 100
+# report values compared with a baseline
+COMPARED_METRICS = ("p50_ms", "p95_ms", "queries_median", "queries_max")
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+
+def get_pools(size=POOL_SIZE):
+    """Collect the device ids and content ids the requests are built from.
+
+    Synthetic app users are preferred, see content.synthetic.
+
+    Returns:
+        dict: "device", "article" and "event" -> list
+    """
+    app_users = AppUser.objects.order_by("id")
+    synthetic = app_users.filter(device_id__startswith=SYNTHETIC_PREFIX)
+    if synthetic.exists():
+        app_users = synthetic
+    return {
+        "device": list(app_users.values_list("device_id", flat=True)[:size]),
+        "article": list(
+            Article.objects.filter(published=True, visible=True)
+            .order_by("-date")
+            .values_list("id", flat=True)[:size]
+        ),
+        "event": list(
+            EventV4.objects.filter(published=True, visible=True)
+            .order_by("-start_date")
+            .values_list("id", flat=True)[:size]
+        ),
+    }
+
+
+def run_scenario(
+    client, scenario, pools, random, iterations, warmup=0, prefix=DEFAULT_PREFIX, clear_cache=False
+):
+    """Request one endpoint repeatedly and measure latency and queries.
+
+    Args:
+        client (APIClient): client
+        scenario (Scenario): endpoint
+        pools (dict): result of get_pools
+        random (Random): picks devices and ids
+        iterations (int): measured requests
+        warmup (int): requests before the measurement
+        prefix (str): API prefix
+        clear_cache (bool): clear the cache before every request
+
+    Returns:
+        dict: latency percentiles in ms, query counts, status codes and sizes
+    """
+    latencies = []
+    queries = []
+    sizes = []
+    statuses = Counter()
+    for number in range(warmup + iterations):
+        path = prefix + scenario.path.format(
+            article=random.choice(pools["article"] or [0]),
+            event=random.choice(pools["event"] or [0]),
+        )
+        device_id = random.choice(pools["device"] or [""])
+        if clear_cache:
+            cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            started = perf_counter()
+            response = client.get(path, HTTP_X_DEVICE_ID=device_id)
+            elapsed = perf_counter() - started
+        if number < warmup:
+            continue
+        latencies.append(elapsed * 1000)
+        queries.append(len(captured))
+        sizes.append(len(response.content))
+        statuses[response.status_code] += 1
+
+    result = {"path": prefix + scenario.path, "iterations": iterations}
+    for percent in PERCENTILES:
+        result["p{}_ms".format(percent)] = round(percentile(latencies, percent), 2)
+    result.update(
+        mean_ms=round(mean(latencies), 2),
+        max_ms=round(max(latencies), 2),
+        queries_median=median(queries),
+        queries_max=max(queries),
+        bytes_median=median(sizes),
+        statuses={str(code): count for code, count in sorted(statuses.items())},
+    )
+    return result
+
+
+def run_benchmark(
+    scenario_names=None,
+    iterations=50,
+    warmup=5,
+    seed=0,
+    prefix=DEFAULT_PREFIX,
+    clear_cache=False,
+    progress=None,
+):
+    """Run the benchmark scenarios and build a machine readable report.
+
+    Args:
+        scenario_names (iterable): names of the scenarios, all if empty
+        iterations (int): measured requests per scenario
+        warmup (int): requests per scenario before the measurement
+        seed (int): seed picking devices and ids, the same seed sends the same requests
+        prefix (str): API prefix
+        clear_cache (bool): clear the cache before every request
+        progress (callable): called with the name and result of each scenario
+
+    Returns:
+        dict: report
+    """
+    scenarios = [
+        scenario
+        for scenario in SCENARIOS
+        if not scenario_names or scenario.name in scenario_names
+    ]
+    pools = get_pools()
+    client = APIClient()
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "settings": {
+            "iterations": iterations,
+            "warmup": warmup,
+            "seed": seed,
+            "prefix": prefix,
+            "clear_cache": clear_cache,
+        },
+        "database": {
+            "articles": Article.objects.count(),
+            "events": EventV4.objects.count(),
+            "appusers": AppUser.objects.count(),
+        },
+        "scenarios": {},
+    }
+    for scenario in scenarios:
+        # every scenario gets its own sequence, so selecting scenarios
+        # doesn't change the requests of the others
+        random = Random("{}:{}".format(seed, scenario.name))
+        result = run_scenario(
+            client, scenario, pools, random, iterations, warmup, prefix, clear_cache
+        )
+        report["scenarios"][scenario.name] = result
+        if progress is not None:
+            progress(scenario.name, result)
+    logger.info("benchmark finished %s", report["settings"])
+    return report
+
+
+def compare_reports(baseline, report):
+    """Compare a report with a baseline report.
+
+    Args:
+        baseline (dict): earlier report
+        report (dict): current report
+
+    Returns:
+        list: (scenario, metric, before, after, change in percent or None)
+    """
+    rows = []
+    for name, result in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        for metric in COMPARED_METRICS:
+            if metric not in before:
+                continue
+            change = None
+            if before[metric]:
+                change = round((result[metric] - before[metric]) * 100 / before[metric], 1)
+            rows.append((name, metric, before[metric], result[metric], change))
+    return rows
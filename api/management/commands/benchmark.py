@@ -0,0 +1,69 @@
+import json
+from logging import getLogger
+
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api.benchmark import DEFAULT_PREFIX, SCENARIOS, compare_reports, run_benchmark
+
+logger = getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures latency and SQL queries of the feed, similar, summary, organization and "
+        "bookmark endpoints, see generate_synthetic_content for test data"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            choices=[scenario.name for scenario in SCENARIOS],
+            help="Scenario to run (repeatable), defaults to all",
+        )
+        parser.add_argument("--iterations", type=int, default=50, help="Measured requests per scenario")
+        parser.add_argument("--warmup", type=int, default=5, help="Requests per scenario before measuring")
+        parser.add_argument("--seed", type=int, default=0, help="Seed picking devices and ids")
+        parser.add_argument("--prefix", default=DEFAULT_PREFIX, help="API prefix")
+        parser.add_argument(
+            "--clear-cache", action="store_true", help="Clear the cache before every request"
+        )
+        parser.add_argument("--output", help="Write the JSON report to this file")
+        parser.add_argument("--compare", help="JSON report of an earlier run to compare with")
+
+    def handle(self, *args, **options):
+        def progress(name, result):
+            self.stdout.write(
+                f"{name:20} p50 {result['p50_ms']:8.1f} ms  p95 {result['p95_ms']:8.1f} ms  "
+                f"queries {result['queries_median']:5} (max {result['queries_max']})  "
+                f"statuses {result['statuses']}"
+            )
+
+        # the test client sends its requests to "testserver"
+        setup_test_environment()
+        try:
+            report = run_benchmark(
+                scenario_names=options["scenario"],
+                iterations=options["iterations"],
+                warmup=options["warmup"],
+                seed=options["seed"],
+                prefix=options["prefix"],
+                clear_cache=options["clear_cache"],
+                progress=progress,
+            )
+        finally:
+            teardown_test_environment()
+
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(f"Wrote the report to {options['output']}.")
+
+        if options["compare"]:
+            with open(options["compare"]) as baseline_file:
+                baseline = json.load(baseline_file)
+            for name, metric, before, after, change in compare_reports(baseline, report):
+                change = "n/a" if change is None else f"{change:+.1f} %"
+                self.stdout.write(f"{name:20} {metric:15} {before:>10} -> {after:>10}  {change}")
+        self.stdout.write(self.style.SUCCESS("Benchmark finished."))
@@ -0,0 +1,55 @@
+from logging import getLogger
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from api.views.schema import SCHEMA_FORMATS, SCHEMA_NAMESPACES, forget_schema
+
+logger = getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Generates the OpenAPI schemas of all API versions into the cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--host",
+            action="append",
+            required=True,
+            help="Host the schemas are served for, e.g. api.molo.news (repeatable)",
+        )
+        parser.add_argument(
+            "--insecure", action="store_true", help="Generate the schemas for http instead of https"
+        )
+        parser.add_argument(
+            "--refresh", action="store_true", help="Drop cached schemas of this deploy first"
+        )
+
+    def handle(self, *args, **options):
+        secure = not options["insecure"]
+        scheme = "https" if secure else "http"
+        # the requests go through the URL conf, so every schema gets the API
+        # version of its namespace
+        client = Client()
+        failed = 0
+        for host in options["host"]:
+            for namespace in SCHEMA_NAMESPACES:
+                for schema_format in SCHEMA_FORMATS:
+                    if options["refresh"]:
+                        forget_schema(namespace, schema_format, scheme, host)
+                    path = reverse(f"{namespace}:schema-json", kwargs={"format": schema_format})
+                    response = client.get(
+                        path, HTTP_HOST=host, HTTP_ACCEPT_ENCODING="identity", secure=secure
+                    )
+                    if response.status_code != 200:
+                        failed += 1
+                        self.stdout.write(
+                            self.style.ERROR(f"{scheme}://{host}{path}: {response.status_code}")
+                        )
+                        continue
+                    self.stdout.write(f"{scheme}://{host}{path}: {len(response.content)} bytes")
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{failed} schemas could not be generated."))
+            return
+        self.stdout.write(self.style.SUCCESS("Generated all schemas."))
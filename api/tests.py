@@ -1,3 +1,92 @@
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from api.views.appuser import SummaryViewSet
+from api.views.article_v4 import ArticleViewSet
+from api.views.event_v4 import EventViewSet
+from api.views.organization import OrganizationViewSet
+from content.models import AppUser, Area, Organization
+from content.query_budget import assert_max_queries
+from content.synthetic import generate_synthetic_content, get_device_id
+
+
+class OrganizationListTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        area = Area.objects.create(name="Lüneburg")
+        organization = Organization.objects.create(name="Verein", type="collective")
+        organization.area.add(area)
+
+    def test_unknown_device(self):
+        # reads don't create the AppUser, an unknown device gets the default area
+        response = self.client.get("/api/v4/organizations/", HTTP_X_DEVICE_ID="never-seen")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(AppUser.objects.filter(device_id="never-seen").exists())
+
+    def test_device_without_area(self):
+        AppUser.objects.create(device_id="no-area", area=None)
+        response = self.client.get("/api/v4/organizations/", HTTP_X_DEVICE_ID="no-area")
+        self.assertEqual(response.status_code, 200)
+
+
+class QueryBudgetTest(TestCase):
+    # one area and enough content for full pages of 20 in the 14 day feed
+    # window, an N+1 query then repeats far more often than the threshold
+    volumes = {
+        "areas": 1,
+        "organizations": 12,
+        "sources_per_organization": 1,
+        "categories": 2,
+        "tags": 8,
+        "articles": 400,
+        "events": 60,
+        "occurrences_per_event": 2,
+        "appusers": 3,
+        "tags_per_item": 2,
+        "bookmarks_per_appuser": 5,
+    }
+    page_size = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_synthetic_content(cls.volumes)
+        cls.device_id = get_device_id(0)
+        cls.area_id = AppUser.objects.get(device_id=cls.device_id).area_id
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def get(self, path, viewset, params):
+        # the budgets hold for cold caches
+        cache.clear()
+        with assert_max_queries(viewset.query_budget["list"], route=path) as recorder:
+            response = self.client.get(path, params, HTTP_X_DEVICE_ID=self.device_id)
+        self.assertEqual(response.status_code, 200)
+        return response, recorder
+
+    def assert_list_budget(self, path, viewset, params=None, paginated=True):
+        params = params or {}
+        if not paginated:
+            self.get(path, viewset, params)
+            return
+        response, recorder = self.get(path, viewset, dict(params, limit=self.page_size))
+        self.assertEqual(len(response.json()["results"]), self.page_size)
+        self.assertEqual(recorder.get_repeated(), [])
+        # a page of 5 needs as many queries as a page of 20
+        _, small_page = self.get(path, viewset, dict(params, limit=5))
+        self.assertEqual(small_page.count, recorder.count)
+
+    def test_article_list(self):
+        self.assert_list_budget("/api/v4/articles/", ArticleViewSet)
+
+    def test_event_list(self):
+        self.assert_list_budget("/api/v4/events/", EventViewSet, {"area": self.area_id})
+
+    def test_summary(self):
+        self.assert_list_budget("/api/v4/users/summary/", SummaryViewSet, paginated=False)
+
+    def test_organizations(self):
+        self.assert_list_budget(
+            "/api/v4/organizations/", OrganizationViewSet, paginated=False
+        )
@@ -6,6 +6,7 @@ from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
 from . import views
+from .views.schema import schema_spec_view, schema_ui_view
 
 app_name = 'molonews'
 
@@ -20,16 +21,16 @@ schema_view = get_schema_view(
 urlpatterns = [
     re_path(
         r"^swagger(?P<format>\.json|\.yaml)$",
-        schema_view.without_ui(cache_timeout=0),
+        schema_spec_view(schema_view),
         name="schema-json",
     ),
     re_path(
         r"^swagger/$",
-        schema_view.with_ui("swagger", cache_timeout=0),
+        schema_ui_view(schema_view, "swagger"),
         name="schema-swagger-ui",
     ),
     re_path(
-        r"^redoc/$", schema_view.with_ui("redoc", cache_timeout=0), name="schema-redoc"
+        r"^redoc/$", schema_ui_view(schema_view, "redoc"), name="schema-redoc"
     ),
 ]
 
@@ -10,6 +10,7 @@ from rest_framework_simplejwt.views import (
 )
 
 from . import views
+from .views.schema import schema_spec_view, schema_ui_view
 
 app_name = 'molonews'
 
@@ -24,16 +25,16 @@ schema_view = get_schema_view(
 urlpatterns = [
     re_path(
         r"^swagger(?P<format>\.json|\.yaml)$",
-        schema_view.without_ui(cache_timeout=0),
+        schema_spec_view(schema_view),
         name="schema-json",
     ),
     re_path(
         r"^swagger/$",
-        schema_view.with_ui("swagger", cache_timeout=0),
+        schema_ui_view(schema_view, "swagger"),
         name="schema-swagger-ui",
     ),
     re_path(
-        r"^redoc/$", schema_view.with_ui("redoc", cache_timeout=0), name="schema-redoc"
+        r"^redoc/$", schema_ui_view(schema_view, "redoc"), name="schema-redoc"
     ),
 ]
 
@@ -70,6 +71,7 @@ router.register(r"users/event-tags", views.AppUserEventTagViewSet)
 router.register(r"users/organizations", views.AppUserOrganizationsViewSet)
 router.register(r"users/location", views.AppUserLocationViewSet)
 router.register(r"users/push", views.AppUserPushViewSet)
+router.register(r"users/sync", views.AppUserSyncViewSet, basename="sync")
 
 # create admin user
 router.register(r"users", views.AdminUserViewSet)
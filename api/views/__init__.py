@@ -22,6 +22,7 @@ from .appuser import AppUserOrganizationsViewSet
 from .appuser import AppUserLocationViewSet
 from .appuser import AppUserPushViewSet
 from .appuser import SummaryViewSet
+from .sync import AppUserSyncViewSet
 from .category import CategoryViewSet
 from .contact import FeedbackContactViewSet
 from .contact import ParticipateContactViewSet
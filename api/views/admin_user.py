@@ -8,11 +8,11 @@ from .util import MoloVersioning, bad_request, choices_parameter, header_string_
 from django.shortcuts import get_object_or_404, redirect
 from logging import getLogger
 from content.models import User, Organization, Source, Category, AppUser, Area
+from content.mail import queue_mail
+from content.organization_rollout import schedule_organization_rollout
 from rest_framework import status
 from drf_yasg import openapi
 from django.contrib.auth.models import Group
-import smtplib
-from email.mime.text import MIMEText
 import uuid
 import jwt
 from django.conf import settings
@@ -40,27 +40,6 @@ class AreaSerializer(serializers.ModelSerializer):
         fields = ['id', 'name']
         ref_name = "areas" 
 
-def add_organization_to_appusers(organization):
-        try:
-            # Alle AppUser holen
-            app_users = AppUser.objects.all()
-            
-            # Viele-zu-Viele-Beziehung effizient in einem Schritt hinzufügen
-            # M2M-Through-Modell nutzen, um die Organisation mit AppUsern zu verknüpfen
-            app_user_org_mappings = [
-                AppUser.organization.through(appuser_id=app_user.id, organization_id=organization.id)
-                for app_user in app_users
-            ]
-            
-            # Bulk-Erstellung der M2M-Beziehungen
-            with transaction.atomic():  # Datenbank-Transaktion, um alles zusammen auszuführen
-                AppUser.organization.through.objects.bulk_create(app_user_org_mappings, ignore_conflicts=True)
-            
-            logger.info(f"Organisation {organization.name} erfolgreich zu allen AppUsern hinzugefügt.")
-        
-        except Exception as e:
-            logger.error(f"Fehler beim Hinzufügen der Organisation zu AppUsern: {str(e)}")
-
 class UserGetSerializer(serializers.ModelSerializer):
     town = serializers.SerializerMethodField()
     street = serializers.SerializerMethodField()
@@ -258,9 +237,9 @@ class AdminUserViewSet(viewsets.ViewSet):
 
                 organization.save()
                 """
-                Fügt die gegebene Organisation zu allen bestehenden AppUsern hinzu.
+                Fügt die gegebene Organisation nach dem Commit im Hintergrund zu allen bestehenden AppUsern hinzu.
                 """
-                add_organization_to_appusers(organization)
+                schedule_organization_rollout(organization.id)
                 # Quelle erstellen und Benutzer zuweisen
                 source = Source()
                 source.related_user = user
@@ -298,16 +277,7 @@ class AdminUserViewSet(viewsets.ViewSet):
                     f'</body></html>'
                 )
   
-                email = MIMEText(message, 'html')
-                email['Subject'] = subject
-                email['From'] = sender_email
-                email['To'] = receiver_email
-
-                with smtplib.SMTP(settings.MAIL_SENDING['EMAIL_HOST'], settings.MAIL_SENDING['EMAIL_PORT']) as server:
-                    server.starttls()
-                    server.login(settings.MAIL_SENDING['EMAIL_HOST_USER'], settings.MAIL_SENDING['EMAIL_HOST_PASSWORD'])
-                    server.sendmail(sender_email, receiver_email, email.as_string())
-                    logger.error(email.as_string())
+                queue_mail(subject, message, [receiver_email], from_email=sender_email, html=True)
 
         except Exception as e:
             logger.error(f"Error during user creation: {str(e)}")
@@ -831,17 +801,8 @@ class AdminUserViewSet(viewsets.ViewSet):
             message += '</body></html>'
 
             
-            # Create a MIMEText object with the email content
-            email = MIMEText(message, 'html')
-            email['Subject'] = subject
-            email['From'] = sender_email
-            email['To'] = receiver_email
-            
-            # Connect to the SMTP server and send the email
-            with smtplib.SMTP(settings.MAIL_SENDING['EMAIL_HOST'], settings.MAIL_SENDING['EMAIL_PORT']) as server:
-                server.starttls()
-                server.login(settings.MAIL_SENDING['EMAIL_HOST_USER'], settings.MAIL_SENDING['EMAIL_HOST_PASSWORD'])
-                server.sendmail(sender_email, receiver_email, email.as_string())
+            # Queue the email, it is sent by the mail worker
+            queue_mail(subject, message, [receiver_email], from_email=sender_email, html=True)
 
         except Exception as e:
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
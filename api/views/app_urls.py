@@ -1,8 +1,11 @@
+from django.http import HttpResponse
+from django.utils.decorators import method_decorator
 from rest_framework import viewsets, serializers
 from content.models import App_urls
-from rest_framework.response import Response
 from drf_yasg.utils import swagger_auto_schema
-from .util import UserPagination, header_string_parameter
+from content.taxonomy import get_rendered_taxonomy, get_taxonomy_version
+from .compression import compress_response
+from .util import UserPagination, header_string_parameter, make_etag, not_modified, set_validators
 
 class AppUrlSerializer(serializers.ModelSerializer):
 
@@ -25,17 +28,25 @@ class AppUrlsViewSet(viewsets.ViewSet):
     queryset = App_urls.objects.all()
     serializer_class = AppUrlSerializer
 
+    @method_decorator(compress_response('app_urls', shared=True))
     @swagger_auto_schema(
         operation_description='Get a list of URLs used in the side menu of the app',
         responses={200: ListAppUrlSerializer(), 400: 'Device ID does not exist'},
     )
     def list(self, request):
-       
-        serializer = AppUrlSerializer(self.queryset, many=True)
-    
-        return Response({
-            'count': self.queryset.count(),
-            'results': serializer.data
-        })
+        etag = make_etag(get_taxonomy_version())
+        response = not_modified(request, etag=etag)
+        if response is not None:
+            return response
+
+        rendered = get_rendered_taxonomy('app_urls', self.build_list)
+        return set_validators(HttpResponse(rendered.content, content_type='application/json'), etag)
+
+    def build_list(self):
+        app_urls = list(self.queryset.all())
+        return {
+            'count': len(app_urls),
+            'results': AppUrlSerializer(app_urls, many=True).data
+        }
 
 
@@ -13,6 +13,16 @@ from .util import (
 )
 from content.choices import ORGANIZATION_TYPE_CHOICES
 from content.models import AppUser, Tag, Organization, Category
+from content.appuser_summary import get_summary
+from content.appusers import get_appuser, get_or_create_appuser
+from content.preferences import (
+    ensure_default_preferences,
+    get_selected_organization_ids,
+    get_selected_tag_ids,
+    reset_organization_selection,
+    set_organization_selection,
+    set_selected_tag_ids,
+)
 from .category import CategoryTagsSerializer
 
 logger = getLogger("molonews")
@@ -94,11 +104,10 @@ class AppUserBaseViewSet(viewsets.GenericViewSet):
         if device_id is None:
             return None, bad_request("Device ID is missing")
         if create:
-            app_user, created = AppUser.objects.get_or_create(device_id=device_id)
+            app_user, created = get_or_create_appuser(device_id)
         else:
-            try:
-                app_user = AppUser.objects.get(device_id=device_id)
-            except AppUser.DoesNotExist:
+            app_user = get_appuser(device_id)
+            if app_user is None:
                 return None, bad_request("Device ID does not exist")
         return app_user, None
 
@@ -159,37 +168,15 @@ class AppUserTagViewSet(AppUserBaseViewSet):
             logger.error(error_response)
             return error_response
 
-        # get user tags to see if some already exist or if the list is empty
-        user_tags = app_user.tags.values()
-        # if the user has no tags assigned then assign all tags
-        if len(user_tags) == 0:
-            # get all tags from db
-            all_tags = Tag.objects.all().values()
-            # add one tag after another to the user
-            for tag in all_tags:
-                app_user.tags.add(tag["id"])
-            app_user.save()
-
-        # get list of all organisations that the user requested
-        user_organisations = app_user.organization.values()
-        # if there is none the initial values need to be set
-        if len(user_organisations) == 0:
-            logger.error("user has no organisations")
-            # get all organisations that are active from db
-            all_organisations = Organization.objects.filter(active=True).values()
-            # add all ids the the users list of organisations
-            for org in all_organisations:
-                app_user.organization.add(org["id"])
-            app_user.save()
+        # if the user has no tags or organizations assigned then assign all of them
+        ensure_default_preferences(app_user)
 
         data = self.request.data
         # get already selected tags not matching tag filter
-        user_tags = [
-            tag for tag in app_user.tags.exclude(category_id__in=self.tag_filter)
-        ]
+        user_tags = get_selected_tag_ids(app_user, exclude_category_ids=self.tag_filter)
         _tags = data.get("tags", None)
-        user_tags += [_tag for _tag in Tag.objects.filter(id__in=_tags)]
-        app_user.tags.set(user_tags)
+        user_tags |= set(Tag.objects.filter(id__in=_tags).values_list("id", flat=True))
+        set_selected_tag_ids(app_user, user_tags)
         if self.serializer_class == EventTagListSerializer:
             filter_events_by_source = data.get("filter_events_by_source", False)
             app_user.filter_events_by_source = filter_events_by_source
@@ -225,7 +212,9 @@ class AppUserTagViewSet(AppUserBaseViewSet):
                     "category": Category.objects.get(id=2),
                     "filter_events_by_source": _filter_events_by_source,
                 },
-                context={"device_id": request.headers.get("X-Device-ID", None)},
+                context={
+                    "selected_tag_ids": get_selected_tag_ids(app_user) if app_user else set()
+                },
             )
         if serializer:
             return Response(serializer.data)
@@ -276,22 +265,24 @@ def save_organizations(
         and organization_all_tags is None
         and organization_type is None
     ):
-        app_user.organization.set(Organization.objects.all())
-        app_user.deselected_organization_all_tags.set(Organization.objects.all())
+        reset_organization_selection(app_user)
     else:
         if organization_type:
+            selected = Organization.objects.filter(
+                id__in=get_selected_organization_ids(app_user)
+            )
 
             # get current selected orgs but exclude current organization_type
             # exclude them because the current organization type is being passed by the incoming variables
 
             # nach Themen - alle ausser aktueller typ
             selected_orgs = [
-                org.id for org in app_user.organization.exclude(type=organization_type)
+                org.id for org in selected.exclude(type=organization_type)
             ]
             # nach themen - nur aktuellen typ in anderen Gebieten
             selected_orgs_other_areas = [
                 org.id
-                for org in app_user.organization.filter(type=organization_type).exclude(
+                for org in selected.filter(type=organization_type).exclude(
                     area=area_id
                 )
             ]
@@ -321,20 +312,7 @@ def save_organizations(
             organization = selected_orgs + organization
             organization_all_tags = selected_orgs_all_tags + organization_all_tags
 
-        # old variant
-        # check if can be removed
-        app_user.organization.set(Organization.objects.filter(id__in=organization))
-        app_user.deselected_organization.set(
-            Organization.objects.exclude(id__in=organization)
-        )
-
-        app_user.organization_all_tags.set(
-            Organization.objects.filter(id__in=organization_all_tags)
-        )
-
-        app_user.deselected_organization_all_tags.set(
-            Organization.objects.exclude(id__in=organization_all_tags)
-        )
+        set_organization_selection(app_user, organization, organization_all_tags)
 
     app_user.save()
 
@@ -426,28 +404,8 @@ class AppUserLocationViewSet(AppUserBaseViewSet):
         if error_response:
             return error_response
 
-            # get user tags to see if some already exist or if the list is empty
-        user_tags = app_user.tags.values()
-        # if the user has no tags assigned then assign all tags
-        if len(user_tags) == 0:
-            # get all tags from db
-            all_tags = Tag.objects.all().values()
-            # add one tag after another to the user
-            for tag in all_tags:
-                app_user.tags.add(tag["id"])
-
-        # get list of all organisations that the user requested
-        user_organisations = app_user.organization.values()
-        # if there is none the initial values need to be set
-        if len(user_organisations) == 0:
-            logger.error("user has no organisations")
-            # get all organisations that are active from db
-            all_organisations = Organization.objects.filter(active=True).values()
-            # add all ids the the users list of organisations
-            for org in all_organisations:
-                app_user.organization.add(org["id"])
-
-        app_user.save()
+        # if the user has no tags or organizations assigned then assign all of them
+        ensure_default_preferences(app_user)
 
         serializer = UserLocationSerializer(app_user)
         return Response(serializer.data)
@@ -496,29 +454,8 @@ class AppUserLocationViewSet(AppUserBaseViewSet):
         # write out appuser id
         # logger.error (app_user.__dict__["id"])
 
-        # get user tags to see if some already exist or if the list is empty
-        user_tags = app_user.tags.values()
-        # if the user has no tags assigned then assign all tags
-        if len(user_tags) == 0:
-            # get all tags from db
-            all_tags = Tag.objects.all().values()
-            # add one tag after another to the user
-            for tag in all_tags:
-                app_user.tags.add(tag["id"])
-
-        # get list of all organisations that the user requested
-        user_organisations = app_user.organization.values()
-        # if there is none the initial values need to be set
-        if len(user_organisations) == 0:
-            logger.error("user has no organisations")
-            # get all organisations that are active from db
-            all_organisations = Organization.objects.filter(active=True).values()
-            # add all ids the the users list of organisations
-            for org in all_organisations:
-                try:
-                    app_user.organization.add(org["id"])
-                except Exception as e:
-                    logger.error(e)
+        # if the user has no tags or organizations assigned then assign all of them
+        ensure_default_preferences(app_user)
 
         app_user.save()
 
@@ -615,87 +552,13 @@ class AppUserPushViewSet(AppUserBaseViewSet):
         return Response(status.HTTP_200_OK)
 
 
-class OrganizationChoiceSerializer(serializers.ModelSerializer):
-    type = serializers.SerializerMethodField()
-    name = serializers.SerializerMethodField()
-    push = serializers.SerializerMethodField()
-    all_tags = serializers.SerializerMethodField()
-    by_tag = serializers.SerializerMethodField()
-    deselected = serializers.SerializerMethodField()
-
-    class Meta:
-        model = AppUser
-        fields = (
-            "type",
-            "name",
-            "push",
-            "all_tags",
-            "by_tag",
-            "deselected",
-        )
-
-    @swagger_serializer_method(serializers.BooleanField)
-    def get_push(self, instance):
-        return getattr(instance, "push_{}".format(self.context["type"][0]))
-
-    @swagger_serializer_method(serializers.CharField)
-    def get_type(self, instance):
-        return self.context["type"][0]
-
-    @swagger_serializer_method(serializers.CharField)
-    def get_name(self, instance):
-        return self.context["type"][1]
-
-    @swagger_serializer_method(serializers.IntegerField)
-    def get_all_tags(self, instance):
-        # convert the instance which is an instance of the app user into dictionary
-        app_user = instance.__dict__
-        # get the area id so it can be used for filtering the results
-        user_area_id = app_user["area_id"]
-        # filter the user instance organisation by the area id
-        return len(
-            instance.organization_all_tags.filter(type=self.context["type"][0])
-            .filter(area=user_area_id)
-            .values()
-        )
-
-    @swagger_serializer_method(serializers.IntegerField)
-    def get_by_tag(self, instance):
-
-        # convert the instance which is an instance of the app user into dictionary
-        app_user = instance.__dict__
-        # get the area id so it can be used for filtering the results
-        user_area_id = app_user["area_id"]
-        # filter the user instance organisation by the area id
-        all_organisations_in_user_area = (
-            instance.organization.filter(type=self.context["type"][0])
-            .filter(area=user_area_id)
-            .values()
-        )
-
-        return len(all_organisations_in_user_area)
-
-    @swagger_serializer_method(serializers.IntegerField)
-    def get_deselected(self, instance):
-        # convert the instance which is an instance of the app user into dictionary
-        app_user = instance.__dict__
-        # get the area id so it can be used for filtering the results
-        user_area_id = app_user["area_id"]
-
-        selected = instance.organization.filter(type=self.context["type"][0]).filter(
-            active=True
-        )
-        selected_all_tags = instance.organization_all_tags.filter(
-            type=self.context["type"][0]
-        ).filter(active=True)
-        _selected = set(list(set(selected)) + list(set(selected_all_tags)))
-        available = (
-            Organization.objects.filter(type=self.context["type"][0])
-            .filter(active=True)
-            .filter(area=user_area_id)
-        )
-        _deselected = [org for org in available if org not in _selected and org.active]
-        return len(_deselected)
+class OrganizationChoiceSerializer(serializers.Serializer):
+    type = serializers.CharField()
+    name = serializers.CharField()
+    push = serializers.BooleanField()
+    all_tags = serializers.IntegerField()
+    by_tag = serializers.IntegerField()
+    deselected = serializers.IntegerField()
 
 
 class SummarySerializer(serializers.ModelSerializer):
@@ -708,21 +571,13 @@ class SummarySerializer(serializers.ModelSerializer):
 
     @swagger_serializer_method(OrganizationChoiceSerializer(many=True))
     def get_overview(self, instance):
-        overview = []
-        for choice_type in ORGANIZATION_TYPE_CHOICES:
-            _choice_serializer = OrganizationChoiceSerializer(
-                instance,
-                context={
-                    "type": choice_type,
-                },
-            )
-            overview.append(_choice_serializer.data)
-
-        return overview
+        return OrganizationChoiceSerializer(get_summary(instance), many=True).data
 
 
 class SummaryViewSet(AppUserBaseViewSet):
     http_method_names = ["get"]
+    # see content.query_budget
+    query_budget = {"list": 10}
 
     @swagger_auto_schema(
         operation_description="Get a summary of selected organizations and tags",
@@ -1,12 +1,25 @@
 from rest_framework import viewsets, serializers, filters, generics
 from drf_yasg.utils import swagger_auto_schema, swagger_serializer_method
 from django.conf import settings
+from django.http import HttpResponse
+from django.utils.decorators import method_decorator
 from math import acos, sin, cos, radians
 import django_filters
 from rest_framework.response import Response
 from rest_framework import status
-from .util import MoloVersioning, bad_request, choices_parameter, header_string_parameter, string_parameter
+from .util import (
+    MoloVersioning,
+    bad_request,
+    choices_parameter,
+    header_string_parameter,
+    string_parameter,
+    make_etag,
+    not_modified,
+    set_validators,
+)
 from content.models import Area, AppUser, User, Article, Source
+from content.taxonomy import get_rendered_taxonomy, get_taxonomy_version
+from .compression import compress_response
 from django.shortcuts import get_object_or_404
 from logging import getLogger
 import jwt
@@ -55,15 +68,23 @@ class AreaViewSet(viewsets.ViewSet):
     queryset = Area.objects.all()
     serializer_class = AreaSerializer
 
+    @method_decorator(compress_response('areas', shared=True))
     @swagger_auto_schema(
         operation_description='Get locations where molo.news is available',
         manual_parameters=[string_parameter('area', ''), string_parameter('longitude', ''), string_parameter('latitude', '') ],
         responses={200: ListAreaSerializer(), 400: 'Device ID does not exist'},
     )
     def list(self, request, *args, **kwargs):
-        
-        arealist = list(self.queryset)
+        etag = make_etag(get_taxonomy_version(), request.get_full_path())
+        response = not_modified(request, etag=etag)
+        if response is not None:
+            return response
+
         data = self.request.GET.dict()
+        rendered = get_rendered_taxonomy('areas', self.build_list)
+        if not data:
+            return set_validators(HttpResponse(rendered.content, content_type='application/json'), etag)
+        arealist = rendered.data['results']
 
         try:
             longitude = float(data['longitude'])
@@ -80,14 +101,13 @@ class AreaViewSet(viewsets.ViewSet):
         calculated_distance = False
 
         if longitude and latitude:
-            # add all distances into List
-            for item in arealist:
-                item.distance = calculate_distance(lon1=longitude, lat1=latitude, lon2=item.longitude, lat2=item.latitude)    
-
             # order the list by distance
             def sortFn(value):
-                return value.distance
-            arealist.sort(key=sortFn)
+                return calculate_distance(
+                    lon1=longitude, lat1=latitude,
+                    lon2=float(value['longitude']), lat2=float(value['latitude']),
+                )
+            arealist = sorted(arealist, key=sortFn)
             # store that a calculation of the distance has happened
             # the result of this is preferred over the search field
             calculated_distance = True
@@ -98,21 +118,19 @@ class AreaViewSet(viewsets.ViewSet):
             # check if its in the list
             # if its in the list only return the requested item
             # otherwise leave the list untouched and return it in complete
-            arealist_temp = arealist.copy()
-            arealist_temp.clear()
+            arealist = [item for item in arealist if area_name.lower() in item['name'].lower()]
 
-            for item in arealist:
-                if area_name.lower() in item.name.lower():
-                    arealist_temp.append(item)
-            
-            arealist = arealist_temp
+        return set_validators(Response({
+            'count': len(arealist),
+            'results': arealist
+        }), etag)
 
-        serializer = AreaSerializer(arealist, many=True)
-    
-        return Response({
+    def build_list(self):
+        arealist = list(self.queryset.all())
+        return {
             'count': len(arealist),
-            'results': serializer.data
-        })  
+            'results': AreaSerializer(arealist, many=True).data
+        }
 
     @swagger_auto_schema(
         operation_description='Create a new location where molo.news is available',
@@ -7,6 +7,7 @@ from drf_yasg.utils import swagger_auto_schema, swagger_serializer_method
 from rest_framework.parsers import MultiPartParser, FormParser
 from logging import getLogger
 from .util import (
+    HotFirstQuerySet,
     UserPagination,
     choices_parameter,
     integer_parameter,
@@ -16,7 +17,16 @@ from .util import (
     bad_request,
 )
 from content.models import AppUser, Article, Tag, Organization, Area, Source
+from content.appusers import get_appuser
 from content.choices import ORGANIZATION_TYPE_CHOICES
+from content.hot_articles import get_hot_article_id
+from content.preferences import (
+    ensure_default_preferences,
+    get_organization_all_tags_ids,
+    get_selected_organization_ids,
+    get_selected_tag_ids,
+)
+from content.images import get_sized_url
 from .article_event_shared import (
     AppUserBaseViewSet,
     BaseViewSet,
@@ -64,21 +74,6 @@ ARTICLE_RETRIEVE_FIELDS = ARTICLE_LIST_FIELDS + (
 )
 
 
-def get_appuser(device_id):
-    """Try to get an AppUser by device id
-
-    Args:
-        device_id (str): device id string
-
-    Returns:
-        AppUser or None: The AppUser object if found, otherwise None.
-    """
-    try:
-        return AppUser.objects.get(device_id=device_id)
-    except AppUser.DoesNotExist:
-        return None
-
-
 class ArticleFilter(df.FilterSet):
     """
     Filter class for the Article model.
@@ -148,20 +143,16 @@ class ArticleFilter(df.FilterSet):
 
         # If the user exists, apply filters based on the user's preferences
         if appuser:
+            user_values = {
+                "organization": get_selected_organization_ids(appuser),
+                # ignore event tags
+                "tags": get_selected_tag_ids(appuser, exclude_category_ids=[2]),
+                "organization_all_tags": get_organization_all_tags_ids(appuser),
+            }
             for name in queries:
                 _filter = self.filters[name]
                 lookup = "{}__{}".format(_filter.field_name, _filter.lookup_expr)
-                # ignore event tags
-                if name == "tags":
-                    value = [
-                        str(_attr.id)
-                        for _attr in getattr(appuser, name).all().exclude(category_id=2)
-                        if _attr
-                    ]
-                else:
-                    value = [
-                        str(_attr.id) for _attr in getattr(appuser, name).all() if _attr
-                    ]
+                value = [str(_id) for _id in sorted(user_values[name])]
                 if value is not None and value:
                     user_queries[name] = Q(**{lookup: value})
 
@@ -351,9 +342,9 @@ class ArticleBaseSerializer(serializers.ModelSerializer):
         Otherwise, it returns the default image URL for the source of the article.
         """
         if self.context.get("detail", None) and instance.image_detail:
-            return self.context["request"].build_absolute_uri(instance.image_detail.url)
+            return self.context["request"].build_absolute_uri(get_sized_url(instance.image_detail, "detail"))
         elif instance.image:
-            return self.context["request"].build_absolute_uri(instance.image.url)
+            return self.context["request"].build_absolute_uri(get_sized_url(instance.image, "feed"))
         elif instance.image_url:
             return instance.image_url
         else:
@@ -445,27 +436,6 @@ class PaginatedArticleRetrieveSerializer(serializers.Serializer):
     results = ArticleRetrieveSerializer(many=True)
 
 
-def get_is_hot_queryset(exclude_article_ids, oldest_date, area_id=3):
-    """Get a queryset containing recent articles flagge "is_hot".
-
-    Args:
-        exclude_article_ids (list): article ids to be excluded
-        oldest_date (date): oldes date for articles
-
-    Returns:
-        queryset
-    """
-    return (
-        Article.objects.filter(is_hot=True)
-        .exclude(id__in=exclude_article_ids)
-        .exclude(source__active=False)
-        .exclude(source__organization__active=False)
-        .filter(date__gte=oldest_date.strftime("%Y-%m-%d"))
-        .filter(area=area_id)
-        .order_by("-date")
-    )
-
-
         
        
 class ArticleViewSet(BaseViewSet):
@@ -523,34 +493,10 @@ class ArticleViewSet(BaseViewSet):
         self.queryset = Article.objects.filter(published=True)
         queryset = self.filter_queryset(self.get_queryset())
 
-        # Get or create the AppUser object for the given device id
-        app_user, created = AppUser.objects.get_or_create(device_id=device_id)
-
-        # Try to get the user's area id, if it doesn't exist, set it to 3
-        try:
-            user_area = app_user.area
-            area_id = user_area.__dict__["id"]
-        except:
-            area_id = 3
-
-        # If the AppUser object was just created, assign all tags and active organizations to the user
-        if created:
-            # Assign all tags to the user if they don't have any
-            user_tags = app_user.tags.values()
-            if len(user_tags) == 0:
-                all_tags = Tag.objects.all().values()
-                for tag in all_tags:
-                    app_user.tags.add(tag["id"])
-                app_user.save()
-
-            # Assign all active organizations to the user if they don't have any
-            user_organisations = app_user.organization.values()
-            if len(user_organisations) == 0:
-                logger.error("user has no organisations")
-                all_organisations = Organization.objects.filter(active=True).values()
-                for org in all_organisations:
-                    app_user.organization.add(org["id"])
-                app_user.save()
+        # Reads never create the AppUser, unknown devices get the default area
+        area_id = 3
+        if app_user is not None and app_user.area_id is not None:
+            area_id = app_user.area_id
 
         # Exclude bookmarked and archived articles, filter by area and date
         queryset = (
@@ -624,33 +570,18 @@ class ArticleViewSet(BaseViewSet):
             area_id = 3
 
         # Assign all tags and active organizations to the user if they don't have any
-        user_tags = app_user.tags.values()
-        if len(user_tags) == 0:
-            all_tags = Tag.objects.all().values()
-            for tag in all_tags:
-                app_user.tags.add(tag["id"])
-        user_organisations = app_user.organization.values()
-        if len(user_organisations) == 0:
-            logger.error("user has no organisations")
-            all_organisations = Organization.objects.filter(active=True).values()
-            for org in all_organisations:
-                try:
-                    app_user.organization.add(org["id"])
-                except Exception as e:
-                    logger.error(e)
-            app_user.save()
+        if app_user is not None:
+            ensure_default_preferences(app_user)
 
         # Get the hottest article if it exists and the "is_hot" flag is not ignored
         hottest = None
-        is_hot_queryset = get_is_hot_queryset(exclude_article_ids, oldest_date, area_id)
-        if len(is_hot_queryset) > 0 and not ignore_is_hot:
-            hottest = is_hot_queryset[0]
+        if not ignore_is_hot:
+            hot_article_id = get_hot_article_id(area_id, oldest_date, exclude_article_ids)
+            if hot_article_id is not None:
+                hottest = Article.objects.filter(id=hot_article_id).first()
+        if hottest is not None:
             queryset = queryset.exclude(id=hottest.id)
-            querysetlist = list(queryset)
-            for element in querysetlist:
-                element.is_hot = False
-            articles = [hottest] + querysetlist
-            page = self.paginate_queryset(articles)
+            page = self.paginate_queryset(HotFirstQuerySet(hottest, queryset))
         else:
             page = self.paginate_queryset(queryset)
 
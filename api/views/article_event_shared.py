@@ -1,4 +1,4 @@
-from django.db.models import Count, Q
+from django.db.models import Count, Max, Q
 from datetime import datetime, timedelta
 
 from django.http import Http404
@@ -12,8 +12,12 @@ from rest_framework.response import Response
 
 from .util import UserPagination, header_string_parameter
 from content.models import AppUser
+from content.appusers import get_appuser, get_or_create_appuser
 from content.choices import ORGANIZATION_TYPE_CHOICES
+from content.images import get_sized_url
+from content.visibility import is_denormalized
 from .util import bad_request
+from .shaping import FULL_SHAPE, add_side_loaded, get_shape
 
 BASE_LIST_FIELDS = (
     "id",
@@ -24,6 +28,170 @@ BASE_LIST_FIELDS = (
 )
 
 
+def get_m2m_field(m2m_field_name):
+    """Get an M2M field of the AppUser model.
+
+    Args:
+        m2m_field_name (str): name of the field, e.g. "bookmarked_articles"
+
+    Returns:
+        ManyToManyField
+    """
+    return AppUser._meta.get_field(m2m_field_name)
+
+
+def get_related_ids(app_user, m2m_field_name):
+    """Get the ids related to an AppUser, newest first.
+
+    The ids are read from the through table alone, ordered by insertion.
+
+    Args:
+        app_user (AppUser): app user
+        m2m_field_name (str): name of the M2M field
+
+    Returns:
+        queryset of ids
+    """
+    field = get_m2m_field(m2m_field_name)
+    return (
+        field.remote_field.through.objects.filter(
+            **{field.m2m_column_name(): app_user.id}
+        )
+        .order_by("-id")
+        .values_list(field.m2m_reverse_name(), flat=True)
+    )
+
+
+def get_related_fingerprint(app_user, m2m_field_name):
+    """Get a cheap fingerprint of an AppUser's relation for ETags.
+
+    Through table ids only grow, so any add or remove changes the highest
+    id or the number of rows.
+
+    Args:
+        app_user (AppUser): app user or None
+        m2m_field_name (str): name of the M2M field
+
+    Returns:
+        list: [highest id, number of rows]
+    """
+    if app_user is None:
+        return [None, 0]
+    field = get_m2m_field(m2m_field_name)
+    state = field.remote_field.through.objects.filter(
+        **{field.m2m_column_name(): app_user.id}
+    ).aggregate(max_id=Max("id"), count=Count("id"))
+    return [state["max_id"], state["count"]]
+
+
+def is_related(app_user, m2m_field_name, object_id):
+    """Check if an object is related to an AppUser without loading the relation.
+
+    Args:
+        app_user (AppUser): app user
+        m2m_field_name (str): name of the M2M field
+        object_id (int): id of the related object
+
+    Returns:
+        bool
+    """
+    field = get_m2m_field(m2m_field_name)
+    return field.remote_field.through.objects.filter(
+        **{
+            field.m2m_column_name(): app_user.id,
+            field.m2m_reverse_name(): object_id,
+        }
+    ).exists()
+
+
+def filter_related_ids(app_user, m2m_field_name, object_ids):
+    """Get the subset of object ids which is related to an AppUser.
+
+    Args:
+        app_user (AppUser): app user
+        m2m_field_name (str): name of the M2M field
+        object_ids (iterable): ids of the objects to check
+
+    Returns:
+        set
+    """
+    field = get_m2m_field(m2m_field_name)
+    return set(
+        get_related_ids(app_user, m2m_field_name).filter(
+            **{"{}__in".format(field.m2m_reverse_name()): list(object_ids)}
+        )
+    )
+
+
+def add_related(app_user, m2m_field_name, object_ids):
+    """Relate objects to an AppUser, existing relations are skipped by the database.
+
+    Args:
+        app_user (AppUser): app user
+        m2m_field_name (str): name of the M2M field
+        object_ids (iterable): ids of the related objects
+    """
+    field = get_m2m_field(m2m_field_name)
+    through = field.remote_field.through
+    through.objects.bulk_create(
+        [
+            through(
+                **{
+                    field.m2m_column_name(): app_user.id,
+                    field.m2m_reverse_name(): object_id,
+                }
+            )
+            for object_id in object_ids
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def remove_related(app_user, m2m_field_name, object_ids):
+    """Remove objects from an AppUser's relation.
+
+    Args:
+        app_user (AppUser): app user
+        m2m_field_name (str): name of the M2M field
+        object_ids (iterable): ids of the related objects
+
+    Returns:
+        int: number of removed relations
+    """
+    field = get_m2m_field(m2m_field_name)
+    deleted, _ = field.remote_field.through.objects.filter(
+        **{
+            field.m2m_column_name(): app_user.id,
+            "{}__in".format(field.m2m_reverse_name()): list(object_ids),
+        }
+    ).delete()
+    return deleted
+
+
+def paginate_related(view, app_user, m2m_field_name, queryset):
+    """Paginate the objects related to an AppUser straight from the through table.
+
+    Only the ids of the requested page are loaded from the through table,
+    the objects of the page are then fetched with the given queryset.
+
+    Args:
+        view (GenericViewSet): view which paginates
+        app_user (AppUser): app user
+        m2m_field_name (str): name of the M2M field
+        queryset (QuerySet): objects incl. select_related / prefetch_related
+
+    Returns:
+        list, bool: objects of the page, whether the result is paginated
+    """
+    object_ids = get_related_ids(app_user, m2m_field_name)
+    page_ids = view.paginate_queryset(object_ids)
+    paginated = page_ids is not None
+    if not paginated:
+        page_ids = list(object_ids)
+    objects = queryset.in_bulk(page_ids)
+    return [objects[object_id] for object_id in page_ids if object_id in objects], paginated
+
+
 class SourceTypeFilter(filters.BaseFilterBackend):
     def filter_queryset(self, request, queryset, view):
         """Filter queryset to only include articles from selected organization types.
@@ -42,6 +210,8 @@ class SourceTypeFilter(filters.BaseFilterBackend):
             for _type in source_types
             if request.query_params.get(_type, "true") == "true"
         ]
+        if is_denormalized(queryset.model):
+            return queryset.filter(organization_type__in=query_parameter)
         queryset = queryset.filter(
             Q(**{"source__organization__type__in": query_parameter})
         )
@@ -60,6 +230,8 @@ class SourceActiveFilter(filters.BaseFilterBackend):
         Returns:
             filtered QuerySet
         """
+        if is_denormalized(queryset.model):
+            return queryset.filter(visible=True)
         return queryset.exclude(source__active=False).exclude(
             source__organization__active=False
         )
@@ -127,6 +299,12 @@ class BaseViewSet(viewsets.ReadOnlyModelViewSet):
 
         return obj
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        # list items are shaped by the fields, profile and expand parameters
+        context["shape"] = get_shape(self.request) if self.request is not None else FULL_SHAPE
+        return context
+
     def get_limited_queryset(self, device_id, exclude_ids=[], use_basefilter=True):
         raise NotImplementedError
 
@@ -215,16 +393,20 @@ class BaseViewSet(viewsets.ReadOnlyModelViewSet):
 
         page = self.paginate_queryset(queryset)
 
+        shape = get_shape(self.request)
         serializer = self.serializer_class(
             page,
             many=True,
             context={
                 "device_id": device_id,
                 "request": self.request,
+                "shape": shape,
             },
         )
 
-        return self.get_paginated_response(serializer.data)
+        return add_side_loaded(
+            self.get_paginated_response(serializer.data), shape, get_appuser(device_id)
+        )
 
 
 class AppUserBaseViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
@@ -260,11 +442,10 @@ class AppUserBaseViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
             return None, bad_request("Device ID is missing")
         else:
             if create:
-                app_user, created = AppUser.objects.get_or_create(device_id=device_id)
+                app_user, created = get_or_create_appuser(device_id)
             else:
-                try:
-                    app_user = AppUser.objects.get(device_id=device_id)
-                except AppUser.DoesNotExist:
+                app_user = get_appuser(device_id)
+                if app_user is None:
                     return None, bad_request("Device ID does not exist")
             return getattr(app_user, self.m2m_field_name), None
 
@@ -314,10 +495,12 @@ def get_source_default_image_url(instance, context):
 
     if context.get("detail", None) and instance.source.default_image_detail:
         return context["request"].build_absolute_uri(
-            instance.source.default_image_detail.url,
+            get_sized_url(instance.source.default_image_detail, "detail"),
         )
     elif instance.source.default_image:
-        return context["request"].build_absolute_uri(instance.source.default_image.url)
+        return context["request"].build_absolute_uri(
+            get_sized_url(instance.source.default_image, "feed"),
+        )
     else:
         try:
             imgurl = instance.source.organization.image.url
@@ -170,7 +170,7 @@ class SourceTypeFilter(filters.BaseFilterBackend):
         """
         source_types = [type[0] for type in ORGANIZATION_TYPE_CHOICES]
         query_parameter = [_type for _type in source_types if request.query_params.get(_type, 'true') == 'true']
-        queryset = queryset.filter(Q(**{'source__organization__type__in': query_parameter}))
+        queryset = queryset.filter(Q(**{'organization_type__in': query_parameter}))
         return queryset
 
 
@@ -187,7 +187,7 @@ class SourceActiveFilter(filters.BaseFilterBackend):
         Returns:
             filtered QuerySet
         """
-        return queryset.exclude(source__active=False).exclude(source__organization__active=False)
+        return queryset.filter(visible=True)
 
 
 class ArticleTagsSerializer(serializers.ModelSerializer):
@@ -299,7 +299,7 @@ def get_is_hot_queryset(exclude_article_ids, oldest_date):
     """
     return Article.objects.filter(is_hot=True).exclude(
         id__in=exclude_article_ids
-    ).exclude(source__active=False).exclude(source__organization__active=False).filter(
+    ).filter(visible=True).filter(
         date__gte=oldest_date.strftime("%Y-%m-%d")
     ).order_by('-date')
 
@@ -1,4 +1,5 @@
 from django.conf import settings
+from django.utils.decorators import method_decorator
 from django.db.models import Count, Q, F
 from datetime import datetime, timedelta
 from rest_framework import serializers, filters
@@ -8,24 +9,53 @@ from drf_yasg.utils import swagger_auto_schema, swagger_serializer_method
 from rest_framework.parsers import MultiPartParser, FormParser
 from logging import getLogger
 from .util import (
+    ArticleKeysetPagination,
+    HotFirstQuerySet,
     UserPagination,
+    make_etag,
+    not_modified,
+    set_validators,
     choices_parameter,
     integer_parameter,
     string_parameter,
     boolean_parameter,
     header_string_parameter,
     bad_request,
+    use_keyset_pagination,
 )
 from content.models import AppUser, Article, Tag, Organization, Area, Source, User
+from content.appusers import get_appuser, get_or_create_appuser
 from content.choices import ORGANIZATION_TYPE_CHOICES
+from content.hot_articles import get_hot_article_id
+from content.images import get_sized_url
+from content.mail import queue_mail
+from content.preferences import (
+    ensure_default_preferences,
+    get_organization_all_tags_ids,
+    get_selected_organization_ids,
+    get_selected_tag_ids,
+    get_tags_fingerprint,
+    is_tag_selected,
+)
+from content.taxonomy import get_rendered_taxonomy, get_taxonomy_version
+from content.versions import get_version, version_datetime
+from .fragments import FragmentListSerializer
+from .compression import compress_response
+from .shaping import SHAPE_PARAMETERS, ShapedSerializerMixin, add_side_loaded
 from .article_event_shared import (
     AppUserBaseViewSet,
     BaseViewSet,
     SourceActiveFilter,
     get_source_default_image_url,
+    add_related,
+    filter_related_ids,
+    get_related_fingerprint,
+    is_related,
+    paginate_related,
+    remove_related,
 )
 import django_filters as df
-from rest_framework import viewsets
+from rest_framework import generics, viewsets
 from rest_framework.viewsets import GenericViewSet
 from rest_framework.pagination import PageNumberPagination
 from drf_yasg import openapi
@@ -40,9 +70,7 @@ from rest_framework.permissions import IsAuthenticated
 import ml.news_article_tagging  as ml
 import jwt
 from rest_framework.response import Response
-from email.mime.text import MIMEText
 from content.models import Article
-import smtplib
 
 
 logger = getLogger(__name__)
@@ -76,21 +104,6 @@ ARTICLE_RETRIEVE_FIELDS = ARTICLE_LIST_FIELDS + (
 )
 
 
-def get_appuser(device_id):
-    """Try to get an AppUser by device id
-
-    Args:
-        device_id (str): device id string
-
-    Returns:
-        AppUser or None: The AppUser object if found, otherwise None.
-    """
-    try:
-        return AppUser.objects.get(device_id=device_id)
-    except AppUser.DoesNotExist:
-        return None
-
-
 class ArticleFilter(df.FilterSet):
     """
     Filter class for the Article model.
@@ -160,20 +173,16 @@ class ArticleFilter(df.FilterSet):
 
         # If the user exists, apply filters based on the user's preferences
         if appuser:
+            user_values = {
+                "organization": get_selected_organization_ids(appuser),
+                # ignore event tags
+                "tags": get_selected_tag_ids(appuser, exclude_category_ids=[2]),
+                "organization_all_tags": get_organization_all_tags_ids(appuser),
+            }
             for name in queries:
                 _filter = self.filters[name]
                 lookup = "{}__{}".format(_filter.field_name, _filter.lookup_expr)
-                # ignore event tags
-                if name == "tags":
-                    value = [
-                        str(_attr.id)
-                        for _attr in getattr(appuser, name).all().exclude(category_id=2)
-                        if _attr
-                    ]
-                else:
-                    value = [
-                        str(_attr.id) for _attr in getattr(appuser, name).all() if _attr
-                    ]
+                value = [str(_id) for _id in sorted(user_values[name])]
                 if value is not None and value:
                     user_queries[name] = Q(**{lookup: value})
 
@@ -316,16 +325,75 @@ class ArticleTagsSerializer(serializers.ModelSerializer):
     def get_selected(self, obj):
         app_user = self.context.get("app_user", None)
         if app_user:
-            return app_user.tags.filter(id=obj.id).exists()
+            return is_tag_selected(app_user, obj.id)
         return False
+
+
+def build_article_tags():
+    """Build the article tags payload of the taxonomy cache, without selection.
+
+    Returns:
+        list: dicts with id, name and color
+    """
+    tags = Tag.objects.filter(color="").order_by('name').values("id", "name", "color")
+    return sorted(tags, key=lambda tag: tag["name"] if tag["name"] != "andere Sportarten" else "Fußball" + tag["name"])
     
 
+class ArticleFragmentListSerializer(FragmentListSerializer):
+    """Assembles article lists from cached fragments.
+
+    Bookmarks, archive state, tag selection, the hot flag and the counters
+    differ per user or request and are set on each fragment.
+    """
+
+    version_name = "article:{}"
+
+    def get_overlay_state(self, instances):
+        if "bookmarked_ids" not in self.context:
+            app_user = get_appuser(self.context["request"].headers.get("X-Device-ID"))
+            self.context["bookmarked_ids"] = (
+                filter_related_ids(
+                    app_user, "bookmarked_articles", [instance.id for instance in instances]
+                )
+                if app_user
+                else set()
+            )
+        app_user = self.context.get("app_user", None)
+        return {
+            "bookmarked_ids": self.context["bookmarked_ids"],
+            "selected_tag_ids": get_selected_tag_ids(app_user) if app_user else set(),
+        }
+
+    def overlay(self, data, instance, state):
+        fields = self.child.fields
+        if "bookmarked" in fields:
+            data["bookmarked"] = instance.id in state["bookmarked_ids"]
+        if "archived" in fields:
+            data["archived"] = bool(getattr(instance, "archived", False))
+        if "is_hot" in fields:
+            data["is_hot"] = instance.is_hot
+        if "request_count" in fields:
+            data["request_count"] = instance.request_count
+        if "bookmarked_count" in fields:
+            # only there if the queryset is annotated
+            if hasattr(instance, "bookmarked_count"):
+                data["bookmarked_count"] = instance.bookmarked_count
+            else:
+                data.pop("bookmarked_count", None)
+        # shaped lists carry tag ids only
+        if "tags" in fields and isinstance(fields["tags"], serializers.ListSerializer):
+            data["tags"] = [
+                dict(tag, selected=tag["id"] in state["selected_tag_ids"])
+                for tag in data["tags"]
+            ]
+
+
 class AreaIdNameSerializer(serializers.ModelSerializer):
     class Meta:
         model = Area
         fields = ('id', 'name')
 
-class ArticleBaseSerializer(serializers.ModelSerializer):
+class ArticleBaseSerializer(ShapedSerializerMixin, serializers.ModelSerializer):
     """
     This class is a serializer for the Article model.
     It extends the ModelSerializer class provided by Django Rest Framework.
@@ -362,6 +430,9 @@ class ArticleBaseSerializer(serializers.ModelSerializer):
     @swagger_serializer_method(serializers.BooleanField)
     def get_bookmarked(self, instance):
         """Return True if the article is bookmarked for the current app_user."""
+        # the bookmark and archive lists know the bookmarked ids of the page
+        if "bookmarked_ids" in self.context:
+            return instance.id in self.context["bookmarked_ids"]
         app_user = get_appuser(self.context.get("request").headers.get("X-Device-ID"))
         if app_user:
             return app_user.bookmarked_articles.filter(id=instance.id).exists()
@@ -371,15 +442,15 @@ class ArticleBaseSerializer(serializers.ModelSerializer):
     def get_image_url(self, instance):
         """
         This method returns the URL of the article's image.
-        If the 'detail' context is set and the instance has a 'image_detail' attribute, it returns the absolute URL of 'image_detail'.
-        If the instance has a 'image' attribute, it returns the absolute URL of 'image'.
+        If the 'detail' context is set and the instance has a 'image_detail' attribute, it returns the absolute URL of the detail sized 'image_detail'.
+        If the instance has a 'image' attribute, it returns the absolute URL of the feed sized 'image'.
         If the instance has a 'image_url' attribute, it returns 'image_url'.
         Otherwise, it returns the default image URL for the source of the article.
         """
         if self.context.get("detail", None) and instance.image_detail:
-            return self.context["request"].build_absolute_uri(instance.image_detail.url)
+            return self.context["request"].build_absolute_uri(get_sized_url(instance.image_detail, "detail"))
         elif instance.image:
-            return self.context["request"].build_absolute_uri(instance.image.url)
+            return self.context["request"].build_absolute_uri(get_sized_url(instance.image, "feed"))
         elif instance.image_url:
             return instance.image_url
         else:
@@ -419,6 +490,7 @@ class ArticleListSerializer(ArticleBaseSerializer):
             "bookmarked",
             "bookmarked_count",
         )
+        list_serializer_class = ArticleFragmentListSerializer
 
 
 class ArticleBookmarkedArchivedSerializer(ArticleBaseSerializer):
@@ -433,6 +505,7 @@ class ArticleBookmarkedArchivedSerializer(ArticleBaseSerializer):
             "archived",
             "bookmarked",
         )
+        list_serializer_class = ArticleFragmentListSerializer
 
 
 class PaginatedArticleBookmarkedArchivedSerializer(serializers.Serializer):
@@ -498,27 +571,6 @@ class PaginatedArticleRetrieveSerializer(serializers.Serializer):
     results = ArticleRetrieveSerializer(many=True)
 
 
-def get_is_hot_queryset(exclude_article_ids, oldest_date, area_id=3):
-    """Get a queryset containing recent articles flagge "is_hot".
-
-    Args:
-        exclude_article_ids (list): article ids to be excluded
-        oldest_date (date): oldes date for articles
-
-    Returns:
-        queryset
-    """
-    return (
-        Article.objects.filter(is_hot=True)
-        .exclude(id__in=exclude_article_ids)
-        .exclude(source__active=False)
-        .exclude(source__organization__active=False)
-        .filter(date__gte=oldest_date.strftime("%Y-%m-%d"))
-        .filter(area=area_id)
-        .order_by("-date")
-    )
-
-
         
        
 class ArticleViewSet(BaseViewSet):
@@ -538,6 +590,8 @@ class ArticleViewSet(BaseViewSet):
     ordering_fields = ["date"]
     ordering = ["-date"]
     pagination_class = UserPagination
+    # see content.query_budget
+    query_budget = {"list": 25}
 
     def get_limited_queryset(self, device_id, exclude_ids=[], use_basefilter=True):
         """
@@ -572,37 +626,18 @@ class ArticleViewSet(BaseViewSet):
         if not use_basefilter:
             self.filter_backends = [DeviceIdFilter, SourceActiveFilter]
 
-        # Define the queryset
-        self.queryset = Article.objects.filter(published=True)
+        # Define the queryset with the relations the list serializer shows
+        self.queryset = (
+            Article.objects.filter(published=True)
+            .select_related("source__organization")
+            .prefetch_related("tags")
+        )
         queryset = self.filter_queryset(self.get_queryset())
 
-        # Get or create the AppUser object for the given device id
-        app_user, created = AppUser.objects.get_or_create(device_id=device_id)
-
-        # Try to get the user's area id, if it doesn't exist, set it to 3
-        try:
-            user_area = app_user.area
-            area_id = user_area.__dict__["id"]
-        except:
-            area_id = 3
-
-        # If the AppUser object was just created, assign all tags and active organizations to the user
-        if created:
-            # Assign all tags to the user if they don't have any
-            user_tags = app_user.tags.values()
-            if len(user_tags) == 0:
-                all_tags = Tag.objects.all().values()
-                for tag in all_tags:
-                    app_user.tags.add(tag["id"])
-                app_user.save()
-
-            # Assign all active organizations to the user if they don't have any
-            user_organisations = app_user.organization.values()
-            if len(user_organisations) == 0:
-                all_organisations = Organization.objects.filter(active=True).values()
-                for org in all_organisations:
-                    app_user.organization.add(org["id"])
-                app_user.save()
+        # Reads never create the AppUser, unknown devices get the default area
+        area_id = 3
+        if app_user is not None and app_user.area_id is not None:
+            area_id = app_user.area_id
 
         # Exclude bookmarked and archived articles, filter by area and date
         queryset = (
@@ -612,6 +647,7 @@ class ArticleViewSet(BaseViewSet):
         )
         return queryset, exclude_article_ids, oldest_date
 
+    @method_decorator(compress_response("article_feed"))
     @swagger_auto_schema(
         manual_parameters=[
             string_parameter(
@@ -633,7 +669,15 @@ class ArticleViewSet(BaseViewSet):
         ]
         + [
             header_string_parameter("X-Device-ID", "Device ID", required=True),
-        ],
+            header_string_parameter(
+                "X-Client-Version",
+                "Client version, newer clients are paged with a cursor",
+            ),
+            string_parameter(
+                "cursor", "Cursor of the next page, replaces offset and count"
+            ),
+        ]
+        + SHAPE_PARAMETERS,
         operation_description="""List published articles.\n
         If any of the parameters "search, tag, organization_all_tags, organization" is supplied
          then no articles flagged as "is_hot" will be inserted as the first article.
@@ -676,46 +720,84 @@ class ArticleViewSet(BaseViewSet):
             area_id = 3
 
         # Assign all tags and active organizations to the user if they don't have any
-        user_tags = app_user.tags.values()
-        if len(user_tags) == 0:
-            all_tags = Tag.objects.all().values()
-            for tag in all_tags:
-                app_user.tags.add(tag["id"])
-        user_organisations = app_user.organization.values()
-        if len(user_organisations) == 0:
-            all_organisations = Organization.objects.filter(active=True).values()
-            for org in all_organisations:
-                try:
-                    app_user.organization.add(org["id"])
-                except Exception as e:
-                    logger.error(e)
-            app_user.save()
+        if app_user is not None:
+            ensure_default_preferences(app_user)
 
         # Get the hottest article if it exists and the "is_hot" flag is not ignored
         hottest = None
-        is_hot_queryset = get_is_hot_queryset(exclude_article_ids, oldest_date, area_id)
-        if len(is_hot_queryset) > 0 and not ignore_is_hot:
-            hottest = is_hot_queryset[0]
+        if not ignore_is_hot:
+            hot_article_id = get_hot_article_id(area_id, oldest_date, exclude_article_ids)
+            if hot_article_id is not None:
+                hottest = (
+                    Article.objects.filter(id=hot_article_id)
+                    .select_related("source__organization")
+                    .prefetch_related("tags")
+                    .first()
+                )
+        if hottest is not None:
             queryset = queryset.exclude(id=hottest.id)
-            querysetlist = list(queryset)
-            for element in querysetlist:
-                element.is_hot = False
-            articles = [hottest] + querysetlist
-            page = self.paginate_queryset(articles)
+
+        if use_keyset_pagination(self.request):
+            self.pagination_class = ArticleKeysetPagination
+            page = self.paginator.paginate_queryset(
+                queryset, self.request, view=self, first=hottest
+            )
+            # the paginator puts the hot article only at the top of the first page
+            has_hottest = bool(page) and hottest is not None and page[0].id == hottest.id
+            for article in page[1 if has_hottest else 0:]:
+                article.is_hot = False
+        elif hottest is not None:
+            page = self.paginate_queryset(HotFirstQuerySet(hottest, queryset))
         else:
             page = self.paginate_queryset(queryset)
 
+        # Answer polling clients from the validators before anything is serialized
+        etag = self.get_feed_etag(page, app_user)
+        response = not_modified(self.request, etag=etag)
+        if response is not None:
+            return response
+
         # Increment request_count for each article in the queryset
         queryset.update(request_count=F('request_count') + 1)
 
-        # Serialize the page and return the paginated response
+        # Serialize the page and return the paginated response, the tags
+        # are flagged with the selection of the user
+        context = self.get_serializer_context()
+        context["app_user"] = app_user
         if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+            serializer = self.get_serializer(page, many=True, context=context)
+            response = self.get_paginated_response(serializer.data)
+        else:
+            # Serialize the queryset and return the response
+            serializer = self.get_serializer(queryset, many=True, context=context)
+            response = Response(serializer.data)
+        return set_validators(add_side_loaded(response, context["shape"], app_user), etag)
 
-        # Serialize the queryset and return the response
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+    def get_feed_etag(self, page, app_user):
+        """Build the ETag of a feed page from the rows of the page.
+
+        The articles version changes whenever an article is edited, the ids
+        of the page and the total count or the next cursor whenever an article
+        enters or drops out of the page, without counting the whole feed.
+
+        Args:
+            page (list): articles of the page, the hot article first
+            app_user (AppUser): app user or None
+
+        Returns:
+            str
+        """
+        return make_etag(
+            self.request.get_full_path(),
+            get_version("articles"),
+            get_version("fragments"),
+            [article.id for article in page],
+            getattr(self.paginator, "count", None),
+            getattr(self.paginator, "has_next", None),
+            get_related_fingerprint(app_user, "bookmarked_articles"),
+            get_related_fingerprint(app_user, "archived_articles"),
+            get_tags_fingerprint(app_user),
+        )
 
     # Define the get_serializer_class method, which returns the appropriate serializer class based on the action
     def get_serializer_class(self):
@@ -723,6 +805,38 @@ class ArticleViewSet(BaseViewSet):
         if action == "list":
             self.serializer_class = ArticleListSerializer
         return super().get_serializer_class()
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            header_string_parameter("X-Device-ID", "Device ID", required=True),
+        ],
+        responses={304: "Not modified", 404: "No such article."},
+    )
+    def retrieve(self, request, *args, **kwargs):
+        # Unknown ids are answered with 404 before their version key is created,
+        # request_count is only counted for answers with a body
+        article = generics.get_object_or_404(self.get_queryset(), pk=kwargs.get("pk"))
+        self.check_object_permissions(request, article)
+        app_user = get_appuser(request.headers.get("X-Device-ID", None))
+        last_modified = version_datetime(get_version("article:{}".format(article.id)))
+        etag = make_etag(
+            article.id,
+            last_modified,
+            get_version("fragments"),
+            bool(app_user) and is_related(app_user, "bookmarked_articles", article.id),
+            get_related_fingerprint(app_user, "archived_articles"),
+            Article.articles_bookmarked.through.objects.filter(
+                article_id=article.id
+            ).count(),
+        )
+        response = not_modified(request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            return response
+        Article.objects.filter(id=article.id).update(request_count=F("request_count") + 1)
+        article.request_count += 1
+        return set_validators(
+            Response(self.get_serializer(article).data), etag, last_modified
+        )
    
     # define a swagger auto schema for a delete method and also the delete method   
     @swagger_auto_schema(
@@ -1023,7 +1137,8 @@ class ArticleViewSet(BaseViewSet):
             integer_parameter(
                 "offset", "The initial index from which to return the results."
             ),
-        ],
+        ]
+        + SHAPE_PARAMETERS,
         responses={
             200: PaginatedArticleRetrieveSerializer,
             400: "Device ID missing.",
@@ -1054,6 +1169,17 @@ class ArticleAppUserBaseViewSet(AppUserBaseViewSet):
         DeviceIdFilter,  # Additional filter backend for filtering by device id
     ]
 
+def get_related_list_queryset():
+    """Get the queryset for bookmarked / archived articles with the serializer's relations.
+
+    Returns:
+        queryset
+    """
+    return Article.objects.select_related("source__organization").prefetch_related(
+        "tags", "area"
+    )
+
+
 class ArticlePagination(PageNumberPagination):
     page_query_param = 'offset'
     page_size = 10  # Set the page size to your preference
@@ -1100,23 +1226,17 @@ class ArticleArchiveViewSet(GenericViewSet):
         if not app_user:
             return Response({"detail": "App user not found."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Retrieve archived articles
-        archived_articles = app_user.archived_articles.all()
-
-        # Make a queryset out of the archived articles
-        queryset = Article.objects.filter(id__in=[article.id for article in archived_articles])
-
-        # Paginate the queryset
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            # If pagination is applied, serialize the paginated data
-            serializer = self.get_serializer(page, many=True)
-            # Return the paginated response
+        # Page through the through table, newest first
+        page, paginated = paginate_related(
+            self, app_user, "archived_articles", get_related_list_queryset()
+        )
+        context = self.get_serializer_context()
+        context["bookmarked_ids"] = filter_related_ids(
+            app_user, "bookmarked_articles", [obj.id for obj in page]
+        )
+        serializer = self.get_serializer(page, many=True, context=context)
+        if paginated:
             return self.get_paginated_response(serializer.data)
-
-        # If no pagination is applied, serialize the full queryset
-        serializer = self.get_serializer(queryset, many=True)
-        # Return the full response
         return Response(serializer.data)
 
     @swagger_auto_schema(
@@ -1149,7 +1269,9 @@ class ArticleArchiveViewSet(GenericViewSet):
             A response indicating the article was added to archive.
         """
         article_id = kwargs.get('pk')
-        app_user = get_appuser(request.META.get('HTTP_X_DEVICE_ID'))
+        device_id = request.META.get('HTTP_X_DEVICE_ID')
+        # the first write of a device creates its AppUser
+        app_user = get_or_create_appuser(device_id)[0] if device_id else None
         if not app_user:
             return Response("Invalid Device ID", status=status.HTTP_400_BAD_REQUEST)
         
@@ -1161,7 +1283,7 @@ class ArticleArchiveViewSet(GenericViewSet):
         # if article not found return 404
         if not article:
             return Response("Article not found", status=status.HTTP_404_NOT_FOUND)
-        app_user.archived_articles.add(article)
+        add_related(app_user, "archived_articles", [article.id])
         return Response(status=status.HTTP_201_CREATED)
     
     @swagger_auto_schema(
@@ -1195,10 +1317,8 @@ class ArticleArchiveViewSet(GenericViewSet):
         if not app_user:
             return Response("Invalid Device ID", status=status.HTTP_400_BAD_REQUEST)
         
-        if article not in app_user.archived_articles.all():
+        if not remove_related(app_user, "archived_articles", [article.id]):
             return Response("Article not found", status=status.HTTP_404_NOT_FOUND)
-        
-        app_user.archived_articles.remove(article)
         return Response("Removed from archive", status=status.HTTP_204_NO_CONTENT)
 
 # Define an empty serializer
@@ -1257,23 +1377,15 @@ class ArticleBookmarksViewSet(GenericViewSet):
         if not app_user:
             return Response({"detail": "App user not found."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Retrieve bookmarked articles
-        bookmarked_articles = app_user.bookmarked_articles.all()
-
-        # Make a queryset out of the bookmarked articles
-        queryset = Article.objects.filter(id__in=[article.id for article in bookmarked_articles])
-
-        # Paginate the queryset
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            # If pagination is applied, serialize the paginated data
-            serializer = self.get_serializer(page, many=True)
-            # Return the paginated response
+        # Page through the through table, newest first
+        page, paginated = paginate_related(
+            self, app_user, "bookmarked_articles", get_related_list_queryset()
+        )
+        context = self.get_serializer_context()
+        context["bookmarked_ids"] = {obj.id for obj in page}
+        serializer = self.get_serializer(page, many=True, context=context)
+        if paginated:
             return self.get_paginated_response(serializer.data)
-
-        # If no pagination is applied, serialize the full queryset
-        serializer = self.get_serializer(queryset, many=True)
-        # Return the full response
         return Response(serializer.data)
 
     @swagger_auto_schema(
@@ -1305,7 +1417,9 @@ class ArticleBookmarksViewSet(GenericViewSet):
             return None
 
         article_id = kwargs.get('pk')
-        app_user = get_appuser(request.META.get('HTTP_X_DEVICE_ID'))
+        device_id = request.META.get('HTTP_X_DEVICE_ID')
+        # the first write of a device creates its AppUser
+        app_user = get_or_create_appuser(device_id)[0] if device_id else None
         if not app_user:
             return Response("Invalid Device ID", status=status.HTTP_400_BAD_REQUEST)
         
@@ -1316,7 +1430,7 @@ class ArticleBookmarksViewSet(GenericViewSet):
         # if article not found return 404
         if not article:
             return Response("Article not found", status=status.HTTP_404_NOT_FOUND)
-        app_user.bookmarked_articles.add(article)
+        add_related(app_user, "bookmarked_articles", [article.id])
 
         logger.error(f"Article {article_id} added to bookmarks for user {app_user.device_id}")
         
@@ -1353,10 +1467,8 @@ class ArticleBookmarksViewSet(GenericViewSet):
         if not app_user:
             return Response("Invalid Device ID", status=status.HTTP_400_BAD_REQUEST)
         
-        if article not in app_user.bookmarked_articles.all():
+        if not remove_related(app_user, "bookmarked_articles", [article.id]):
             return Response("Article not found", status=status.HTTP_404_NOT_FOUND)
-        
-        app_user.bookmarked_articles.remove(article)
         return Response("Removed from bookmarks", status=status.HTTP_204_NO_CONTENT)
 
 
@@ -1405,17 +1517,8 @@ class ArticleFlagViewSet(viewsets.ViewSet):
             except: 
                 pass            
             
-            # Create a MIMEText object with the email content
-            email = MIMEText(message, 'html')
-            email['Subject'] = subject
-            email['From'] = sender_email
-            email['To'] = receiver_email
-            
-            # Connect to the SMTP server and send the email
-            with smtplib.SMTP(settings.MAIL_SENDING['EMAIL_HOST'], settings.MAIL_SENDING['EMAIL_PORT']) as server:
-                server.starttls()
-                server.login(settings.MAIL_SENDING['EMAIL_HOST_USER'], settings.MAIL_SENDING['EMAIL_HOST_PASSWORD'])
-                server.sendmail(sender_email, receiver_email, email.as_string())
+            # Queue the email, it is sent by the mail worker
+            queue_mail(subject, message, [receiver_email], from_email=sender_email, html=True)
 
         except Exception as e:
             return Response(data={"message": f"Error sending confirmation email: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
@@ -1426,6 +1529,7 @@ class ArticleTagReceiveViewSet(viewsets.ViewSet):
     queryset = Tag.objects.all()
 
     # route that returns all possible tags for an article
+    @method_decorator(compress_response("article_tags"))
     @swagger_auto_schema(
         manual_parameters=[
             header_string_parameter("X-Device-ID", "Device ID", required=True),
@@ -1437,23 +1541,26 @@ class ArticleTagReceiveViewSet(viewsets.ViewSet):
     )
     def get_all_tags(self, request, *args, **kwargs):
 
-        try:
-            # Ermitteln des AppUser anhand der device_id
-            device_id = request.headers.get("X-Device-ID")
-            app_user = get_appuser(device_id)
+        # Ermitteln des AppUser anhand der device_id, die Tags sind mit seiner Auswahl markiert
+        device_id = request.headers.get("X-Device-ID")
+        app_user = get_appuser(device_id)
+        etag = make_etag(get_taxonomy_version(), get_tags_fingerprint(app_user))
+        response = not_modified(request, etag=etag)
+        if response is not None:
+            return response
 
+        try:
             # Tags abrufen
-            tags = Tag.objects.filter(color="")
-            tags = tags.order_by('name')
-            tags = sorted(tags, key=lambda tag: tag.name if tag.name != "andere Sportarten" else "Fußball" + tag.name)
+            tags = get_rendered_taxonomy("article_tags", build_article_tags).data
 
-            # Serialisierung der Tags mit dem zusätzlichen Feld "selected"
-            serializer = ArticleTagsSerializer(tags, many=True, context={'app_user': app_user})
+            # Markieren der Tags mit der Auswahl des AppUsers
+            selected_ids = get_selected_tag_ids(app_user) if app_user else set()
+            data = [dict(tag, selected=tag["id"] in selected_ids) for tag in tags]
 
         except Exception as e:
             return Response(data={"message": f"Error retrieving tags: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response(serializer.data)
+        return set_validators(Response(data), etag)
     
 
 class CombinedViewSetArticle(BaseViewSet):
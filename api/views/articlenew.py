@@ -16,6 +16,12 @@ from .util import (
 )
 from content.models import AppUser, Article, Tag, Organization
 from content.choices import ORGANIZATION_TYPE_CHOICES
+from content.preferences import (
+    ensure_default_preferences,
+    get_organization_all_tags_ids,
+    get_selected_organization_ids,
+    get_selected_tag_ids,
+)
 from .article_event_shared import (
     AppUserBaseViewSet,
     BaseViewSet,
@@ -137,20 +143,16 @@ class ArticleFilter(df.FilterSet):
 
         # If the user exists, apply filters based on the user's preferences
         if appuser:
+            user_values = {
+                "organization": get_selected_organization_ids(appuser),
+                # ignore event tags
+                "tags": get_selected_tag_ids(appuser, exclude_category_ids=[2]),
+                "organization_all_tags": get_organization_all_tags_ids(appuser),
+            }
             for name in queries:
                 _filter = self.filters[name]
                 lookup = "{}__{}".format(_filter.field_name, _filter.lookup_expr)
-                # ignore event tags
-                if name == "tags":
-                    value = [
-                        str(_attr.id)
-                        for _attr in getattr(appuser, name).all().exclude(category_id=2)
-                        if _attr
-                    ]
-                else:
-                    value = [
-                        str(_attr.id) for _attr in getattr(appuser, name).all() if _attr
-                    ]
+                value = [str(_id) for _id in sorted(user_values[name])]
                 if value is not None and value:
                     user_queries[name] = Q(**{lookup: value})
 
@@ -525,22 +527,7 @@ class ArticleViewSet(BaseViewSet):
 
         # If the AppUser object was just created, assign all tags and active organizations to the user
         if created:
-            # Assign all tags to the user if they don't have any
-            user_tags = app_user.tags.values()
-            if len(user_tags) == 0:
-                all_tags = Tag.objects.all().values()
-                for tag in all_tags:
-                    app_user.tags.add(tag["id"])
-                app_user.save()
-
-            # Assign all active organizations to the user if they don't have any
-            user_organisations = app_user.organization.values()
-            if len(user_organisations) == 0:
-                logger.error("user has no organisations")
-                all_organisations = Organization.objects.filter(active=True).values()
-                for org in all_organisations:
-                    app_user.organization.add(org["id"])
-                app_user.save()
+            ensure_default_preferences(app_user)
 
         # Exclude bookmarked and archived articles, filter by area and date
         queryset = (
@@ -586,21 +573,7 @@ class ArticleViewSet(BaseViewSet):
             area_id = 3
 
         # Assign all tags and active organizations to the user if they don't have any
-        user_tags = app_user.tags.values()
-        if len(user_tags) == 0:
-            all_tags = Tag.objects.all().values()
-            for tag in all_tags:
-                app_user.tags.add(tag["id"])
-        user_organisations = app_user.organization.values()
-        if len(user_organisations) == 0:
-            logger.error("user has no organisations")
-            all_organisations = Organization.objects.filter(active=True).values()
-            for org in all_organisations:
-                try:
-                    app_user.organization.add(org["id"])
-                except Exception as e:
-                    logger.error(e)
-            app_user.save()
+        ensure_default_preferences(app_user)
 
         # Get the hottest article if it exists and the "is_hot" flag is not ignored
         hottest = None
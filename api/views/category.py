@@ -1,9 +1,14 @@
 from drf_yasg.utils import swagger_auto_schema, swagger_serializer_method
+from django.utils.decorators import method_decorator
 from rest_framework import viewsets, mixins, serializers
 from rest_framework.response import Response
 
+from content.appusers import get_appuser
 from content.models import Category, Tag
-from .util import bad_request, header_string_parameter
+from content.preferences import get_selected_tag_ids, get_tags_fingerprint, is_tag_selected
+from content.taxonomy import get_rendered_taxonomy, get_taxonomy_version
+from .compression import compress_response
+from .util import bad_request, header_string_parameter, make_etag, not_modified, set_validators
 
 
 class CategoryTagsSerializer(serializers.ModelSerializer):
@@ -12,13 +17,15 @@ class CategoryTagsSerializer(serializers.ModelSerializer):
 
     @swagger_serializer_method(serializers.BooleanField)
     def get_is_selected(self, instance):
-        device_id = self.context.get('device_id', None)
-        if device_id:
-            is_selected = bool(instance.appusers_tags.filter(device_id=device_id))
-        else:
-            is_selected = False
+        selected_tag_ids = self.context.get('selected_tag_ids', None)
+        if selected_tag_ids is not None:
+            return instance.id in selected_tag_ids
 
-        return is_selected
+        device_id = self.context.get('device_id', None)
+        app_user = get_appuser(device_id) if device_id else None
+        if app_user is None:
+            return False
+        return is_tag_selected(app_user, instance.id)
 
     class Meta:
         model = Tag
@@ -46,6 +53,7 @@ class BaseCategoryViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
 
+    @method_decorator(compress_response('categories'))
     @swagger_auto_schema(
         manual_parameters=[
             header_string_parameter('X-Device-ID', 'Device ID', required=True),
@@ -59,19 +67,48 @@ class BaseCategoryViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
         device_id = request.headers.get('X-Device-ID', None)
         if device_id is None:
             return bad_request('Device ID is missing')
-        queryset = self.filter_queryset(self.get_queryset())
 
-        serializer = CategorySerializer(queryset.exclude(
-            id__in=exclude_category_ids
-        ), many=True, context={'device_id': device_id})
+        # the tags are flagged with the selection of the device
+        app_user = get_appuser(device_id)
+        etag = make_etag(
+            get_taxonomy_version(),
+            exclude_category_ids,
+            get_tags_fingerprint(app_user),
+        )
+        response = not_modified(request, etag=etag)
+        if response is not None:
+            return response
+
+        categories = get_rendered_taxonomy(
+            'categories:{}'.format(','.join(map(str, sorted(exclude_category_ids)))),
+            lambda: self.build_list(exclude_category_ids),
+        ).data
+
+        selected_ids = get_selected_tag_ids(app_user) if app_user else set()
+        data = [
+            dict(category, tags=[
+                dict(tag, is_selected=tag['id'] in selected_ids) for tag in category['tags']
+            ])
+            for category in categories
+        ]
+        return set_validators(Response(data), etag)
+
+    def build_list(self, exclude_category_ids):
+        """Build the categories payload of the taxonomy cache, without selection.
+
+        Args:
+            exclude_category_ids (list): ids of categories left out
+
+        Returns:
+            list: serialized categories with their tags sorted by name
+        """
+        queryset = self.get_queryset().exclude(id__in=exclude_category_ids).prefetch_related('tags')
+        categories = CategorySerializer(queryset, many=True).data
 
         # sort tags by name
-        sorted_serializer_data = []
-        for category in serializer.data:
+        for category in categories:
             category['tags'] = sorted(category['tags'], key=lambda _dict: _dict['name'])
-            sorted_serializer_data.append(category)
-
-        return Response(sorted_serializer_data)
+        return categories
 
 
 class CategoryViewSet(BaseCategoryViewSet):
@@ -0,0 +1,170 @@
+import gzip
+import re
+from functools import wraps
+from hashlib import md5
+from logging import getLogger
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+
+from content.metrics import count_cache_lookup
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+logger = getLogger(__name__)
+
+# Responses are compressed by the views themselves, the front proxy passes
+# them on as they are. Shared responses (taxonomies, the OpenAPI schema)
+# are compressed once: the compressed bytes are cached under the digest of
+# the body, so every identical body is served from the cache.
+COMPRESSION_MIN_LENGTH = getattr(settings, "COMPRESSION_MIN_LENGTH", 500)
+COMPRESSION_CACHE_TIMEOUT = getattr(settings, "COMPRESSION_CACHE_TIMEOUT", 60 * 60 * 24)
+# route name -> levels per encoding, overrides the levels of the views,
+# e.g. {"article_feed": {"br": 4, "gzip": 5}}
+COMPRESSION_LEVELS = getattr(settings, "COMPRESSION_LEVELS", {})
+COMPRESSED_CACHE_KEY = "compressed:{}:{}:{}"
+
+DEFAULT_LEVELS = {"br": 5, "gzip": 6}
+MAX_LEVELS = {"br": 11, "gzip": 9}
+# the schema is compressed once per deployment, so spend the time
+SCHEMA_COMPRESSION_LEVEL = MAX_LEVELS
+COMPRESSIBLE_TYPES = ("application/json", "application/openapi", "text/", "application/javascript")
+
+accept_encoding_re = re.compile(r"\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*")
+
+
+def get_encodings():
+    # in order of preference
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(accept_encoding):
+    """Choose the preferred encoding a client accepts.
+
+    Args:
+        accept_encoding (str): Accept-Encoding header
+
+    Returns:
+        str: "br", "gzip" or None
+    """
+    weights = {}
+    for part in accept_encoding.split(","):
+        match = accept_encoding_re.fullmatch(part)
+        if match is None:
+            continue
+        try:
+            weights[match.group(1).lower()] = float(match.group(2) or 1)
+        except ValueError:
+            continue
+    best = None
+    for encoding in get_encodings():
+        weight = weights.get(encoding, weights.get("*", 0))
+        if weight > 0 and (best is None or weight > best[1]):
+            best = (encoding, weight)
+    return best[0] if best else None
+
+
+def compress(content, encoding, level):
+    """Compress a response body.
+
+    Args:
+        content (bytes): body
+        encoding (str): "br" or "gzip"
+        level (int): compression level, clamped to the range of the encoding
+
+    Returns:
+        bytes
+    """
+    level = max(1, min(level, MAX_LEVELS[encoding]))
+    if encoding == "br":
+        return brotli.compress(content, quality=level)
+    # mtime=0 keeps the bytes of identical bodies identical
+    return gzip.compress(content, compresslevel=level, mtime=0)
+
+
+def get_compressed(content, encoding, level, shared):
+    if not shared:
+        return compress(content, encoding, level)
+    key = COMPRESSED_CACHE_KEY.format(encoding, level, md5(content).hexdigest())
+    compressed = cache.get(key)
+    count_cache_lookup("compressed", compressed is not None)
+    if compressed is None:
+        compressed = compress(content, encoding, level)
+        cache.set(key, compressed, COMPRESSION_CACHE_TIMEOUT)
+    return compressed
+
+
+def is_compressible(response):
+    if response.streaming or response.status_code != 200:
+        return False
+    if response.has_header("Content-Encoding") or len(response.content) < COMPRESSION_MIN_LENGTH:
+        return False
+    content_type = response.get("Content-Type", "")
+    return any(content_type.startswith(prefix) for prefix in COMPRESSIBLE_TYPES)
+
+
+def compress_rendered(request, response, name, level, shared):
+    """Compress a rendered response in place if the client accepts it.
+
+    Args:
+        request (HttpRequest): current request
+        response (HttpResponse): rendered response
+        name (str): route name for COMPRESSION_LEVELS
+        level (dict): encoding -> level of the route
+        shared (bool): cache the compressed bytes for identical bodies
+    """
+    patch_vary_headers(response, ("Accept-Encoding",))
+    if not is_compressible(response):
+        return
+    encoding = choose_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+    if encoding is None:
+        return
+
+    level = COMPRESSION_LEVELS.get(name, level).get(encoding, DEFAULT_LEVELS[encoding])
+    compressed = get_compressed(response.content, encoding, level, shared)
+    if len(compressed) >= len(response.content):
+        return
+    response.content = compressed
+    response["Content-Length"] = str(len(compressed))
+    response["Content-Encoding"] = encoding
+    # the compressed bytes differ, a strong ETag becomes weak like in GZipMiddleware
+    etag = response.get("ETag")
+    if etag and etag.startswith('"'):
+        response["ETag"] = "W/" + etag
+
+
+def compress_response(name, level=None, shared=False):
+    """Decorate a view to compress its response with brotli or gzip.
+
+    Use method_decorator for methods of view sets. DRF responses are
+    compressed after they are rendered.
+
+    Args:
+        name (str): route name, COMPRESSION_LEVELS[name] overrides level
+        level (dict): encoding -> level, DEFAULT_LEVELS for missing encodings
+        shared (bool): cache the compressed bytes of identical bodies
+
+    Returns:
+        callable: decorator
+    """
+    level = level or {}
+
+    def decorator(view):
+        @wraps(view)
+        def wrapped_view(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if getattr(response, "is_rendered", True):
+                compress_rendered(request, response, name, level, shared)
+            else:
+                response.add_post_render_callback(
+                    lambda rendered: compress_rendered(request, rendered, name, level, shared)
+                )
+            return response
+
+        return wrapped_view
+
+    return decorator
@@ -2,11 +2,11 @@ from rest_framework import status
 from rest_framework import viewsets, serializers
 from rest_framework.response import Response
 from drf_yasg.utils import swagger_auto_schema
-from django.core.mail import send_mail
 from django.conf import settings
 
 from .util import choices_parameter, header_string_parameter, string_parameter
 from content.choices import FEEDBACK_CONTACT_TYPE_CHOICES
+from content.mail import queue_mail
 
 
 def send_email(data):
@@ -15,7 +15,7 @@ def send_email(data):
 
     subject = "[{}] {}".format(feedack_type, data.data['email'])
     message = "Contact: {} \nMessage: {}".format(data.data['email'], data.data['content'])
-    send_mail(subject, message, 'contact@redaktion.molo.de', [mail_address])
+    queue_mail(subject, message, [mail_address], from_email='contact@redaktion.molo.de', account='default')
 
 
 class ContactSerializer(serializers.Serializer):
@@ -1,6 +1,7 @@
 from django.db.models import Count, Q, Exists, OuterRef, F
 from datetime import datetime, timedelta
 from django.utils.timezone import localtime
+from django.utils.decorators import method_decorator
 from rest_framework import viewsets, serializers, filters
 from rest_framework.viewsets import GenericViewSet
 from drf_yasg.utils import swagger_auto_schema, swagger_serializer_method
@@ -14,8 +15,6 @@ from django.conf import settings
 import jwt
 import pytz
 from rest_framework.pagination import PageNumberPagination
-from email.mime.text import MIMEText
-import smtplib
 
 logger = getLogger(__name__)
 
@@ -26,19 +25,37 @@ from .util import (
     boolean_parameter,
     header_string_parameter,
     isodate_parameter,
+    make_etag,
+    not_modified,
+    set_validators,
+    EventKeysetPagination,
+    use_keyset_pagination,
 )
 from content.models import AppUser, EventV4, Tag, Organization, Source, Event_Occurrence, User, Area
+from content.appusers import get_appuser, get_or_create_appuser
+from content.images import get_sized_url
+from content.mail import queue_mail
+from content.preferences import get_selected_tag_ids, get_tags_fingerprint, is_tag_selected
+from content.taxonomy import get_rendered_taxonomy, get_taxonomy_version
+from content.versions import get_version, version_datetime
 from content.choices import ORGANIZATION_TYPE_CHOICES
 from .util import bad_request
 from drf_yasg import openapi
 
 
+from .compression import compress_response
+from .shaping import SHAPE_PARAMETERS, ShapedSerializerMixin, add_side_loaded
 from .article_event_shared import (
     BaseViewSet,
     AppUserBaseViewSet,
     SourceTypeFilter,
     SourceActiveFilter,
     get_source_default_image_url,
+    add_related,
+    filter_related_ids,
+    get_related_fingerprint,
+    paginate_related,
+    remove_related,
 )
 
 BASE_LIST_FIELDS = (
@@ -71,20 +88,6 @@ FILTER_BASE_FIELDS = [
     "organization_all_tags",
 ]
 
-def get_appuser(device_id):
-    """Try to get an AppUser by device id
-
-    Args:
-        device_id (str): device id string
-
-    Returns:
-        AppUser or None
-    """
-    try:
-        return AppUser.objects.get(device_id=device_id)
-    except AppUser.DoesNotExist:
-        return None
-
 
 class InFilter:
     def __init__(self, field_name, lookup_expr="in"):
@@ -152,13 +155,21 @@ class EventTagsSerializer(serializers.ModelSerializer):
     def get_selected(self, obj):
         app_user = self.context.get("app_user", None)
         if app_user:
-            return app_user.tags.filter(id=obj.id).exists()
+            return is_tag_selected(app_user, obj.id)
         return False
 
 
+def build_event_tags():
+    """Build the event tags payload of the taxonomy cache, without selection.
+
+    Returns:
+        list: dicts with id, name and color
+    """
+    return list(Tag.objects.exclude(color="").order_by('name').values("id", "name", "color"))
+
 
 # Define a serializer class named EventBaseSerializer inheriting from ModelSerializer
-class EventBaseSerializer(serializers.ModelSerializer):
+class EventBaseSerializer(ShapedSerializerMixin, serializers.ModelSerializer):
 
     # Define a nested serializer for tags using EventTagsSerializer, set to read-only, and allowing multiple entries
     tags = EventTagsSerializer(read_only=True, many=True)
@@ -182,6 +193,9 @@ class EventBaseSerializer(serializers.ModelSerializer):
     # Define a method to get the bookmarked status, using a boolean field for Swagger documentation
     @swagger_serializer_method(serializers.BooleanField)
     def get_bookmarked(self, instance):
+        # the bookmark and archive lists know the bookmarked ids of the page
+        if "bookmarked_ids" in self.context:
+            return instance.id in self.context["bookmarked_ids"]
         # get the appuser from the x device id in the header of request
         app_user = get_appuser(self.context.get("request").headers.get("X-Device-ID"))
         if app_user:
@@ -191,9 +205,9 @@ class EventBaseSerializer(serializers.ModelSerializer):
 
     # Define a method to get the image URL
     def get_image_url(self, instance):
-        # If the instance has an image, return the absolute URL
+        # If the instance has an image, return the absolute URL of the feed size
         if instance.image:
-            return self.context["request"].build_absolute_uri(instance.image.url)
+            return self.context["request"].build_absolute_uri(get_sized_url(instance.image, "feed"))
         # If the instance has an image_url, return it
         elif instance.image_url:
             return instance.image_url
@@ -265,7 +279,7 @@ class EventListSerializer(EventBaseSerializer):
     @swagger_serializer_method(serializer_or_field=EventOccurrenceSerializer(many=True))
     def get_occurrences_list(self, obj):
         # This method will fetch the occurrences for the event
-        event_occurrences = Event_Occurrence.objects.filter(event=obj)
+        event_occurrences = obj.occurrences.all()
         return EventOccurrenceSerializer(event_occurrences, many=True).data
     
     # get the bookmarked status of the event out of the m2m database
@@ -276,11 +290,17 @@ class EventListSerializer(EventBaseSerializer):
         """
         This method returns the amount of bookmarks for the event.
         """
+        # the feed counts the bookmarks of the whole page at once
+        if "bookmarked_counts" in self.context:
+            return self.context["bookmarked_counts"].get(instance.id, 0)
         return instance.events_bookmarked.count()
 
     # Define a method to get the bookmarked status, using a boolean field for Swagger documentation
     @swagger_serializer_method(serializers.BooleanField)
     def get_bookmarked(self, instance):
+        # the bookmark and archive lists know the bookmarked ids of the page
+        if "bookmarked_ids" in self.context:
+            return instance.id in self.context["bookmarked_ids"]
         # get the appuser from the x device id in the header of request
         app_user = get_appuser(self.context.get("request").headers.get("X-Device-ID"))
         if app_user:
@@ -331,7 +351,7 @@ class EventRetrieveSerializer(EventBaseSerializer):
 
     def get_occurrences_list(self, obj):
         # This method will fetch the occurrences for the event
-        event_occurrences = Event_Occurrence.objects.filter(event=obj)
+        event_occurrences = obj.occurrences.all()
         return EventOccurrenceSerializer(event_occurrences, many=True).data
     
     @swagger_serializer_method(serializers.IntegerField)
@@ -399,6 +419,8 @@ class EventViewSet(BaseViewSet):
     queryset = EventV4.objects.filter(published=True)
     # Specify the serializer class to be used
     serializer_class = EventListSerializer
+    # Queries per action, see content.query_budget
+    query_budget = {"list": 25}
     # Define the model class associated with this view set
     model_class = EventV4
     # Specify the filter backends to be used for filtering the queryset
@@ -452,6 +474,8 @@ class EventViewSet(BaseViewSet):
                 Q(occurrences__end_datetime__gte=now)
             )
             .distinct()
+            .select_related("source__organization")
+            .prefetch_related("area", "tags", "occurrences")
         )
 
         # Get all events from the base queryset
@@ -469,7 +493,7 @@ class EventViewSet(BaseViewSet):
         # Iterate over each event in the events list
         for event in events:
             # get the areas of the event
-            event_area_ids = event.area.values_list("id", flat=True)
+            event_area_ids = [area.id for area in event.area.all()]
 
             # Flag to check if the event is located in the user's area
             found = False
@@ -520,7 +544,7 @@ class EventViewSet(BaseViewSet):
                 continue
 
             # add all occurrences to the event
-            event_occurrences = Event_Occurrence.objects.filter(event=event)   
+            event_occurrences = event.occurrences.all()
             
             # add a new field to the event object
             event.occurrences_list = list(event_occurrences)
@@ -553,6 +577,7 @@ class EventViewSet(BaseViewSet):
         return event_list, exclude_ids, oldest_date
     
 
+    @method_decorator(compress_response("event_feed"))
     @swagger_auto_schema(
         manual_parameters=[
             string_parameter(
@@ -604,7 +629,15 @@ class EventViewSet(BaseViewSet):
         ]
         + [
             header_string_parameter("X-Device-ID", "Device ID", required=True),
-        ],
+            header_string_parameter(
+                "X-Client-Version",
+                "Client version, newer clients are paged with a cursor",
+            ),
+            string_parameter(
+                "cursor", "Cursor of the next page, replaces offset and count"
+            ),
+        ]
+        + SHAPE_PARAMETERS,
 
         operation_description="""List published events.\n
          """,
@@ -711,21 +744,52 @@ class EventViewSet(BaseViewSet):
         # sort the queryset by start date
         queryset_list = sorted(queryset_list, key=lambda x: x.start_date)
 
+        # Answer polling clients from the validators before anything is serialized
+        app_user = get_appuser(device_id)
+        etag = make_etag(
+            self.request.get_full_path(),
+            get_version("events"),
+            get_version("fragments"),
+            [[event.id, event.start_date] for event in queryset_list],
+            get_related_fingerprint(app_user, "bookmarked_events_v4"),
+            get_related_fingerprint(app_user, "archived_events_v4"),
+        )
+        response = not_modified(self.request, etag=etag)
+        if response is not None:
+            return response
+
         # Increment request_count for each event in the queryset
         EventV4.objects.filter(id__in=[event.id for event in queryset_list]).update(request_count=F('request_count') + 1)
 
-        # Paginate the queryset
+        # Paginate the queryset, newer clients page with a cursor
+        if use_keyset_pagination(self.request):
+            self.pagination_class = EventKeysetPagination
         page = self.paginate_queryset(queryset_list)
+
+        # Bookmark state and counts of the page in two queries instead of two per event
+        event_ids = [event.id for event in (page if page is not None else queryset_list)]
+        context = self.get_serializer_context()
+        context["bookmarked_ids"] = (
+            filter_related_ids(app_user, "bookmarked_events_v4", event_ids) if app_user else set()
+        )
+        context["bookmarked_counts"] = dict(
+            AppUser.bookmarked_events_v4.through.objects.filter(eventv4_id__in=event_ids)
+            .values("eventv4_id")
+            .annotate(count=Count("id"))
+            .values_list("eventv4_id", "count")
+        )
         if page is not None:
             # If pagination is applied, serialize the paginated data
-            serializer = self.get_serializer(page, many=True)
-            # Return the paginated response
-            return self.get_paginated_response(serializer.data)
-        
-        # If no pagination is applied, serialize the full queryset
-        serializer = self.get_serializer(queryset_list, many=True)
-        # Return the full response
-        return Response(serializer.data)
+            serializer = self.get_serializer(page, many=True, context=context)
+            response = self.get_paginated_response(serializer.data)
+        else:
+            # If no pagination is applied, serialize the full queryset
+            serializer = self.get_serializer(queryset_list, many=True, context=context)
+            response = Response(serializer.data)
+        # Return the response with the side-loaded organizations / tags
+        return set_validators(
+            add_side_loaded(response, serializer.context["shape"], get_appuser(device_id)), etag
+        )
     
 
     def get_serializer_class(self):
@@ -760,7 +824,8 @@ class EventViewSet(BaseViewSet):
             integer_parameter(
                 "offset", "The initial index from which to return the results."
             ),
-        ],
+        ]
+        + SHAPE_PARAMETERS,
         responses={
             # Specify the response schema for HTTP 200 status
             200: PaginatedEventRetrieveSerializer,
@@ -1236,10 +1301,24 @@ class EventViewSet(BaseViewSet):
         # Annotate the event with bookmarked and archived status
         event.bookmarked = app_user.bookmarked_events_v4.filter(pk=event.pk).exists()
         event.archived = app_user.archived_events_v4.filter(pk=event.pk).exists()
-        
+
+        # Answer polling clients from the validators before anything is serialized
+        last_modified = version_datetime(get_version("event:{}".format(event.id)))
+        etag = make_etag(
+            event.id,
+            last_modified,
+            get_version("fragments"),
+            event.bookmarked,
+            event.archived,
+            event.events_bookmarked.count(),
+        )
+        response = not_modified(request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            return response
+
         # Serialize the event
         serializer = EventRetrieveSerializer(event, context={"request": request})
-        return Response(serializer.data)
+        return set_validators(Response(serializer.data), etag, last_modified)
 
 
 
@@ -1364,6 +1443,17 @@ class EventAppUserBaseViewSet(AppUserBaseViewSet):
         DeviceIdFilter,
     ]
 
+def get_related_list_queryset():
+    """Get the queryset for bookmarked / archived events with the serializer's relations.
+
+    Returns:
+        queryset
+    """
+    return EventV4.objects.select_related("source__organization").prefetch_related(
+        "tags", "occurrences"
+    )
+
+
 class EventPagination(PageNumberPagination):
     page_query_param = 'offset'
     page_size = 10  # Set the page size to your preference
@@ -1411,23 +1501,17 @@ class EventArchiveViewSet(GenericViewSet):
         if not app_user:
             return Response({"detail": "App user not found."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Retrieve archived events
-        archived_events = app_user.archived_events_v4.all()
-
-        # Make a queryset out of the archived events
-        queryset = EventV4.objects.filter(id__in=[event.id for event in archived_events])
-
-        # Paginate the queryset
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            # If pagination is applied, serialize the paginated data
-            serializer = self.get_serializer(page, many=True)
-            # Return the paginated response
+        # Page through the through table, newest first
+        page, paginated = paginate_related(
+            self, app_user, "archived_events_v4", get_related_list_queryset()
+        )
+        context = self.get_serializer_context()
+        context["bookmarked_ids"] = filter_related_ids(
+            app_user, "bookmarked_events_v4", [obj.id for obj in page]
+        )
+        serializer = self.get_serializer(page, many=True, context=context)
+        if paginated:
             return self.get_paginated_response(serializer.data)
-
-        # If no pagination is applied, serialize the full queryset
-        serializer = self.get_serializer(queryset, many=True)
-        # Return the full response
         return Response(serializer.data)
         
 
@@ -1462,7 +1546,9 @@ class EventArchiveViewSet(GenericViewSet):
             A response indicating the event was added to archive.
         """
         event_id = kwargs.get('pk')
-        app_user = get_appuser(request.META.get('HTTP_X_DEVICE_ID'))
+        device_id = request.META.get('HTTP_X_DEVICE_ID')
+        # the first write of a device creates its AppUser
+        app_user = get_or_create_appuser(device_id)[0] if device_id else None
         if not app_user:
             return Response("Invalid Device ID", status=status.HTTP_400_BAD_REQUEST)
         
@@ -1474,7 +1560,7 @@ class EventArchiveViewSet(GenericViewSet):
         # if event not found return 404
         if not event:
             return Response(status=status.HTTP_404_NOT_FOUND)
-        app_user.archived_events_v4.add(event)
+        add_related(app_user, "archived_events_v4", [event.id])
         return Response(status=status.HTTP_204_NO_CONTENT)
     
     @swagger_auto_schema(
@@ -1508,10 +1594,8 @@ class EventArchiveViewSet(GenericViewSet):
         if not app_user:
             return Response("Invalid Device ID", status=status.HTTP_400_BAD_REQUEST)
         
-        if event not in app_user.archived_events_v4.all():
+        if not remove_related(app_user, "archived_events_v4", [event.id]):
             return Response("Event not found", status=status.HTTP_404_NOT_FOUND)
-        
-        app_user.archived_events_v4.remove(event)
         return Response("Removed from bookmarks", status=status.HTTP_204_NO_CONTENT)
         
 # Define an empty serializer
@@ -1572,25 +1656,15 @@ class EventsBookmarksViewSet(GenericViewSet):
         if not app_user:
             return Response({"detail": "App user not found."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Retrieve bookmarked events
-        bookmarked_events = app_user.bookmarked_events_v4.all()
-
-        #logger.error(f"Bookmarked events: {bookmarked_events}")
-
-        # Make a queryset out of the bookmarked events
-        queryset = EventV4.objects.filter(id__in=[event.id for event in bookmarked_events])
-
-        # Paginate the queryset
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            # If pagination is applied, serialize the paginated data
-            serializer = self.get_serializer(page, many=True)
-            # Return the paginated response
+        # Page through the through table, newest first
+        page, paginated = paginate_related(
+            self, app_user, "bookmarked_events_v4", get_related_list_queryset()
+        )
+        context = self.get_serializer_context()
+        context["bookmarked_ids"] = {obj.id for obj in page}
+        serializer = self.get_serializer(page, many=True, context=context)
+        if paginated:
             return self.get_paginated_response(serializer.data)
-
-        # If no pagination is applied, serialize the full queryset
-        serializer = self.get_serializer(queryset, many=True)
-        # Return the full response
         return Response(serializer.data)
         
 
@@ -1623,7 +1697,9 @@ class EventsBookmarksViewSet(GenericViewSet):
             return None
         
         event_id = kwargs.get('pk')
-        app_user = get_appuser(request.META.get('HTTP_X_DEVICE_ID'))
+        device_id = request.META.get('HTTP_X_DEVICE_ID')
+        # the first write of a device creates its AppUser
+        app_user = get_or_create_appuser(device_id)[0] if device_id else None
         if not app_user:
             return Response("Invalid Device ID", status=status.HTTP_400_BAD_REQUEST)
         
@@ -1632,7 +1708,7 @@ class EventsBookmarksViewSet(GenericViewSet):
         # if event not found return 404
         if not event:
             return Response(status=status.HTTP_404_NOT_FOUND)
-        app_user.bookmarked_events_v4.add(event)
+        add_related(app_user, "bookmarked_events_v4", [event.id])
 
         logger.error(f"Event {event_id} added to bookmarks of user {app_user.id}")
 
@@ -1669,10 +1745,8 @@ class EventsBookmarksViewSet(GenericViewSet):
         if not app_user:
             return Response("Invalid Device ID", status=status.HTTP_400_BAD_REQUEST)
         
-        if event not in app_user.bookmarked_events_v4.all():
+        if not remove_related(app_user, "bookmarked_events_v4", [event.id]):
             return Response("Event not found", status=status.HTTP_404_NOT_FOUND)
-        
-        app_user.bookmarked_events_v4.remove(event)
         return Response("Removed from bookmarks", status=status.HTTP_204_NO_CONTENT)
     
     @swagger_auto_schema(
@@ -1699,7 +1773,9 @@ class EventsBookmarksViewSet(GenericViewSet):
             A response indicating the event was added to bookmarks.
         """
         event_id = kwargs.get('pk')
-        app_user = get_appuser(request.META.get('HTTP_X_DEVICE_ID'))
+        device_id = request.META.get('HTTP_X_DEVICE_ID')
+        # the first write of a device creates its AppUser
+        app_user = get_or_create_appuser(device_id)[0] if device_id else None
         if not app_user:
             return Response("Invalid Device ID", status=status.HTTP_400_BAD_REQUEST)
         
@@ -1708,7 +1784,7 @@ class EventsBookmarksViewSet(GenericViewSet):
         # if event not found return 404
         if not event:
             return Response(status=status.HTTP_404_NOT_FOUND)
-        app_user.bookmarked_events_v4.add(event)
+        add_related(app_user, "bookmarked_events_v4", [event.id])
 
         logger.error(f"Event {event_id} added to bookmarks of user {app_user.id}")
 
@@ -1720,6 +1796,7 @@ class EventTagReceiveViewSet(viewsets.ViewSet):
     queryset = Tag.objects.all()
 
     # route that returns all possible tags for an article
+    @method_decorator(compress_response("event_tags"))
     @swagger_auto_schema(
         manual_parameters=[
             header_string_parameter("X-Device-ID", "Device ID", required=True),
@@ -1730,22 +1807,26 @@ class EventTagReceiveViewSet(viewsets.ViewSet):
         },
     )
     def get_all_event_tags(self, request, *args, **kwargs):
-        try:
-            # Ermitteln des AppUser anhand der device_id
-            device_id = request.headers.get("X-Device-ID")
-            app_user = get_appuser(device_id)
+        # Ermitteln des AppUser anhand der device_id, die Tags sind mit seiner Auswahl markiert
+        device_id = request.headers.get("X-Device-ID")
+        app_user = get_appuser(device_id)
+        etag = make_etag(get_taxonomy_version(), get_tags_fingerprint(app_user))
+        response = not_modified(request, etag=etag)
+        if response is not None:
+            return response
 
+        try:
             # Tags abrufen
-            tags = Tag.objects.exclude(color="")
-            tags = tags.order_by('name')
+            tags = get_rendered_taxonomy("event_tags", build_event_tags).data
 
-            # Serialisierung der Tags mit dem zusätzlichen Feld "selected"
-            serializer = EventTagsSerializer(tags, many=True, context={'app_user': app_user})
+            # Markieren der Tags mit der Auswahl des AppUsers
+            selected_ids = get_selected_tag_ids(app_user) if app_user else set()
+            data = [dict(tag, selected=tag["id"] in selected_ids) for tag in tags]
 
         except Exception as e:
             return Response(data={"message": f"Error retrieving tags: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response(serializer.data)
+        return set_validators(Response(data), etag)
 
 
 class EventFlagViewSet(viewsets.ViewSet):
@@ -1793,17 +1874,8 @@ class EventFlagViewSet(viewsets.ViewSet):
             except: 
                 pass
             
-            # Create a MIMEText object with the email content
-            email = MIMEText(message, 'html')
-            email['Subject'] = subject
-            email['From'] = sender_email
-            email['To'] = receiver_email
-            
-            # Connect to the SMTP server and send the email
-            with smtplib.SMTP(settings.MAIL_SENDING['EMAIL_HOST'], settings.MAIL_SENDING['EMAIL_PORT']) as server:
-                server.starttls()
-                server.login(settings.MAIL_SENDING['EMAIL_HOST_USER'], settings.MAIL_SENDING['EMAIL_HOST_PASSWORD'])
-                server.sendmail(sender_email, receiver_email, email.as_string())
+            # Queue the email, it is sent by the mail worker
+            queue_mail(subject, message, [receiver_email], from_email=sender_email, html=True)
 
         except Exception as e:
             return Response(data={"message": f"Error sending confirmation email: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,106 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models
+from django.utils.translation import get_language
+from rest_framework import serializers
+
+from content.metrics import count_cache_lookup
+from content.versions import get_version, get_versions
+
+# The user independent representation of an object is cached per object
+# version, serializer, host and language. Source, organization and tag
+# changes bump the "fragments" version, which drops all fragments at once.
+FRAGMENT_CACHE_KEY = "fragment:{}:{}:{}"
+FRAGMENT_CACHE_TIMEOUT = getattr(settings, "FRAGMENT_CACHE_TIMEOUT", 60 * 60 * 24)
+FRAGMENTS_VERSION = "fragments"
+
+
+class FragmentListSerializer(serializers.ListSerializer):
+    """List serializer assembling the page from cached fragments.
+
+    Subclasses name the version of an object and overlay the per-user and
+    per-request fields on a copy of each fragment.
+    """
+
+    # e.g. "article:{}", formatted with the object id
+    version_name = None
+
+    def get_overlay_state(self, instances):
+        """Collect what the overlay needs for the whole page.
+
+        Args:
+            instances (list): objects of the page
+
+        Returns:
+            object: passed to overlay
+        """
+        return None
+
+    def overlay(self, data, instance, state):
+        """Set the per-user and per-request fields of one object.
+
+        Args:
+            data (dict): copy of the cached fragment
+            instance (Model): object of the fragment
+            state (object): result of get_overlay_state
+        """
+
+    def get_fields_signature(self):
+        # shaped serializers drop or replace fields
+        fields = ",".join(
+            "{}={}".format(name, type(field).__name__) for name, field in self.child.fields.items()
+        )
+        return md5(fields.encode("utf-8")).hexdigest()[:12]
+
+    def get_fragment_prefix(self):
+        request = self.context["request"]
+        return ":".join(
+            str(part)
+            for part in (
+                type(self.child).__name__,
+                bool(self.context.get("detail")),
+                request.scheme,
+                request.get_host(),
+                get_language(),
+                self.get_fields_signature(),
+                get_version(FRAGMENTS_VERSION),
+            )
+        )
+
+    def to_representation(self, data):
+        if "request" not in self.context:
+            return super().to_representation(data)
+        instances = list(data.all() if isinstance(data, models.Manager) else data)
+        if not instances:
+            return []
+
+        # get_overlay_state may put its id sets into the context, so missing
+        # fragments are built without queries per object as well
+        state = self.get_overlay_state(instances)
+        prefix = self.get_fragment_prefix()
+        versions = get_versions(self.version_name.format(instance.id) for instance in instances)
+        keys = [
+            FRAGMENT_CACHE_KEY.format(
+                prefix, instance.id, versions[self.version_name.format(instance.id)]
+            )
+            for instance in instances
+        ]
+        fragments = cache.get_many(keys)
+        count_cache_lookup("fragments", True, len(fragments))
+        count_cache_lookup("fragments", False, len(keys) - len(fragments))
+
+        missing = {}
+        result = []
+        for key, instance in zip(keys, instances):
+            fragment = fragments.get(key)
+            if fragment is None:
+                fragment = dict(self.child.to_representation(instance))
+                missing[key] = fragment
+            data = dict(fragment)
+            self.overlay(data, instance, state)
+            result.append(data)
+        if missing:
+            cache.set_many(missing, FRAGMENT_CACHE_TIMEOUT)
+        return result
@@ -1,10 +1,14 @@
 from rest_framework import viewsets, serializers, filters
 from drf_yasg.utils import swagger_auto_schema, swagger_serializer_method
+from django.utils.decorators import method_decorator
 import django_filters as df
 from rest_framework.response import Response
+from .compression import compress_response
 
 from .util import MoloVersioning, bad_request, choices_parameter, header_string_parameter
 from content.models import Organization, AppUser
+from content.appusers import get_appuser
+from content.preferences import get_organization_selection
 from content.choices import ORGANIZATION_TYPE_CHOICES, V1_ORGANIZATION_TYPE_CHOICES
 
 
@@ -16,19 +20,6 @@ class OrganizationFilter(df.FilterSet):
         model = Organization
         fields = ['type']
 
-def get_appuser(device_id):
-    """Try to get an AppUser by device id
-
-    Args:
-        device_id (str): device id string
-
-    Returns:
-        AppUser or None
-    """
-    try:
-        return AppUser.objects.get(device_id=device_id)
-    except AppUser.DoesNotExist:
-        return None
 
 class OrganizationActiveFilter(filters.BaseFilterBackend):
 
@@ -59,27 +50,21 @@ class OrganizationSerializer(serializers.ModelSerializer):
 
         is_selected = None
         org_data = self.context.get('org_data', None)
-        device_id = self.context.get('device_id', None)
         if not org_data:
             return None
         selected = instance.id in org_data['selected']
         deselected = instance.id in org_data['deselected']
-        if selected is not None and selected and not deselected:
+        if selected and not deselected:
             is_selected = False
         selected_all_tags = instance.id in org_data['selected_all_tags']
         deselected_all_tags = instance.id in org_data['deselected_all_tags']
-        if selected_all_tags is not None and selected_all_tags and not deselected_all_tags:
+        if selected_all_tags and not deselected_all_tags:
             is_selected = True
 
-        # default to tag selection
+        # default to tag selection, the selection is stored after serialization
         if not selected_all_tags and not selected and not deselected and not deselected_all_tags:
             is_selected = False
-            try:
-                appuser = AppUser.objects.get(device_id=device_id)
-                appuser.organization.add(instance)
-                appuser.save()
-            except AppUser.DoesNotExist:
-                pass
+            org_data['default_selected'].append(instance.id)
 
         return is_selected
 
@@ -107,26 +92,54 @@ class OrganizationViewSet(viewsets.ReadOnlyModelViewSet):
         OrganizationActiveFilter,
     ]
     filterset_class = OrganizationFilter
+    # see content.query_budget
+    query_budget = {"list": 10}
 
     def _get_org_data(self, device_id):
+        """Collect the organization selection of an AppUser as id sets.
 
-        try:
-            app_user = AppUser.objects.get(device_id=device_id)
-            org_data = {
-                "selected": [_org.id for _org in app_user.organization.all()],
-                "deselected": [_org.id for _org in app_user.deselected_organization.all()],
-                "selected_all_tags": [_org.id for _org in app_user.organization_all_tags.all()],
-                "deselected_all_tags": [_org.id for _org in app_user.deselected_organization_all_tags.all()],
-            }
-        except AppUser.DoesNotExist:
-            org_data = {
-                "selected": [],
-                "deselected": [],
-                "selected_all_tags": [],
-                "deselected_all_tags": [],
-            }
+        Args:
+            device_id (str): device id string
+
+        Returns:
+            dict
+        """
+        app_user = get_appuser(device_id)
+        org_data = {
+            "app_user": app_user,
+            "selected": set(),
+            "deselected": set(),
+            "selected_all_tags": set(),
+            "deselected_all_tags": set(),
+            # ids of organizations selected by default while serializing
+            "default_selected": [],
+        }
+        if app_user is None:
+            return org_data
+
+        org_data.update(get_organization_selection(app_user))
         return org_data
 
+    def _save_default_selection(self, org_data):
+        """Store the default selections collected while serializing in one insert.
+
+        Args:
+            org_data (dict): organization data of the AppUser
+        """
+        app_user = org_data["app_user"]
+        # sparse AppUsers select organizations by default without rows
+        if app_user is None or app_user.sparse_preferences or not org_data["default_selected"]:
+            return
+        through = AppUser.organization.through
+        through.objects.bulk_create(
+            [
+                through(appuser=app_user, organization_id=organization_id)
+                for organization_id in set(org_data["default_selected"])
+            ],
+            ignore_conflicts=True,
+        )
+
+    @method_decorator(compress_response('organizations'))
     @swagger_auto_schema(
         manual_parameters=[
             header_string_parameter('X-Device-ID', 'Device ID', required=True),
@@ -142,23 +155,29 @@ class OrganizationViewSet(viewsets.ReadOnlyModelViewSet):
 
         queryset = self.filter_queryset(self.get_queryset()).order_by('name')
 
-        app_user = get_appuser(device_id)
-        user_area = app_user.area
-        area_id = user_area.__dict__['id']
-    
+        # Reads never create the AppUser, unknown devices get the default area
+        app_user = org_data['app_user']
+        area_id = 3
+        if app_user is not None and app_user.area_id is not None:
+            area_id = app_user.area_id
+
         queryset = queryset.filter(area = area_id)
 
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = OrganizationSerializer(page, many=True, context={
-                'orgs_data': org_data,
+                'org_data': org_data,
             })
-            return self.get_paginated_response(serializer.data)
+            data = serializer.data
+            self._save_default_selection(org_data)
+            return self.get_paginated_response(data)
 
         serializer = OrganizationSerializer(queryset, many=True, context={
-            'org_data': org_data, 'device_id': device_id,
+            'org_data': org_data,
         })
-        return Response(serializer.data)
+        data = serializer.data
+        self._save_default_selection(org_data)
+        return Response(data)
 
 
 class OrganizationSerializer_V1(OrganizationSerializer):
@@ -214,7 +233,7 @@ class OrganizationViewSet_V1(OrganizationViewSet):
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = OrganizationSerializer_V1(page, many=True, context={
-                'orgs_data': org_data,
+                'org_data': org_data,
             })
             return self.get_paginated_response(serializer.data)
 
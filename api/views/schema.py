@@ -0,0 +1,134 @@
+from functools import lru_cache, wraps
+from hashlib import md5
+from logging import getLogger
+from pathlib import Path
+from time import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from content.metrics import count_cache_lookup
+from .compression import SCHEMA_COMPRESSION_LEVEL, compress_response
+
+logger = getLogger(__name__)
+
+# Introspecting all view sets for the OpenAPI schema takes seconds, so the
+# rendered schema is generated once per deploy and API version, format and
+# host and served from the cache afterwards. The deploy is identified by
+# SCHEMA_VERSION or else by the sources of the apps the schema is built from.
+# The generate_schema command fills the cache right after a deploy.
+SCHEMA_CACHE_KEY = "schema:{}:{}:{}:{}:{}"
+SCHEMA_CACHE_TIMEOUT = getattr(settings, "SCHEMA_CACHE_TIMEOUT", 60 * 60 * 24 * 30)
+SCHEMA_VERSION = getattr(settings, "SCHEMA_VERSION", None)
+SCHEMA_APPS = ("api", "content")
+# URL namespaces of the API versions
+SCHEMA_NAMESPACES = ("v1", "v2", "v3", "v4")
+SCHEMA_FORMATS = (".json", ".yaml")
+
+
+@lru_cache(maxsize=None)
+def get_deploy_version():
+    """Identify the deployed code the schema is generated from.
+
+    Returns:
+        str: SCHEMA_VERSION or a digest of the sources of SCHEMA_APPS
+    """
+    if SCHEMA_VERSION:
+        return str(SCHEMA_VERSION)
+    digest = md5()
+    for app_label in SCHEMA_APPS:
+        root = Path(apps.get_app_config(app_label).path)
+        for path in sorted(root.rglob("*.py")):
+            if "migrations" in path.parts:
+                continue
+            digest.update(str(path.relative_to(root)).encode("utf-8"))
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+def get_schema_key(namespace, schema_format, scheme, host):
+    return SCHEMA_CACHE_KEY.format(
+        namespace or "", schema_format, scheme, host, get_deploy_version()
+    )
+
+
+def get_schema_format(request, kwargs):
+    # swagger.json / swagger.yaml, or ?format=openapi from the UI pages
+    return kwargs.get("format") or request.GET.get("format")
+
+
+def cached_schema(view):
+    """Decorate a drf_yasg schema view to serve the rendered schema from the cache.
+
+    Requests for the UI pages themselves are passed through.
+
+    Args:
+        view (callable): view of schema_view.without_ui or with_ui
+
+    Returns:
+        callable: view
+    """
+
+    @wraps(view)
+    def wrapped_view(request, *args, **kwargs):
+        schema_format = get_schema_format(request, kwargs)
+        if not schema_format:
+            return view(request, *args, **kwargs)
+
+        resolver_match = getattr(request, "resolver_match", None)
+        key = get_schema_key(
+            resolver_match.namespace if resolver_match else None,
+            schema_format,
+            request.scheme,
+            request.get_host(),
+        )
+        schema = cache.get(key)
+        count_cache_lookup("schema", schema is not None)
+        if schema is None:
+            started = time()
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            if hasattr(response, "render"):
+                response.render()
+            schema = {
+                "content": response.content,
+                "content_type": response["Content-Type"],
+                "etag": '"{}"'.format(md5(response.content).hexdigest()),
+                "generated": int(time()),
+            }
+            cache.set(key, schema, SCHEMA_CACHE_TIMEOUT)
+            logger.info("generated schema %s in %.1fs", key, time() - started)
+
+        response = get_conditional_response(
+            request, etag=schema["etag"], last_modified=schema["generated"]
+        )
+        if response is None:
+            response = HttpResponse(schema["content"], content_type=schema["content_type"])
+        response["ETag"] = schema["etag"]
+        response["Last-Modified"] = http_date(schema["generated"])
+        return response
+
+    return wrapped_view
+
+
+def schema_spec_view(schema_view):
+    """swagger.json / swagger.yaml view of a drf_yasg schema view, cached and compressed."""
+    return compress_response("schema", level=SCHEMA_COMPRESSION_LEVEL, shared=True)(
+        cached_schema(schema_view.without_ui(cache_timeout=0))
+    )
+
+
+def schema_ui_view(schema_view, renderer):
+    """Swagger UI / ReDoc view of a drf_yasg schema view, its schema cached and compressed."""
+    return compress_response("schema", level=SCHEMA_COMPRESSION_LEVEL, shared=True)(
+        cached_schema(schema_view.with_ui(renderer, cache_timeout=0))
+    )
+
+
+def forget_schema(namespace, schema_format, scheme, host):
+    cache.delete(get_schema_key(namespace, schema_format, scheme, host))
@@ -0,0 +1,139 @@
+from collections import namedtuple
+
+from rest_framework import serializers
+
+from content.models import Organization, Tag
+from content.preferences import get_selected_tag_ids
+from .util import choices_parameter, string_parameter
+
+# Clients choose the shape of list items with three query parameters:
+#   fields=id,title,date   only these fields
+#   profile=compact        no bodies, organization and tags as ids
+#   expand=organizations,tags
+#                          items reference organizations / tags by id, the
+#                          page carries them once in a dictionary
+# Without them the full items are returned as before.
+Shape = namedtuple("Shape", ["fields", "compact", "expand"])
+
+FULL_SHAPE = Shape(frozenset(), False, frozenset())
+PROFILES = ("full", "compact")
+SIDE_LOADED = ("organizations", "tags")
+
+# left out of compact items
+COMPACT_OMITTED_FIELDS = (
+    "abstract",
+    "content",
+    "occurrences_list",
+    "source",
+    "areas",
+)
+# carried by the side-loaded organizations instead
+ORGANIZATION_DETAIL_FIELDS = ("organization_name", "organization_type")
+
+SHAPE_PARAMETERS = [
+    string_parameter("fields", "Fields of the items - comma separated | defaults to all"),
+    choices_parameter("profile", PROFILES, 'Item profile (default is "full")'),
+    string_parameter(
+        "expand",
+        'Side-loaded dictionaries - comma separated, "organizations" and/or "tags"',
+    ),
+]
+
+
+def split_parameter(request, name):
+    value = request.query_params.get(name, "")
+    return frozenset(part.strip() for part in value.split(",") if part.strip())
+
+
+def get_shape(request):
+    """Read the requested item shape from the query parameters.
+
+    Args:
+        request (Request): current request
+
+    Returns:
+        Shape
+    """
+    fields = split_parameter(request, "fields")
+    if fields:
+        fields |= {"id"}
+    return Shape(
+        fields,
+        request.query_params.get("profile") == "compact",
+        split_parameter(request, "expand") & set(SIDE_LOADED),
+    )
+
+
+class ShapedSerializerMixin:
+    """Drops the fields left out by the "shape" in the context.
+
+    Dropped fields are never computed, so their method fields don't cost
+    queries either.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        shape = self.context.get("shape", FULL_SHAPE)
+
+        omitted = set()
+        if shape.fields:
+            omitted |= set(self.fields) - shape.fields
+        if shape.compact:
+            omitted |= set(COMPACT_OMITTED_FIELDS)
+        if shape.compact or "organizations" in shape.expand:
+            omitted |= set(ORGANIZATION_DETAIL_FIELDS)
+        for field_name in omitted:
+            self.fields.pop(field_name, None)
+
+        if "tags" in self.fields and (shape.compact or "tags" in shape.expand):
+            self.fields["tags"] = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+
+
+def side_load(items, shape, app_user=None):
+    """Collect the organizations and tags referenced by the items of a page.
+
+    Args:
+        items (list): serialized items
+        shape (Shape): requested shape
+        app_user (AppUser): flags the selected tags, may be None
+
+    Returns:
+        dict: "organizations" and / or "tags", id -> details
+    """
+    side_loaded = {}
+    if "organizations" in shape.expand:
+        organization_ids = {item["organization"] for item in items if item.get("organization")}
+        side_loaded["organizations"] = {
+            organization["id"]: organization
+            for organization in Organization.objects.filter(id__in=organization_ids).values(
+                "id", "name", "type"
+            )
+        }
+    if "tags" in shape.expand:
+        tag_ids = {tag_id for item in items for tag_id in item.get("tags", ())}
+        selected_ids = get_selected_tag_ids(app_user) if app_user else set()
+        side_loaded["tags"] = {
+            tag["id"]: dict(tag, selected=tag["id"] in selected_ids)
+            for tag in Tag.objects.filter(id__in=tag_ids).values("id", "name", "color")
+        }
+    return side_loaded
+
+
+def add_side_loaded(response, shape, app_user=None):
+    """Add the side-loaded dictionaries to a list response.
+
+    Args:
+        response (Response): paginated or plain list response
+        shape (Shape): requested shape
+        app_user (AppUser): flags the selected tags, may be None
+
+    Returns:
+        Response
+    """
+    if not shape.expand:
+        return response
+    if isinstance(response.data, dict):
+        response.data.update(side_load(response.data.get("results", []), shape, app_user))
+    else:
+        response.data = dict(results=response.data, **side_load(response.data, shape, app_user))
+    return response
@@ -0,0 +1,188 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from logging import getLogger
+
+from django.db import transaction
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import serializers, status, viewsets
+from rest_framework.response import Response
+
+from .article_event_shared import add_related, get_m2m_field, remove_related
+from .util import bad_request, header_string_parameter
+from content.appusers import get_or_create_appuser
+from content.models import Article, EventV4
+
+logger = getLogger(__name__)
+
+# request / response key -> AppUser M2M field and related model
+SYNC_RELATIONS = {
+    "article_bookmarks": ("bookmarked_articles", Article),
+    "article_archive": ("archived_articles", Article),
+    "event_bookmarks": ("bookmarked_events_v4", EventV4),
+    "event_archive": ("archived_events_v4", EventV4),
+}
+
+
+class SyncChangesSerializer(serializers.Serializer):
+    added = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    removed = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+
+
+class SyncRequestSerializer(serializers.Serializer):
+    version = serializers.CharField(required=False, allow_blank=True)
+    article_bookmarks = SyncChangesSerializer(required=False)
+    article_archive = SyncChangesSerializer(required=False)
+    event_bookmarks = SyncChangesSerializer(required=False)
+    event_archive = SyncChangesSerializer(required=False)
+
+
+class SyncStateSerializer(serializers.Serializer):
+    full = serializers.BooleanField(help_text="ids is the complete set, otherwise only additions")
+    ids = serializers.ListField(child=serializers.IntegerField())
+
+
+class SyncResponseSerializer(serializers.Serializer):
+    version = serializers.CharField()
+    article_bookmarks = SyncStateSerializer()
+    article_archive = SyncStateSerializer()
+    event_bookmarks = SyncStateSerializer()
+    event_archive = SyncStateSerializer()
+
+
+def encode_version(versions):
+    return urlsafe_b64encode(json.dumps(versions).encode("ascii")).decode("ascii")
+
+
+def decode_version(version):
+    """Decode a client version token.
+
+    Unknown or broken tokens are ignored, the client then gets full sets.
+
+    Args:
+        version (str): token of a previous sync
+
+    Returns:
+        dict: relation -> [highest through table id, number of rows up to it]
+    """
+    if not version:
+        return {}
+    try:
+        versions = json.loads(urlsafe_b64decode(version.encode("ascii")))
+    except (TypeError, ValueError):
+        return {}
+    if not isinstance(versions, dict):
+        return {}
+    return {
+        relation: relation_version
+        for relation, relation_version in versions.items()
+        if is_relation_version(relation_version)
+    }
+
+
+def is_relation_version(version):
+    """Check that a relation version is [highest through table id, row count].
+
+    Args:
+        version: decoded relation version of a client
+
+    Returns:
+        bool
+    """
+    return (
+        isinstance(version, list)
+        and len(version) == 2
+        and all(isinstance(value, int) and not isinstance(value, bool) for value in version)
+    )
+
+
+def apply_changes(app_user, m2m_field_name, model, changes):
+    """Apply the added and removed ids of one relation with bulk statements.
+
+    Args:
+        app_user (AppUser): app user
+        m2m_field_name (str): name of the M2M field
+        model (Model): related model
+        changes (dict): "added" and "removed" ids
+    """
+    removed = set(changes["removed"])
+    added = set(changes["added"]) - removed
+    if removed:
+        remove_related(app_user, m2m_field_name, removed)
+    if added:
+        # ids deleted on the server in the meantime are dropped
+        existing = model.objects.filter(id__in=added).values_list("id", flat=True)
+        add_related(app_user, m2m_field_name, existing)
+
+
+def get_state(app_user, m2m_field_name, version):
+    """Get the ids of one relation, as delta if the client version allows it.
+
+    Through table ids only grow, so if all rows up to the highest id the
+    client knows are still there, nothing was removed and the rows above
+    that id are the additions.
+
+    Args:
+        app_user (AppUser): app user
+        m2m_field_name (str): name of the M2M field
+        version (list): [highest through table id, number of rows up to it] or None
+
+    Returns:
+        dict, list: state of the relation, version of the relation
+    """
+    field = get_m2m_field(m2m_field_name)
+    rows = list(
+        field.remote_field.through.objects.filter(**{field.m2m_column_name(): app_user.id})
+        .order_by("id")
+        .values_list("id", field.m2m_reverse_name())
+    )
+    max_id = rows[-1][0] if rows else 0
+    new_version = [max_id, len(rows)]
+
+    if is_relation_version(version):
+        known_max_id, known_count = version
+        known_rows = [row for row in rows if row[0] <= known_max_id]
+        if len(known_rows) == known_count:
+            added = [object_id for row_id, object_id in rows if row_id > known_max_id]
+            return {"full": False, "ids": added}, new_version
+    return {"full": True, "ids": [object_id for _, object_id in rows]}, new_version
+
+
+class AppUserSyncViewSet(viewsets.ViewSet):
+    http_method_names = ["post"]
+
+    @swagger_auto_schema(
+        operation_description="""Sync bookmarks and archives in one request.\n
+        Applies the added and removed article and event ids and returns the ids stored
+        on the server. If the version of the last sync is sent and nothing was removed
+        since, only the additions are returned ("full": false).
+        """,
+        manual_parameters=[
+            header_string_parameter("X-Device-ID", "Device ID", required=True),
+        ],
+        request_body=SyncRequestSerializer,
+        responses={200: SyncResponseSerializer, 400: "Device ID is missing"},
+    )
+    def create(self, request, *args, **kwargs):
+        device_id = request.headers.get("X-Device-ID")
+        if not device_id:
+            return bad_request("Device ID is missing")
+
+        serializer = SyncRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+
+        app_user, created = get_or_create_appuser(device_id)
+
+        versions = decode_version(data.get("version"))
+        response = {}
+        new_versions = {}
+        with transaction.atomic():
+            for key, (m2m_field_name, model) in SYNC_RELATIONS.items():
+                if key in data:
+                    apply_changes(app_user, m2m_field_name, model, data[key])
+                response[key], new_versions[key] = get_state(
+                    app_user, m2m_field_name, versions.get(key)
+                )
+        response["version"] = encode_version(new_versions)
+        return Response(response)
@@ -2,16 +2,16 @@ from rest_framework import viewsets
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework.response import Response
 from api.views.util import header_string_parameter
+from content.images import is_supported_upload, save_original, schedule_renditions
 from content.models import  Article, EventV4, Organization, User, Source
 from logging import getLogger
 from rest_framework.parsers import MultiPartParser, FormParser
 from drf_yasg import openapi
 from rest_framework import status
-import uuid
-from PIL import Image
 from drf_yasg.openapi import Parameter
 from drf_yasg.openapi import IN_QUERY
 from django.conf import settings
+from django.core.files.storage import default_storage
 import jwt
 from django.shortcuts import get_object_or_404
 
@@ -141,38 +141,22 @@ class PictureUploadArticleViewSet(viewsets.ViewSet):
             # get the picture file from the request
             picture = request.FILES['picture']
 
-            # check if the file is an image of any type
-            try:
-                # open the file using PIL
-                img = Image.open(picture)
-                # check if the file format is supported by PIL
-                supported_formats = ['JPEG', 'PNG', 'GIF', 'JPG']
-                if img.format not in supported_formats:
-                    return Response({"message": "Invalid file format"}, status=status.HTTP_400_BAD_REQUEST)
-            except IOError:
-                return Response({"message": "Invalid image file"}, status=status.HTTP_400_BAD_REQUEST)
-
-            # generate a unique filename using UUID
-            filename = str(uuid.uuid4()) 
-
-            # get the file extension of the picture.name and make it lowercase
-            file_extension = picture.name.split('.')[-1].lower()
-
-            # if the file extension is not empty, add a dot before the extension
-            filename = filename + '.' + file_extension
-
-            # construct the file path with the unique filename
-            file_path = '/home/molonews/molonews/www/media/appuploads/' + filename 
+            # check if the file is an image of a supported format
+            if not is_supported_upload(picture):
+                return Response({"message": "Invalid file format"}, status=status.HTTP_400_BAD_REQUEST)
+
+            # store the original, the renditions are generated in the background
             try:
-                with open(file_path, 'wb') as file:
-                    for chunk in picture.chunks():
-                        file.write(chunk)
+                original_name = save_original(picture, 'appuploads/')
             except Exception as e:
+                logger.error("Error occurred while saving the file: %s", e)
                 return Response({"message": "Error occurred while saving the file"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            # get the server hostname 
+            # the original is served until the renditions replace image and image_detail
             server_hostname = request.get_host()
-            article.image_url = 'https://' + server_hostname + '/media/appuploads/' + filename
+            article.image_url = 'https://' + server_hostname + default_storage.url(original_name)
+            article.image = None
+            article.image_detail = None
             
             # get the image source from the request
             image_source = request.data.get('image_source')
@@ -180,6 +164,7 @@ class PictureUploadArticleViewSet(viewsets.ViewSet):
                 article.image_source = image_source
 
             article.save()
+            schedule_renditions(article, original_name)
 
             return Response({
                 "message": "Picture uploaded successfully",
@@ -320,42 +305,22 @@ class PictureUploadEventViewSet(viewsets.ViewSet):
             # get the picture file from the request
             picture = request.FILES['picture']
 
-            # check if the file is an image of any type
-            try:
-                # open the file using PIL
-                img = Image.open(picture)
-                # check if the file format is supported by PIL
-                supported_formats = ['JPEG', 'PNG', 'GIF', 'JPG', 'jpeg', 'png', 'gif', 'jpg']
-                if img.format not in supported_formats:
-                    logger.error("Invalid file format")
-                    return Response({"message": "Invalid file format"}, status=status.HTTP_400_BAD_REQUEST)
-            except IOError:
-                logger.error("Invalid image file")
-                return Response({"message": "Invalid image file"}, status=status.HTTP_400_BAD_REQUEST)
-
-            # generate a unique filename using UUID
-            filename = str(uuid.uuid4()) 
-
-            # get the file extension of the picture.name and make it lowercase
-            file_extension = picture.name.split('.')[-1].lower()
-
-            # if the file extension is not empty, add a dot before the extension
-            filename = filename + '.' + file_extension
-
-            # construct the file path with the unique filename
-            file_path = '/home/molonews/molonews/www/media/appuploads/' + filename 
+            # check if the file is an image of a supported format
+            if not is_supported_upload(picture):
+                logger.error("Invalid file format")
+                return Response({"message": "Invalid file format"}, status=status.HTTP_400_BAD_REQUEST)
+
+            # store the original, the renditions are generated in the background
             try:
-                with open(file_path, 'wb') as file:
-                    for chunk in picture.chunks():
-                        file.write(chunk)
+                original_name = save_original(picture, 'appuploads/')
             except Exception as e:
+                logger.error("Error occurred while saving the file: %s", e)
                 return Response({"message": "Error occurred while saving the file"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            
-
-            # get the server hostname 
+            # the original is served until the rendition replaces image
             server_hostname = request.get_host()
-            event.image_url = 'https://' + server_hostname + '/media/appuploads/' + filename
+            event.image_url = 'https://' + server_hostname + default_storage.url(original_name)
+            event.image = None
 
             image_source = request.data.get('image_source')
             if image_source:
@@ -363,6 +328,7 @@ class PictureUploadEventViewSet(viewsets.ViewSet):
 
             #save the event
             event.save()
+            schedule_renditions(event, original_name)
 
             return Response({
                 "message": "Picture uploaded successfully",
@@ -480,33 +446,15 @@ class PictureUploadUserViewSet(viewsets.ViewSet):
             # get the picture file from the request
             picture = request.FILES['picture']
 
-            # check if the file is an image of any type
-            try:
-                # open the file using PIL
-                img = Image.open(picture)
-                # check if the file format is supported by PIL
-                supported_formats = ['JPEG', 'PNG', 'GIF', 'JPG', 'jpeg', 'png', 'gif', 'jpg']
-                if img.format not in supported_formats:
-                    return Response({"message": "Invalid file format"}, status=status.HTTP_400_BAD_REQUEST)
-            except IOError:
-                return Response({"message": "Invalid image file"}, status=status.HTTP_400_BAD_REQUEST)
-
-            # generate a unique filename using UUID
-            filename = str(uuid.uuid4()) 
-
-            # get the file extension of the picture.name and make it lowercase
-            file_extension = picture.name.split('.')[-1].lower()
-
-            # if the file extension is not empty, add a dot before the extension
-            filename = filename + '.' + file_extension
-
-            # construct the file path with the unique filename
-            file_path = '/home/molonews/molonews/www/media/' + filename 
+            # check if the file is an image of a supported format
+            if not is_supported_upload(picture):
+                return Response({"message": "Invalid file format"}, status=status.HTTP_400_BAD_REQUEST)
+
+            # store the original, the renditions are generated in the background
             try:
-                with open(file_path, 'wb') as file:
-                    for chunk in picture.chunks():
-                        file.write(chunk)
+                original_name = save_original(picture, '')
             except Exception as e:
+                logger.error("Error occurred while saving the file: %s", e)
                 return Response({"message": "Error occurred while saving the file"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
             # get organization of user
@@ -514,8 +462,8 @@ class PictureUploadUserViewSet(viewsets.ViewSet):
 
             # get the server hostname 
             server_hostname = request.get_host()
-            organization.image = filename
-            image_url = 'https://' + server_hostname + '/media/' + filename
+            organization.image = original_name
+            image_url = 'https://' + server_hostname + default_storage.url(original_name)
 
             image_source = request.data.get('image_source')
             if image_source:
@@ -524,11 +472,13 @@ class PictureUploadUserViewSet(viewsets.ViewSet):
             #save the organization
             organization.save()
 
-            # update default images of the source
+            # update default images of the source, the original is served
+            # until the renditions replace them
             source = Source.objects.get(related_user=user)
-            source.default_image  = '/' + filename
-            source.default_image_detail = '/' + filename
+            source.default_image = original_name
+            source.default_image_detail = original_name
             source.save()
+            schedule_renditions(source, original_name)
 
             return Response({
                 "message": "Picture uploaded successfully",
@@ -1,9 +1,24 @@
 import collections.abc
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from calendar import timegm
+from hashlib import md5
 
+from django.conf import settings
+from django.db.models import Q, QuerySet
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
 from drf_yasg import openapi
+from rest_framework.exceptions import NotFound
 from rest_framework.versioning import NamespaceVersioning
-from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.pagination import (
+    BasePagination,
+    LimitOffsetPagination,
+    _positive_int,
+)
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework import status
 
 
@@ -70,6 +85,284 @@ class UserPagination(LimitOffsetPagination):
     max_limit = 50
 
 
+class HotFirstQuerySet:
+    """Lazy sequence which puts the hot article in front of a feed queryset.
+
+    Only the slice requested by the paginator is fetched from the database,
+    the queryset is never materialized as a whole.
+
+    Args:
+        hottest (Article): article shown first
+        queryset (QuerySet): feed, must not contain the hot article
+    """
+
+    def __init__(self, hottest, queryset):
+        self.hottest = hottest
+        self.queryset = queryset
+
+    def count(self):
+        return self.queryset.count() + 1
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return iter(self[0:])
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        stop = index.stop
+        if stop is not None and stop <= start:
+            return []
+        if start == 0:
+            articles = [self.hottest] + list(
+                self.queryset[:stop - 1] if stop is not None else self.queryset
+            )
+        else:
+            articles = list(
+                self.queryset[start - 1:stop - 1]
+                if stop is not None
+                else self.queryset[start - 1:]
+            )
+        for article in articles[1 if start == 0 else 0:]:
+            article.is_hot = False
+        return articles
+
+
+# first client version which pages the feeds with a cursor instead of offsets,
+# older clients keep the limit / offset pagination
+KEYSET_PAGINATION_CLIENT_VERSION = getattr(
+    settings, "KEYSET_PAGINATION_CLIENT_VERSION", None
+)
+
+
+def parse_version(version):
+    """Parse a version string like "2.4.1" into a comparable tuple.
+
+    Args:
+        version (str): dotted version string
+
+    Returns:
+        tuple: version parts, empty if the version can't be parsed
+    """
+    try:
+        return tuple(int(part) for part in version.split("."))
+    except (AttributeError, ValueError):
+        return ()
+
+
+def use_keyset_pagination(request):
+    """Check if the client of a request pages with a cursor.
+
+    Args:
+        request (Request): current request
+
+    Returns:
+        bool
+    """
+    if KeysetPagination.cursor_query_param in request.query_params:
+        return True
+    if KEYSET_PAGINATION_CLIENT_VERSION is None:
+        return False
+    client_version = parse_version(request.headers.get("X-Client-Version"))
+    return bool(client_version) and client_version >= parse_version(
+        KEYSET_PAGINATION_CLIENT_VERSION
+    )
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination on a (key field, id) pair.
+
+    Every page is a range query behind the last item of the previous page,
+    so neither an OFFSET nor a total COUNT is needed at any depth. The cursor
+    is opaque to the client. Querysets are filtered in the database, lists
+    (already evaluated feeds) are filtered in python.
+    """
+
+    cursor_query_param = "cursor"
+    limit_query_param = "limit"
+    ordering_query_param = "ordering"
+    default_limit = 20
+    max_limit = 50
+    key_field = None
+    descending = False
+
+    def get_limit(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.limit_query_param],
+                strict=True,
+                cutoff=self.max_limit,
+            )
+        except (KeyError, ValueError):
+            return self.default_limit
+
+    def get_descending(self, request):
+        ordering = request.query_params.get(self.ordering_query_param, "")
+        if ordering == self.key_field:
+            return False
+        if ordering == "-" + self.key_field:
+            return True
+        return self.descending
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk = json.loads(urlsafe_b64decode(encoded.encode("ascii")))
+            key = parse_datetime(value)
+            if key is None:
+                raise ValueError(value)
+            return key, int(pk)
+        except (TypeError, ValueError):
+            raise NotFound("Invalid cursor")
+
+    def encode_cursor(self, item):
+        key = [getattr(item, self.key_field).isoformat(), item.id]
+        encoded = urlsafe_b64encode(json.dumps(key).encode("ascii")).decode("ascii")
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, encoded
+        )
+
+    def paginate_queryset(self, queryset, request, view=None, first=None):
+        """Get the page behind the cursor of the request.
+
+        Args:
+            queryset (QuerySet | list): items to paginate
+            request (Request): current request
+            view (View): current view
+            first (object): item put in front of the first page
+
+        Returns:
+            list
+        """
+        self.request = request
+        limit = self.get_limit(request)
+        cursor = self.decode_cursor(request)
+        descending = self.get_descending(request)
+        if first is not None and cursor is None:
+            limit = max(limit - 1, 1)
+        else:
+            first = None
+
+        if isinstance(queryset, QuerySet):
+            items = self.paginate_database(queryset, cursor, descending, limit)
+        else:
+            items = self.paginate_list(queryset, cursor, descending, limit)
+
+        self.has_next = len(items) > limit
+        page = items[:limit]
+        self.next = self.encode_cursor(page[-1]) if self.has_next else None
+        return [first] + page if first is not None else page
+
+    def paginate_database(self, queryset, cursor, descending, limit):
+        key = self.key_field
+        if cursor is not None:
+            value, pk = cursor
+            lookup = "lt" if descending else "gt"
+            queryset = queryset.filter(
+                Q(**{"{}__{}".format(key, lookup): value})
+                | Q(**{key: value, "id__{}".format(lookup): pk})
+            )
+        if descending:
+            queryset = queryset.order_by("-" + key, "-id")
+        else:
+            queryset = queryset.order_by(key, "id")
+        return list(queryset[:limit + 1])
+
+    def paginate_list(self, items, cursor, descending, limit):
+        def sort_key(item):
+            return getattr(item, self.key_field), item.id
+
+        items = sorted(items, key=sort_key, reverse=descending)
+        if cursor is not None:
+            if descending:
+                items = [item for item in items if sort_key(item) < cursor]
+            else:
+                items = [item for item in items if sort_key(item) > cursor]
+        return items[:limit + 1]
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.next, "previous": None, "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True},
+                "previous": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
+
+
+class ArticleKeysetPagination(KeysetPagination):
+    key_field = "date"
+    descending = True
+
+
+class EventKeysetPagination(KeysetPagination):
+    # the event feed sets start_date to the next occurrence of each event
+    key_field = "start_date"
+    max_limit = 100
+
+
+def make_etag(*parts):
+    """Build a weak ETag from the parts a response depends on.
+
+    Weak, since counters like request_count are left out on purpose.
+
+    Args:
+        *parts: json serializable values, datetimes are converted to strings
+
+    Returns:
+        str
+    """
+    digest = md5(json.dumps(parts, default=str).encode("utf-8")).hexdigest()
+    return 'W/"{}"'.format(digest)
+
+
+def not_modified(request, etag=None, last_modified=None):
+    """Answer If-None-Match / If-Modified-Since before anything is serialized.
+
+    Args:
+        request (Request): current request
+        etag (str): ETag of the current state
+        last_modified (datetime): last modification of the current state
+
+    Returns:
+        HttpResponseNotModified or None
+    """
+    timestamp = timegm(last_modified.utctimetuple()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag=None, last_modified=None):
+    """Add the ETag and Last-Modified headers to a response.
+
+    Args:
+        response (HttpResponse): response
+        etag (str): ETag of the current state
+        last_modified (datetime): last modification of the current state
+
+    Returns:
+        HttpResponse
+    """
+    if etag:
+        response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(timegm(last_modified.utctimetuple()))
+    # the validators depend on the AppUser of the device
+    patch_vary_headers(response, ("X-Device-ID",))
+    return response
+
+
 def bad_request(detail):
     return Response({"detail": detail}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -5,6 +5,7 @@ from ..models import (
     User,
     Article,
     ArticleDraft,
+    ArchivedArticle,
     Event,
     EventV4,
     EventDraft,
@@ -13,6 +14,7 @@ from ..models import (
     Organization,
     Tag,
     AppUser,
+    QrClickCount,
 )
 from .article import ArticleAdmin, ArticleDraftAdmin
 from .event import EventAdmin, EventDraftAdmin
@@ -53,16 +55,30 @@ class TagAdmin(admin.ModelAdmin):
     list_filter = ("category",)
 
 
+class ArchivedArticleAdmin(admin.ModelAdmin):
+    list_display = ("article_id", "title", "date", "source", "archived_at")
+    search_fields = ("title", "link")
+    ordering = ("-date",)
+
+
 class AppUserAdmin(admin.ModelAdmin):
     list_display = ("id", "date_joined", "device_id")
     # Allow sorting by date_joined (default ascending order)
     ordering = ('-date_joined',)  # Change to 'date_joined' for ascending order
 
 
+class QrClickCountAdmin(admin.ModelAdmin):
+    list_display = ("campaign", "platform", "day", "count")
+    list_filter = ("platform",)
+    search_fields = ("campaign",)
+    ordering = ("-day", "campaign")
+
+
 moloadmin = MoloAdminSite(name='Moloadmin')
 moloadmin.register(Group)
 moloadmin.register(Article, ArticleAdmin)
 moloadmin.register(ArticleDraft, ArticleDraftAdmin)
+moloadmin.register(ArchivedArticle, ArchivedArticleAdmin)
 #moloadmin.register(Event, EventAdmin)
 #moloadmin.register(EventDraft, EventDraftAdmin)
 moloadmin.register(EventV4, EventV4Admin)
@@ -72,3 +88,4 @@ moloadmin.register(Organization, OrganizationAdmin)
 moloadmin.register(Category, CategoryAdmin)
 moloadmin.register(Tag, TagAdmin)
 moloadmin.register(AppUser, AppUserAdmin)
+moloadmin.register(QrClickCount, QrClickCountAdmin)
@@ -2,7 +2,8 @@ from django import forms
 from django.contrib import admin
 from logging import getLogger
 logger = getLogger("molonews")
-from ..models import AppUser, Organization, Area
+from ..models import Organization, Area
+from ..organization_rollout import schedule_organization_rollout
 
 
 LIST_FIELDS = ('id', 'type', 'name', 'get_areas', 'active')
@@ -111,18 +112,9 @@ class OrganizationAdmin(admin.ModelAdmin):
             # all existing app users need to be set "nach Themen" for the new organization
             # therefore the last added organization (the new one) needs to be added to the organization db
 
-            # Get the newly created organization
-            organization = obj
-            
-            # Get all AppUsers
-            app_users = AppUser.objects.all()
-
-            # Add the organization to all AppUsers
-            for app_user in app_users:
-                app_user.organization.add(organization)
-                app_user.save()
-
-            logger.error("Added organization to all users")
+            # sparse AppUsers select it by default, the dense ones get a row
+            # in the background once the organization is committed
+            schedule_organization_rollout(obj.id)
 
         # Call the original save_model method to ensure default behavior is preserved
         super().save_model(request, obj, form, change)
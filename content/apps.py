@@ -3,3 +3,15 @@ from django.apps import AppConfig
 
 class ContentConfig(AppConfig):
     name = 'content'
+
+    def ready(self):
+        # connect the receivers of the hot article registry and caches
+        from . import (  # noqa: F401
+            appuser_summary,
+            appusers,
+            hot_articles,
+            images,
+            taxonomy,
+            versions,
+            visibility,
+        )
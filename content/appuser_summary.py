@@ -0,0 +1,136 @@
+from logging import getLogger
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .choices import ORGANIZATION_TYPE_CHOICES
+from .metrics import count_cache_lookup
+from .models import AppUser, Organization
+from .preferences import selected_organizations_q
+from .versions import bump_version, get_version
+
+logger = getLogger(__name__)
+
+# Summary of the organization selection per AppUser, dropped whenever the
+# AppUser or one of its organization selections changes. Bulk changes that
+# bypass m2m_changed bump the "appuser_summaries" version instead.
+SUMMARY_CACHE_KEY = "appuser_summary:{}:{}"
+SUMMARY_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def query_summary(app_user):
+    """Count the selected organizations of an AppUser per organization type.
+
+    All counts come from one grouped query over the organizations of the
+    AppUser's area.
+
+    Args:
+        app_user (AppUser): app user
+
+    Returns:
+        list: one dict per organization type
+    """
+    selected = selected_organizations_q(app_user)
+    selected_all_tags = AppUser.organization_all_tags.through.objects.filter(
+        appuser_id=app_user.id
+    ).values("organization_id")
+
+    counts = {
+        row["type"]: row
+        for row in Organization.objects.filter(area=app_user.area_id)
+        .values("type")
+        .annotate(
+            all_tags=Count("id", filter=Q(id__in=selected_all_tags)),
+            by_tag=Count("id", filter=selected),
+            deselected=Count(
+                "id",
+                filter=Q(active=True)
+                & ~selected
+                & ~Q(id__in=selected_all_tags),
+            ),
+        )
+        .order_by()
+    }
+
+    summary = []
+    for organization_type, name in ORGANIZATION_TYPE_CHOICES:
+        row = counts.get(organization_type, {})
+        summary.append(
+            {
+                "type": organization_type,
+                "name": name,
+                "push": getattr(app_user, "push_{}".format(organization_type)),
+                "all_tags": row.get("all_tags", 0),
+                "by_tag": row.get("by_tag", 0),
+                "deselected": row.get("deselected", 0),
+            }
+        )
+    return summary
+
+
+def get_summary(app_user):
+    """Get the cached organization summary of an AppUser.
+
+    Args:
+        app_user (AppUser): app user
+
+    Returns:
+        list: one dict per organization type
+    """
+    key = SUMMARY_CACHE_KEY.format(get_version("appuser_summaries"), app_user.id)
+    summary = cache.get(key)
+    count_cache_lookup("appuser_summaries", summary is not None)
+    if summary is None:
+        summary = query_summary(app_user)
+        cache.set(key, summary, SUMMARY_CACHE_TIMEOUT)
+    return summary
+
+
+def invalidate_summaries(app_user_ids):
+    """Drop the cached organization summaries of AppUsers.
+
+    Args:
+        app_user_ids (iterable): ids of the app users
+    """
+    version = get_version("appuser_summaries")
+    cache.delete_many([SUMMARY_CACHE_KEY.format(version, app_user_id) for app_user_id in app_user_ids])
+
+
+@receiver(post_save, sender=AppUser)
+@receiver(post_delete, sender=AppUser)
+def invalidate_summary_on_appuser(sender, instance, **kwargs):
+    invalidate_summaries([instance.id])
+
+
+@receiver(post_save, sender=Organization)
+@receiver(post_delete, sender=Organization)
+def invalidate_summaries_on_organization(sender, instance, **kwargs):
+    # sparse AppUsers select new and reactivated organizations by default
+    bump_version("appuser_summaries")
+
+
+def invalidate_summary_on_selection(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        invalidate_summaries([instance.id])
+    elif pk_set:
+        invalidate_summaries(pk_set)
+    else:
+        # organization.appuser_set.clear() doesn't tell which AppUsers lost it
+        bump_version("appuser_summaries")
+
+
+for field in (
+    AppUser.organization,
+    AppUser.deselected_organization,
+    AppUser.organization_all_tags,
+    AppUser.deselected_organization_all_tags,
+):
+    m2m_changed.connect(
+        invalidate_summary_on_selection,
+        sender=field.through,
+        dispatch_uid="invalidate_summary_{}".format(field.field.name),
+    )
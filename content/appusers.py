@@ -0,0 +1,105 @@
+from logging import getLogger
+from threading import local
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .metrics import count_cache_lookup
+from .models import AppUser
+
+logger = getLogger(__name__)
+
+# device id -> AppUser primary key, short lived so deleted or re-created
+# devices are picked up quickly
+APPUSER_CACHE_KEY = "appuser_pk:{}"
+APPUSER_CACHE_TIMEOUT = 5 * 60
+
+# AppUsers resolved during the current request, see AppUserMiddleware
+_request_appusers = local()
+
+
+def start_request():
+    _request_appusers.by_device_id = {}
+
+
+def end_request():
+    _request_appusers.by_device_id = None
+
+
+def _get_request_cache():
+    return getattr(_request_appusers, "by_device_id", None)
+
+
+def _remember(device_id, app_user):
+    request_cache = _get_request_cache()
+    if request_cache is not None:
+        request_cache[device_id] = app_user
+    if app_user is not None:
+        cache.set(APPUSER_CACHE_KEY.format(device_id), app_user.pk, APPUSER_CACHE_TIMEOUT)
+
+
+def get_appuser(device_id):
+    """Try to get an AppUser by device id.
+
+    Within a request the AppUser is resolved only once, between requests the
+    primary key of the device is cached.
+
+    Args:
+        device_id (str): device id string
+
+    Returns:
+        AppUser or None
+    """
+    if not device_id:
+        return None
+    request_cache = _get_request_cache()
+    if request_cache is not None and device_id in request_cache:
+        return request_cache[device_id]
+
+    app_user = None
+    pk = cache.get(APPUSER_CACHE_KEY.format(device_id))
+    count_cache_lookup("appuser_pk", pk is not None)
+    if pk is not None:
+        app_user = AppUser.objects.filter(pk=pk, device_id=device_id).first()
+    if app_user is None:
+        app_user = AppUser.objects.filter(device_id=device_id).first()
+    _remember(device_id, app_user)
+    return app_user
+
+
+def get_or_create_appuser(device_id):
+    """Get an AppUser by device id and create it if it does not exist yet.
+
+    Only write paths should call this, reads use get_appuser so they never
+    insert.
+
+    Args:
+        device_id (str): device id string
+
+    Returns:
+        AppUser, bool: app user and whether it was created
+    """
+    app_user = get_appuser(device_id)
+    if app_user is not None:
+        return app_user, False
+    try:
+        with transaction.atomic():
+            # new devices store only deviations from the default selection
+            app_user = AppUser.objects.create(device_id=device_id, sparse_preferences=True)
+        created = True
+    except IntegrityError:
+        # created by a concurrent request
+        app_user = AppUser.objects.get(device_id=device_id)
+        created = False
+    _remember(device_id, app_user)
+    return app_user, created
+
+
+@receiver(post_delete, sender=AppUser)
+def forget_deleted_appuser(sender, instance, **kwargs):
+    cache.delete(APPUSER_CACHE_KEY.format(instance.device_id))
+    request_cache = _get_request_cache()
+    if request_cache is not None:
+        request_cache.pop(instance.device_id, None)
@@ -16,6 +16,12 @@ ARTICLE_TYPE_CHOICES = (
     ('event', 'Event')
 )
 
+QR_PLATFORM_CHOICES = (
+    ('ios', 'iOS'),
+    ('android', 'Android'),
+    ('other', 'Other'),
+)
+
 FEEDBACK_CONTACT_TYPE_CHOICES = (
     ('app_feedback', 'App Feedback'),
     ('info_news_feedback', 'Info und News Feedback')
@@ -0,0 +1,135 @@
+from logging import getLogger
+
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils.timezone import localtime
+
+from .metrics import count_cache_lookup
+from .models import Area, Article
+
+logger = getLogger(__name__)
+
+# Registry of the hot articles per area, most recent first. select_hot_articles
+# and the article signals write to it, the feed only reads it. A few candidates
+# are kept so that excluding the top one doesn't drop the hot article.
+HOT_ARTICLE_CACHE_KEY = "hot_articles:{}"
+HOT_ARTICLE_CACHE_TIMEOUT = 60 * 60
+HOT_ARTICLE_CANDIDATES = 10
+
+
+def query_hot_articles(area_id, limit=HOT_ARTICLE_CANDIDATES, oldest_date=None, exclude_article_ids=()):
+    """Get the most recent visible articles flagged "is_hot" of an area.
+
+    Args:
+        area_id (int): id of the area
+        limit (int): maximum number of articles
+        oldest_date (date): oldest date for articles, None for no limit
+        exclude_article_ids (list): article ids to be excluded
+
+    Returns:
+        list: (article id, article date) tuples, most recent first
+    """
+    queryset = Article.objects.filter(is_hot=True, area=area_id, visible=True)
+    if oldest_date is not None:
+        queryset = queryset.filter(date__gte=oldest_date.strftime("%Y-%m-%d"))
+    if exclude_article_ids:
+        queryset = queryset.exclude(id__in=exclude_article_ids)
+    return list(queryset.order_by("-date").values_list("id", "date")[:limit])
+
+
+def refresh_hot_article(area_id):
+    """Recompute and store the hot articles of an area.
+
+    Args:
+        area_id (int): id of the area
+
+    Returns:
+        list: (article id, article date) tuples, most recent first
+    """
+    hot_articles = query_hot_articles(area_id)
+    cache.set(
+        HOT_ARTICLE_CACHE_KEY.format(area_id), hot_articles, HOT_ARTICLE_CACHE_TIMEOUT
+    )
+    return hot_articles
+
+
+def refresh_hot_articles(area_ids=None):
+    """Recompute and store the hot articles of several areas.
+
+    Args:
+        area_ids (list): ids of the areas, defaults to all areas
+    """
+    if area_ids is None:
+        area_ids = Area.objects.values_list("id", flat=True)
+    for area_id in area_ids:
+        refresh_hot_article(area_id)
+
+
+def get_hot_article_id(area_id, oldest_date, exclude_article_ids=()):
+    """Get the id of the hot article of an area from the registry.
+
+    Args:
+        area_id (int): id of the area
+        oldest_date (date): oldest date for articles
+        exclude_article_ids (list): article ids to be excluded
+
+    Returns:
+        int: article id or None
+    """
+    hot_articles = cache.get(HOT_ARTICLE_CACHE_KEY.format(area_id))
+    count_cache_lookup("hot_articles", hot_articles is not None)
+    if hot_articles is None:
+        hot_articles = refresh_hot_article(area_id)
+
+    for article_id, date in hot_articles:
+        # the candidates are ordered by date, all following ones are older
+        if localtime(date).date() < oldest_date:
+            return None
+        if article_id not in exclude_article_ids:
+            return article_id
+    if len(hot_articles) < HOT_ARTICLE_CANDIDATES:
+        return None
+    # all candidates are excluded, there may be more hot articles
+    hot_articles = query_hot_articles(
+        area_id, limit=1, oldest_date=oldest_date, exclude_article_ids=exclude_article_ids
+    )
+    return hot_articles[0][0] if hot_articles else None
+
+
+@receiver(post_save, sender=Article)
+def refresh_hot_articles_on_save(sender, instance, update_fields=None, **kwargs):
+    # article views only bump request_count
+    if update_fields is not None and set(update_fields) == {"request_count"}:
+        return
+    # only articles which are or were the hot article of an area matter
+    area_ids = [
+        area_id
+        for area_id in instance.area.values_list("id", flat=True)
+        if instance.is_hot
+        or any(
+            article_id == instance.id
+            for article_id, _ in cache.get(HOT_ARTICLE_CACHE_KEY.format(area_id), ())
+        )
+    ]
+    refresh_hot_articles(area_ids)
+
+
+@receiver(post_delete, sender=Article)
+def refresh_hot_articles_on_delete(sender, instance, **kwargs):
+    # the area relations are already gone, areas are few so refresh them all
+    if instance.is_hot:
+        refresh_hot_articles()
+
+
+@receiver(m2m_changed, sender=Article.area.through)
+def refresh_hot_articles_on_area_change(sender, instance, action, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if isinstance(instance, Article):
+        if not instance.is_hot:
+            return
+        area_ids = pk_set if pk_set else None
+    else:
+        area_ids = [instance.id]
+    refresh_hot_articles(area_ids)
@@ -0,0 +1,212 @@
+import uuid
+from io import BytesIO
+from logging import getLogger
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import post_save
+from PIL import Image, ImageOps
+from versatileimagefield.image_warmer import VersatileImageFieldWarmer
+
+logger = getLogger(__name__)
+
+# Uploads are stored as they come in, the renditions the feeds reference are
+# generated off-request by content.tasks.create_image_renditions.
+IMAGE_RENDITION_SIZES = getattr(
+    settings, "IMAGE_RENDITION_SIZES", {"feed": (800, 800), "detail": (1600, 1600)}
+)
+IMAGE_RENDITION_FORMAT = getattr(settings, "IMAGE_RENDITION_FORMAT", "WEBP")
+IMAGE_RENDITION_QUALITY = getattr(settings, "IMAGE_RENDITION_QUALITY", 80)
+RENDITION_PATH = "upload/renditions/{}/{:08d}-{}-{}.{}"
+
+SUPPORTED_UPLOAD_FORMATS = ("JPEG", "PNG", "GIF")
+
+# model label -> image field -> rendition size, the VersatileImageField
+# thumbnails of these sizes are what the serializers emit
+RENDITION_FIELDS = {
+    "content.Article": {"image": "feed", "image_detail": "detail"},
+    "content.EventV4": {"image": "feed"},
+    "content.Source": {"default_image": "feed", "default_image_detail": "detail"},
+}
+
+
+def get_thumbnail_size(size_name):
+    return "{}x{}".format(*IMAGE_RENDITION_SIZES[size_name])
+
+
+def is_supported_upload(upload):
+    """Check the format of an uploaded picture from its header.
+
+    Args:
+        upload (UploadedFile): uploaded picture
+
+    Returns:
+        bool
+    """
+    try:
+        image_format = Image.open(upload).format
+    except IOError:
+        return False
+    finally:
+        upload.seek(0)
+    return image_format in SUPPORTED_UPLOAD_FORMATS
+
+
+def save_original(upload, directory):
+    """Store an uploaded picture unchanged under a unique name.
+
+    The upload is streamed to the storage in chunks.
+
+    Args:
+        upload (UploadedFile): uploaded picture
+        directory (str): directory in the storage, e.g. "appuploads/"
+
+    Returns:
+        str: storage name of the original
+    """
+    extension = upload.name.split(".")[-1].lower()
+    return default_storage.save("{}{}.{}".format(directory, uuid.uuid4(), extension), upload)
+
+
+def get_rendition_format():
+    # AVIF needs a Pillow with the AVIF plugin, WebP is the fallback
+    image_format = IMAGE_RENDITION_FORMAT.upper()
+    if image_format not in Image.SAVE:
+        Image.init()
+    return image_format if image_format in Image.SAVE else "WEBP"
+
+
+def render(original, size, image_format):
+    """Render one rendition of an image.
+
+    The EXIF orientation is applied to the pixels, all metadata is dropped.
+
+    Args:
+        original (Image): opened original
+        size (tuple): bounding box (width, height)
+        image_format (str): PIL format name
+
+    Returns:
+        bytes
+    """
+    image = ImageOps.exif_transpose(original)
+    keep_alpha = image.mode in ("RGBA", "LA", "P") and image_format != "JPEG"
+    image = image.convert("RGBA" if keep_alpha else "RGB")
+    image.thumbnail(size, Image.LANCZOS)
+    output = BytesIO()
+    image.save(output, format=image_format, quality=IMAGE_RENDITION_QUALITY)
+    return output.getvalue()
+
+
+def create_renditions(model_label, pk, original_name):
+    """Generate the renditions of an original and store them on the instance.
+
+    Args:
+        model_label (str): e.g. "content.Article"
+        pk (int): primary key of the instance
+        original_name (str): storage name of the original
+    """
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return
+
+    image_format = get_rendition_format()
+    extension = image_format.lower()
+    token = uuid.uuid4().hex
+    renditions = {}
+    with default_storage.open(original_name) as original_file:
+        original = Image.open(original_file)
+        original.load()
+        for size_name in set(RENDITION_FIELDS[model_label].values()):
+            content = render(original, IMAGE_RENDITION_SIZES[size_name], image_format)
+            renditions[size_name] = default_storage.save(
+                RENDITION_PATH.format(model._meta.model_name, pk, token, size_name, extension),
+                ContentFile(content),
+            )
+
+    fields = RENDITION_FIELDS[model_label]
+    for field_name, size_name in fields.items():
+        setattr(instance, field_name, renditions[size_name])
+    instance.save(update_fields=list(fields))
+    logger.info("created renditions of %s %s from %s", model_label, pk, original_name)
+
+
+def schedule_renditions(instance, original_name):
+    """Generate the renditions in the background once the transaction commits.
+
+    Args:
+        instance (Model): instance with an entry in RENDITION_FIELDS
+        original_name (str): storage name of the original
+    """
+    from .tasks import create_image_renditions
+
+    model_label = instance._meta.label
+    transaction.on_commit(
+        lambda: create_image_renditions.delay(model_label, instance.pk, original_name)
+    )
+
+
+def get_sized_url(image, size_name):
+    """Get the URL of the pre-warmed thumbnail of an image.
+
+    Args:
+        image (VersatileImageFieldFile): image of a RENDITION_FIELDS field
+        size_name (str): "feed" or "detail"
+
+    Returns:
+        str: URL of the thumbnail, of the image itself if it can't be sized
+    """
+    try:
+        return image.thumbnail[get_thumbnail_size(size_name)].url
+    except Exception as e:
+        logger.warning("no %s thumbnail of %s: %s", size_name, image.name, e)
+        return image.url
+
+
+def warm_renditions(model_label, instance_or_queryset):
+    """Create the thumbnails the serializers emit ahead of the first request.
+
+    Args:
+        model_label (str): e.g. "content.Article"
+        instance_or_queryset (Model or QuerySet): instances to warm
+
+    Returns:
+        int, list: number of created thumbnails, paths that failed
+    """
+    created = 0
+    failed = []
+    for field_name, size_name in RENDITION_FIELDS[model_label].items():
+        rendition_key_set = [(size_name, "thumbnail__{}".format(get_thumbnail_size(size_name)))]
+        field_created, field_failed = VersatileImageFieldWarmer(
+            instance_or_queryset=instance_or_queryset,
+            rendition_key_set=rendition_key_set,
+            image_attr=field_name,
+        ).warm()
+        created += field_created
+        failed.extend(field_failed)
+    return created, failed
+
+
+def schedule_warm_up_on_save(sender, instance, update_fields=None, **kwargs):
+    fields = RENDITION_FIELDS[sender._meta.label]
+    if update_fields is not None and not set(update_fields) & set(fields):
+        return
+    if not any(getattr(instance, field_name) for field_name in fields):
+        return
+
+    from .tasks import warm_image_renditions
+
+    model_label = sender._meta.label
+    transaction.on_commit(lambda: warm_image_renditions.delay(model_label, instance.pk))
+
+
+for model_label in RENDITION_FIELDS:
+    post_save.connect(
+        schedule_warm_up_on_save,
+        sender=model_label,
+        dispatch_uid="warm_image_renditions_{}".format(model_label),
+    )
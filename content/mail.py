@@ -0,0 +1,116 @@
+from logging import getLogger
+from smtplib import SMTPServerDisconnected
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+
+logger = getLogger(__name__)
+
+# Mails are handed to content.tasks.send_queued_mail, the worker keeps one
+# connection per account open across mails. MAIL_QUEUE_BACKEND defaults to
+# the EMAIL_BACKEND of the project, set it to the console or file based
+# backend to run the queue without a mail server.
+MAIL_QUEUE_BACKEND = getattr(settings, "MAIL_QUEUE_BACKEND", settings.EMAIL_BACKEND)
+
+# "mail_sending" sends with the MAIL_SENDING credentials, "default" with the
+# EMAIL_* settings of Django like send_mail
+MAIL_ACCOUNTS = ("mail_sending", "default")
+
+_connections = {}
+
+
+def queue_mail(subject, message, recipients, from_email=None, html=False, account="mail_sending"):
+    """Queue a mail, it is sent by a worker once the transaction commits.
+
+    Args:
+        subject (str): subject
+        message (str): body
+        recipients (list): receiver addresses
+        from_email (str): sender, DEFAULT_FROM_EMAIL of the account if empty
+        html (bool): whether the body is html
+        account (str): one of MAIL_ACCOUNTS
+    """
+    from .tasks import send_queued_mail
+
+    if account not in MAIL_ACCOUNTS:
+        raise ValueError("Unknown mail account {}".format(account))
+    transaction.on_commit(
+        lambda: send_queued_mail.delay(subject, message, list(recipients), from_email, html, account)
+    )
+
+
+def get_mail_connection(account):
+    """Get the open connection of an account, opened on first use.
+
+    Args:
+        account (str): one of MAIL_ACCOUNTS
+
+    Returns:
+        BaseEmailBackend
+    """
+    connection = _connections.get(account)
+    if connection is None:
+        if account == "mail_sending":
+            connection = get_connection(
+                MAIL_QUEUE_BACKEND,
+                host=settings.MAIL_SENDING["EMAIL_HOST"],
+                port=settings.MAIL_SENDING["EMAIL_PORT"],
+                username=settings.MAIL_SENDING["EMAIL_HOST_USER"],
+                password=settings.MAIL_SENDING["EMAIL_HOST_PASSWORD"],
+                use_tls=True,
+            )
+        else:
+            connection = get_connection(MAIL_QUEUE_BACKEND)
+        _connections[account] = connection
+    # an open connection is kept, send_messages only closes connections it opened
+    connection.open()
+    return connection
+
+
+def close_mail_connection(account):
+    connection = _connections.pop(account, None)
+    if connection is not None:
+        try:
+            connection.close()
+        except Exception as e:
+            logger.warning("could not close mail connection %s: %s", account, e)
+
+
+def get_default_from_email(account):
+    if account == "mail_sending":
+        return settings.MAIL_SENDING["DEFAULT_FROM_EMAIL"]
+    return settings.DEFAULT_FROM_EMAIL
+
+
+def send_mail_now(subject, message, recipients, from_email=None, html=False, account="mail_sending"):
+    """Send a mail over the kept connection of the account.
+
+    A connection the server dropped while idle is reopened once, other
+    errors are raised for the task to retry.
+
+    Args:
+        subject (str): subject
+        message (str): body
+        recipients (list): receiver addresses
+        from_email (str): sender, DEFAULT_FROM_EMAIL of the account if empty
+        html (bool): whether the body is html
+        account (str): one of MAIL_ACCOUNTS
+    """
+    email = EmailMessage(
+        subject, message, from_email or get_default_from_email(account), recipients
+    )
+    if html:
+        email.content_subtype = "html"
+
+    for attempt in range(2):
+        try:
+            get_mail_connection(account).send_messages([email])
+            return
+        except SMTPServerDisconnected:
+            close_mail_connection(account)
+            if attempt:
+                raise
+        except Exception:
+            close_mail_connection(account)
+            raise
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
-from content.models import AppUser, Organization
+from content.models import Organization
+from content.organization_rollout import add_organization_to_all_appusers
 from django.core.exceptions import ObjectDoesNotExist
 from logging import getLogger
 
@@ -11,6 +12,7 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         # Positional argument for organization ID
         parser.add_argument('organization_id', type=int, help='The ID of the organization to add to all app users')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Number of app user ids per insert statement')
 
     def handle(self, *args, **kwargs):
         organization_id = kwargs['organization_id']
@@ -22,17 +24,16 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f'Organization with ID {organization_id} does not exist.'))
             return
 
-        # Get all AppUsers
-        app_users = AppUser.objects.all()
+        def progress(done_id, max_id, inserted):
+            self.stdout.write(f'App user ids up to {done_id} of {max_id} done, {inserted} added.')
 
-        if not app_users.exists():
-            self.stdout.write(self.style.WARNING('No app users found.'))
+        # Add the organization to all AppUsers inside the database
+        inserted = add_organization_to_all_appusers(
+            organization.id, chunk_size=kwargs['chunk_size'], progress=progress
+        )
+        if not inserted:
+            self.stdout.write(self.style.WARNING('No app users without the organization found.'))
             return
 
-        # Add the organization to all AppUsers
-        for app_user in app_users:
-            app_user.organization.add(organization)
-            app_user.save()
-
-        self.stdout.write(self.style.SUCCESS(f'Successfully added organization "{organization.name}" to all app users.'))
-        logger.info(f'Organization {organization.name} added to all app users.')
+        self.stdout.write(self.style.SUCCESS(f'Successfully added organization "{organization.name}" to {inserted} app users.'))
+        logger.info(f'Organization {organization.name} added to {inserted} app users.')
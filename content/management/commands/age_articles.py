@@ -0,0 +1,158 @@
+from datetime import timedelta
+from logging import getLogger
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.timezone import now
+
+from content.models import Article, ArchivedArticle
+
+logger = getLogger(__name__)
+
+# articles older than this are moved to the archive table, feeds only
+# look back 14 days and bookmark / archive lists 30 days
+AGEING_HORIZON_DAYS = getattr(settings, "ARTICLE_AGEING_HORIZON_DAYS", 90)
+BATCH_SIZE = 500
+
+
+def get_aged_articles(horizon_days):
+    """Get all published articles older than the horizon which no AppUser bookmarked or archived.
+
+    Drafts and articles in review keep their editorial state in the article
+    table, the archive table doesn't store it.
+
+    Args:
+        horizon_days (int): age in days after which an article is moved
+
+    Returns:
+        queryset
+    """
+    oldest_date = now() - timedelta(days=horizon_days)
+    return Article.objects.filter(
+        date__lt=oldest_date,
+        published=True,
+        draft=False,
+        up_for_review=False,
+        articles_bookmarked__isnull=True,
+        articles_archived__isnull=True,
+    )
+
+
+def archive_articles(article_ids, horizon_days):
+    """Copy a batch of articles into the archive table and delete them.
+
+    The batch is checked again inside the transaction, so articles bookmarked
+    in the meantime stay in the article table.
+
+    Args:
+        article_ids (list): ids of the articles to move
+        horizon_days (int): age in days after which an article is moved
+
+    Returns:
+        int: number of moved articles
+    """
+    with transaction.atomic():
+        articles = list(get_aged_articles(horizon_days).filter(id__in=article_ids))
+        if not articles:
+            return 0
+        ids = [article.id for article in articles]
+
+        tag_ids = {}
+        for article_id, tag_id in Article.tags.through.objects.filter(
+            article_id__in=ids
+        ).values_list("article_id", "tag_id"):
+            tag_ids.setdefault(article_id, []).append(tag_id)
+        area_ids = {}
+        for article_id, area_id in Article.area.through.objects.filter(
+            article_id__in=ids
+        ).values_list("article_id", "area_id"):
+            area_ids.setdefault(article_id, []).append(area_id)
+
+        ArchivedArticle.objects.bulk_create(
+            [
+                ArchivedArticle(
+                    article_id=article.id,
+                    title=article.title,
+                    abstract=article.abstract,
+                    content=article.content,
+                    date=article.date,
+                    moddate=article.moddate,
+                    link=article.link,
+                    foreign_id=article.foreign_id,
+                    image_url=article.image_url,
+                    image=article.image.name or "",
+                    image_detail=article.image_detail.name or "",
+                    image_source=article.image_source,
+                    source_id=article.source_id,
+                    published=article.published,
+                    request_count=article.request_count,
+                    tag_ids=tag_ids.get(article.id, []),
+                    area_ids=area_ids.get(article.id, []),
+                )
+                for article in articles
+            ],
+            ignore_conflicts=True,
+        )
+        # deleting cascades to the tag / area / bookmark through tables
+        Article.objects.filter(id__in=ids).delete()
+    return len(ids)
+
+
+def age_articles(horizon_days=AGEING_HORIZON_DAYS, batch_size=BATCH_SIZE, dry_run=False):
+    """Move all aged articles in batches into the archive table.
+
+    Args:
+        horizon_days (int): age in days after which an article is moved
+        batch_size (int): number of articles moved per transaction
+        dry_run (bool): only count the articles that would be moved
+
+    Returns:
+        int: number of moved articles
+    """
+    article_ids = list(
+        get_aged_articles(horizon_days).order_by("date").values_list("id", flat=True)
+    )
+    if dry_run:
+        return len(article_ids)
+
+    moved = 0
+    for start in range(0, len(article_ids), batch_size):
+        moved += archive_articles(article_ids[start:start + batch_size], horizon_days)
+    return moved
+
+
+class Command(BaseCommand):
+    help = "Moves articles older than the ageing horizon into the archive table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=AGEING_HORIZON_DAYS,
+            help="Age in days after which an article is archived",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Number of articles moved per transaction",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the articles which would be archived",
+        )
+
+    def handle(self, *args, **options):
+        logger.info("Starting article ageing.")
+        moved = age_articles(
+            horizon_days=options["days"],
+            batch_size=options["batch_size"],
+            dry_run=options["dry_run"],
+        )
+        if options["dry_run"]:
+            self.stdout.write("{} articles would be archived.".format(moved))
+        else:
+            self.stdout.write(self.style.SUCCESS("{} articles archived.".format(moved)))
+        logger.info("{} articles archived.".format(moved))
@@ -2,6 +2,8 @@ from django.core.management.base import BaseCommand
 from django.db import connection
 from logging import getLogger
 
+from content.metrics import command_metrics
+
 logger = getLogger(__name__)
 
 
@@ -15,7 +17,8 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         logger.info('Starting article import.')
-        count_users()
+        with command_metrics('aggregate_statistics'):
+            count_users()
         logger.info('Articles imported.')
 
 
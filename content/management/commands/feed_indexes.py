@@ -0,0 +1,116 @@
+from datetime import timedelta
+from logging import getLogger
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils.timezone import now
+
+from content.choices import ORGANIZATION_TYPE_CHOICES
+from content.models import Article, Area, Tag
+
+logger = getLogger(__name__)
+
+# Indexes on the auto created M2M through tables. They can't be declared in
+# a model Meta, the partial and hash indexes on content_article itself are.
+THROUGH_TABLE_INDEXES = {
+    "content_article_area_area_article_idx": (
+        "content_article_area",
+        "(area_id, article_id)",
+    ),
+    "content_article_tags_tag_article_idx": (
+        "content_article_tags",
+        "(tag_id, article_id)",
+    ),
+}
+
+
+def create_through_table_indexes():
+    # CONCURRENTLY can't run inside a transaction block
+    with connection.cursor() as cursor:
+        for name, (table, columns) in THROUGH_TABLE_INDEXES.items():
+            cursor.execute(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS {} ON {} {}".format(
+                    name, table, columns
+                )
+            )
+
+
+def drop_through_table_indexes():
+    with connection.cursor() as cursor:
+        for name in THROUGH_TABLE_INDEXES:
+            cursor.execute("DROP INDEX CONCURRENTLY IF EXISTS {}".format(name))
+
+
+def get_feed_queries(area_id, tag_ids):
+    """Build the feed queries the indexes are tuned for.
+
+    The querysets mirror ArticleViewSet.list, query_hot_articles,
+    send_push_messages and the importer's article_exists.
+
+    Args:
+        area_id (int): area of the feed
+        tag_ids (list): selected tag ids
+
+    Returns:
+        dict: name -> queryset
+    """
+    current = now()
+    oldest_date = current - timedelta(days=14)
+    organization_types = [choice[0] for choice in ORGANIZATION_TYPE_CHOICES]
+    visible = Article.objects.filter(visible=True)
+    sample = Article.objects.order_by("-date").first()
+    return {
+        "feed": visible.filter(published=True)
+        .filter(organization_type__in=organization_types)
+        .filter(tags__in=tag_ids)
+        .filter(area=area_id)
+        .filter(date__gte=oldest_date, date__lte=current)
+        .distinct()
+        .order_by("-date")[:20],
+        "is_hot": visible.filter(is_hot=True)
+        .filter(area=area_id)
+        .filter(date__gte=oldest_date)
+        .order_by("-date")[:1],
+        "push_queued": Article.objects.filter(push_notification_queued=True),
+        "link": Article.objects.filter(link=sample.link if sample else ""),
+        "title": Article.objects.filter(title=sample.title if sample else ""),
+    }
+
+
+class Command(BaseCommand):
+    help = "Creates the feed indexes on the M2M tables and prints the feed query plans"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--create", action="store_true", help="Create the M2M through table indexes"
+        )
+        parser.add_argument(
+            "--drop", action="store_true", help="Drop the M2M through table indexes"
+        )
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help="Run the queries with EXPLAIN ANALYZE instead of EXPLAIN",
+        )
+        parser.add_argument("--area", type=int, default=3, help="Area of the feed query")
+
+    def handle(self, *args, **options):
+        if options["drop"]:
+            drop_through_table_indexes()
+            logger.info("Dropped feed indexes on the M2M tables.")
+        if options["create"]:
+            create_through_table_indexes()
+            logger.info("Created feed indexes on the M2M tables.")
+
+        # run before and after migrating / --create to compare the plans
+        area = Area.objects.filter(id=options["area"]).first()
+        if area is None:
+            self.stdout.write(self.style.ERROR("Area {} does not exist.".format(options["area"])))
+            return
+        tag_ids = list(
+            Tag.objects.filter(category_id__in=[1, 3, 4]).values_list("id", flat=True)
+        )
+        for name, queryset in get_feed_queries(area.id, tag_ids).items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(queryset.explain(analyze=options["analyze"]))
+            self.stdout.write("")
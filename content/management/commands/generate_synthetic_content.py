@@ -0,0 +1,41 @@
+from logging import getLogger
+
+from django.core.management.base import BaseCommand
+
+from content.synthetic import DEFAULT_VOLUMES, delete_synthetic_content, generate_synthetic_content
+
+logger = getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Generates synthetic content and app users for load tests and the benchmark command"
+
+    def add_arguments(self, parser):
+        for name, default in DEFAULT_VOLUMES.items():
+            parser.add_argument(
+                "--{}".format(name.replace("_", "-")),
+                type=int,
+                default=default,
+                help=f"Number of {name.replace('_', ' ')} (default {default})",
+            )
+        parser.add_argument("--seed", type=int, default=0, help="Seed of the random content")
+        parser.add_argument(
+            "--replace", action="store_true", help="Delete previously generated content first"
+        )
+        parser.add_argument(
+            "--delete-only", action="store_true", help="Only delete previously generated content"
+        )
+
+    def handle(self, *args, **options):
+        if options["replace"] or options["delete_only"]:
+            deleted = delete_synthetic_content()
+            self.stdout.write(f"Deleted {deleted} synthetic rows.")
+            if options["delete_only"]:
+                return
+
+        def progress(name, count):
+            self.stdout.write(f"Generated {count} {name.replace('_', ' ')}.")
+
+        volumes = {name: options[name] for name in DEFAULT_VOLUMES}
+        generate_synthetic_content(volumes, seed=options["seed"], progress=progress)
+        self.stdout.write(self.style.SUCCESS("Generated the synthetic content."))
@@ -13,10 +13,12 @@ import requests
 import feedparser
 from webpreview import InvalidURL, OpenGraph, URLUnreachable
 from dateutil.parser import parse as parse_datetime
-from content.models import Article, Source, Tag, Area, Organization, EventV4, Event_Occurrence
+from content.models import Article, ArchivedArticle, Source, Tag, Area, Organization, EventV4, Event_Occurrence
 from content.parsers import get_parser_function
 import ml.news_article_tagging  as ml
+from content.metrics import IMPORTER_ITEMS, IMPORTER_STAGE_SECONDS, command_metrics
 import sys
+from time import perf_counter
 import requests
 import re
 from bs4 import BeautifulSoup
@@ -298,6 +300,30 @@ def _get_article(entry):
 
 
 
+def archived_article_exists(entry):
+    """Check if the entry was already imported and moved to the archive table.
+
+    Args:
+        entry (feedparser.entry): parsed feedparser entry
+
+    Returns:
+        bool
+    """
+    if getattr(entry, "foreign_id", None):
+        if ArchivedArticle.objects.filter(foreign_id=entry.foreign_id).exists():
+            return True
+    if getattr(entry, "link", None):
+        if ArchivedArticle.objects.filter(link=entry.link).exists():
+            return True
+    if getattr(entry, "title", None):
+        return ArchivedArticle.objects.filter(title=entry.title).exists()
+    return False
+
+
+# article_exists result for entries that are only left in the archive table
+ARCHIVED = "archived"
+
+
 def article_exists(entry):
     article = None
     if hasattr(entry, "foreign_id") and entry.foreign_id:
@@ -317,6 +343,10 @@ def article_exists(entry):
            pass
    
     if not article:
+        # aged articles are moved out of the article table, don't import them
+        # again, but there is no article left to update or depublicate either
+        if archived_article_exists(entry):
+            return ARCHIVED
         return False
     
     return True
@@ -413,6 +443,7 @@ def write_article(entry_parsed, source, tagging_engine):
         date_value = timezone.make_aware(date_value)
     # write out the content of entry_parsed into the log but convert it into a string first
 
+    write_started = perf_counter()
     article = entry_class.objects.create(
         title=correct_encoding(entry_parsed.title, source),
         abstract=correct_encoding(entry_parsed_summary, source),
@@ -428,9 +459,13 @@ def write_article(entry_parsed, source, tagging_engine):
         foreign_id=getattr(entry_parsed, "foreign_id", None),
         up_for_review=True,
     )
+    write_seconds = perf_counter() - write_started
+
+    with IMPORTER_STAGE_SECONDS.time(source=source.name, stage="tag"):
+        automatically_detected_tags = tagging_engine.tag_news_article(entry_parsed.title, entry_parsed.summary)
 
+    write_started = perf_counter()
     all_tags = Tag.objects.all().values()
-    automatically_detected_tags = tagging_engine.tag_news_article(entry_parsed.title, entry_parsed.summary)
 
     # add the automatically detected tags to the list of tags of the article
     for auto_tag in automatically_detected_tags:
@@ -450,6 +485,11 @@ def write_article(entry_parsed, source, tagging_engine):
                 article.area.add(area['id'])
                 article_area = source_area['name']
 
+    IMPORTER_STAGE_SECONDS.observe(
+        write_seconds + perf_counter() - write_started, source=source.name, stage="write"
+    )
+    IMPORTER_ITEMS.inc(source=source.name, kind="article")
+
   # get the info if the article is related to the area of the source using the GPT model
     
     # create the prompt for the query
@@ -589,9 +629,11 @@ def import_articles():
         logger.error ("Importing ICS source: " + source.name)
         try:
                 # get response
-                response = requests.get(source.link)
+                with IMPORTER_STAGE_SECONDS.time(source=source.name, stage="fetch"):
+                    response = requests.get(source.link)
                 # Handle .ics file parsing and event creation
-                events = parse_ics_for_events(response.content, base_url=source.link)
+                with IMPORTER_STAGE_SECONDS.time(source=source.name, stage="parse"):
+                    events = parse_ics_for_events(response.content, base_url=source.link)
                 
                 for event_data in events:
                     title = event_data["title"]
@@ -633,6 +675,7 @@ def import_articles():
                     if EventV4.objects.filter(title=title, source=source, start_date=start_datetime).exists():
                         continue  # Skip if duplicate exists
                     
+                    write_started = perf_counter()
                     event = EventV4.objects.create(
                         title=title,
                         content=description,
@@ -659,6 +702,10 @@ def import_articles():
                     if not event.tags.all():
                         for tag in Tag.objects.filter(id=30):
                             event.tags.add(tag)
+                    IMPORTER_STAGE_SECONDS.observe(
+                        perf_counter() - write_started, source=source.name, stage="write"
+                    )
+                    IMPORTER_ITEMS.inc(source=source.name, kind="event")
                    
                     counter += 1
         except Exception as e:
@@ -673,9 +720,11 @@ def import_articles():
         
         if 'hansestadt-lueneburg.de' in source.link:
             try:
-                response = requests.get(source.link)
+                with IMPORTER_STAGE_SECONDS.time(source=source.name, stage="fetch"):
+                    response = requests.get(source.link)
                 response.encoding = 'utf-8'
-                articles = parse_html_for_articles(response.text, base_url=source.link)
+                with IMPORTER_STAGE_SECONDS.time(source=source.name, stage="parse"):
+                    articles = parse_html_for_articles(response.text, base_url=source.link)
 
                 for article_data in articles:
                     # Assuming article_data["date"] contains the date in German format, like '11.12.2024' (DD.MM.YYYY)
@@ -715,7 +764,8 @@ def import_articles():
 
         # Get source data
         try:
-            response = requests.get(source.link)
+            with IMPORTER_STAGE_SECONDS.time(source=source.name, stage="fetch"):
+                response = requests.get(source.link)
             response.encoding = 'utf-8'  # Setze die Kodierung explizit auf UTF-8
             text = response.text
         except Exception as e:
@@ -723,6 +773,7 @@ def import_articles():
             continue
         
         # Sanitize source data
+        parse_started = perf_counter()
         try:
             sanitized_text = etree.tostring(
                 etree.fromstring(text.encode('utf-8'), parser=xml_parser)
@@ -750,6 +801,9 @@ def import_articles():
             logger.error(f"Error while getting parser function for source {s}: {str(e)}")
             logger.error(traceback.format_exc())
             continue
+        IMPORTER_STAGE_SECONDS.observe(
+            perf_counter() - parse_started, source=source.name, stage="parse"
+        )
  
         # iterate through all entries
         for entry in feed.entries:
@@ -811,6 +865,8 @@ def import_articles():
                 continue
             
             try:
+                if exists == ARCHIVED:
+                    continue
                 if exists or depublicated:
                     if exists and depublicated:
                         logger.info(f"deleting {entry_parsed.title} from db")
@@ -833,7 +889,7 @@ def import_articles():
                 continue
 
         source.import_date = localtime()
-        source.save()
+        source.save(update_fields=["import_date"])
 
     logger.info (str(counter) + " Articles imported.")
 
@@ -842,7 +898,8 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         logger.info("Starting article import.")
-        import_articles()
+        with command_metrics("import_articles"):
+            import_articles()
    
 
 if __name__ == "__main__":
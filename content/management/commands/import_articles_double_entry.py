@@ -377,7 +377,7 @@ def import_articles():
                 logger.error(traceback.format_exc())
 
         source.import_date = localtime()
-        source.save()
+        source.save(update_fields=["import_date"])
 
     logger.info (str(counter) + " Articles imported.")
 
@@ -2,6 +2,8 @@ from django.core.management.base import BaseCommand
 from django.utils.timezone import localtime, now
 from django.db.models import Max
 from content.models import Article, Area
+from content.hot_articles import refresh_hot_articles
+from content.metrics import command_metrics
 from django.utils.timezone import make_aware, datetime
 from random import choice
 import logging
@@ -12,6 +14,10 @@ class Command(BaseCommand):
     help = "Markiert den Artikel mit der höchsten Anfragezahl (request_count) als 'is_hot' für jede Area"
 
     def handle(self, *args, **options):
+        with command_metrics("select_hot_articles"):
+            self.select_hot_articles()
+
+    def select_hot_articles(self):
         today = localtime(now()).date()
         today_start = make_aware(datetime.combine(localtime(now()).date(), datetime.min.time()))
         today_end = make_aware(datetime.combine(localtime(now()).date(), datetime.max.time()))
@@ -53,4 +59,7 @@ class Command(BaseCommand):
 
             logger.error(f"Artikel '{max_request_count_article.title}' für Area '{area.name}' wurde als 'is_hot' markiert.")
 
+        # Hot-Artikel-Registry für alle Areas aktualisieren
+        refresh_hot_articles()
+
         logger.error("Skript erfolgreich abgeschlossen.")
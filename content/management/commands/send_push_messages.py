@@ -5,6 +5,7 @@ from django.core.management.base import BaseCommand
 from django.conf import settings
 from pyfcm import FCMNotification
 
+from content.metrics import PUSH_FANOUT, PUSH_SECONDS, command_metrics
 from content.models import AppUser, Article, Source
 
 logger = getLogger("push_notifications")
@@ -77,12 +78,14 @@ def push_messages(push_queue):
 
         data = {"article_id": article.id}
 
-        result = push_service.notify_multiple_devices(
-            registration_ids=valid_ids,
-            message_title=message_title,
-            message_body=message_body,
-            data_message=data,
-        )
+        PUSH_FANOUT.observe(len(valid_ids), type=push_type)
+        with PUSH_SECONDS.time(type=push_type):
+            result = push_service.notify_multiple_devices(
+                registration_ids=valid_ids,
+                message_title=message_title,
+                message_body=message_body,
+                data_message=data,
+            )
         logger.debug("Push result:")
         logger.debug(result)
 
@@ -100,7 +103,8 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         logger.info("Starting push message run")
-        run()
+        with command_metrics("send_push_messages"):
+            run()
         logger.info("Done")
 
 
@@ -0,0 +1,26 @@
+from logging import getLogger
+
+from django.core.management.base import BaseCommand
+
+from content.preferences import sparsify_appusers
+
+logger = getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Converts the tag and organization selection of all app users to opt-outs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=None, help="Number of app user ids per transaction"
+        )
+
+    def handle(self, *args, **options):
+        def progress(done_id, max_id, converted):
+            self.stdout.write(f"App user ids up to {done_id} of {max_id} done, {converted} converted.")
+
+        converted = sparsify_appusers(chunk_size=options["chunk_size"], progress=progress)
+        if not converted:
+            self.stdout.write(self.style.WARNING("No app users with dense preferences found."))
+            return
+        self.stdout.write(self.style.SUCCESS(f"Converted {converted} app users to sparse preferences."))
@@ -0,0 +1,15 @@
+from logging import getLogger
+
+from django.core.management.base import BaseCommand
+
+from content.visibility import update_all_content
+
+logger = getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Copies the source and organization state to the visible and organization_type columns"
+
+    def handle(self, *args, **options):
+        updated = update_all_content()
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} articles and events."))
@@ -0,0 +1,48 @@
+from logging import getLogger
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from content.images import RENDITION_FIELDS, warm_renditions
+
+logger = getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Creates the feed and detail thumbnails of all existing images ahead of the first request"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            action="append",
+            choices=list(RENDITION_FIELDS),
+            help="Only warm the images of this model, can be repeated",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=500, help="Number of instances warmed at once"
+        )
+
+    def handle(self, *args, **options):
+        for model_label in options["model"] or RENDITION_FIELDS:
+            model = apps.get_model(model_label)
+            has_image = Q()
+            for field_name in RENDITION_FIELDS[model_label]:
+                has_image |= ~Q(**{field_name: ""}) & Q(**{"{}__isnull".format(field_name): False})
+            ids = list(model.objects.filter(has_image).order_by("id").values_list("id", flat=True))
+
+            created = 0
+            failed = []
+            for start in range(0, len(ids), options["chunk_size"]):
+                chunk = model.objects.filter(id__in=ids[start:start + options["chunk_size"]])
+                chunk_created, chunk_failed = warm_renditions(model_label, chunk)
+                created += chunk_created
+                failed.extend(chunk_failed)
+
+            for path in failed:
+                logger.error("Could not warm %s", path)
+            self.stdout.write(
+                "{}: {} instances, {} thumbnails created, {} failed".format(
+                    model_label, len(ids), created, len(failed)
+                )
+            )
@@ -0,0 +1,297 @@
+import os
+from bisect import bisect_left
+from contextlib import contextmanager
+from logging import getLogger
+from tempfile import NamedTemporaryFile
+from threading import Lock
+from time import perf_counter, time
+
+from django.conf import settings
+
+logger = getLogger(__name__)
+
+# In-process counters, gauges and histograms in the Prometheus text format,
+# without a client library or a push gateway. Every process keeps its own
+# values: the web workers expose theirs at /metrics (see metrics_view), the
+# management commands dump theirs when they finish, to the log and, if
+# METRICS_TEXTFILE_DIR is set, as a .prom file for the textfile collector of
+# the node exporter.
+METRICS_TEXTFILE_DIR = getattr(settings, "METRICS_TEXTFILE_DIR", None)
+# /metrics is disabled unless one of them is configured. Scrapers send the
+# token as "Authorization: Bearer <token>". The allowlist is matched against
+# REMOTE_ADDR and ignores proxied requests, whose REMOTE_ADDR is the proxy.
+METRICS_TOKEN = getattr(settings, "METRICS_TOKEN", None)
+METRICS_ALLOWED_IPS = getattr(settings, "METRICS_ALLOWED_IPS", ())
+METRICS_PREFIX = "molonews_"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+SIZE_BUCKETS = (1, 10, 100, 1000, 10000, 100000)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(name, _escape(value)) for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = METRICS_PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                "{} takes the labels {}, got {}".format(self.name, self.labelnames, sorted(labels))
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def render_samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [
+            "# HELP {} {}".format(self.name, self.documentation),
+            "# TYPE {} {}".format(self.name, self.type_name),
+        ]
+        with self._lock:
+            lines.extend(self.render_samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render_samples(self):
+        return [
+            "{}{} {}".format(self.name, _format_labels(self.labelnames, key), _format_value(value))
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a block in seconds."""
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - started, **labels)
+
+    def render_samples(self):
+        lines = []
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bucket, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(
+                    "{}_bucket{} {}".format(
+                        self.name,
+                        _format_labels(self.labelnames, key, [("le", _format_value(bucket))]),
+                        cumulative,
+                    )
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append("{}_sum{} {}".format(self.name, labels, _format_value(total)))
+            lines.append("{}_count{} {}".format(self.name, labels, cumulative))
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError("{} is registered already".format(metric.name))
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """Render all metrics in the Prometheus text format.
+
+        Returns:
+            str
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        return "".join(metric.render() + "\n" for metric in metrics)
+
+    def reset(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+
+REGISTRY = Registry()
+
+# other methods are counted as "other", clients choose them freely
+METRICS_METHODS = ("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS")
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "api_request_duration_seconds", "Duration of API requests", ("route", "method", "status")
+)
+REQUEST_DB_SECONDS = REGISTRY.histogram(
+    "api_request_db_seconds", "Database time of API requests", ("route",)
+)
+REQUEST_QUERIES = REGISTRY.histogram(
+    "api_request_queries", "Queries of API requests", ("route",), SIZE_BUCKETS
+)
+IMPORTER_STAGE_SECONDS = REGISTRY.histogram(
+    "importer_stage_seconds",
+    "Duration of the fetch, parse, tag and write stages of the importer",
+    ("source", "stage"),
+    STAGE_BUCKETS,
+)
+IMPORTER_ITEMS = REGISTRY.counter(
+    "importer_items_total", "Articles and events written by the importer", ("source", "kind")
+)
+TAGGING_INFERENCE_SECONDS = REGISTRY.histogram(
+    "tagging_inference_seconds", "Duration of ONNX inference batches", ("model",)
+)
+PUSH_FANOUT = REGISTRY.histogram(
+    "push_fanout_recipients", "Devices a push message is sent to", ("type",), SIZE_BUCKETS
+)
+PUSH_SECONDS = REGISTRY.histogram(
+    "push_send_seconds",
+    "Duration of sending a push message to all devices",
+    ("type",),
+    STAGE_BUCKETS,
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "cache_requests_total", "Lookups of the application caches", ("cache", "result")
+)
+COMMAND_SECONDS = REGISTRY.gauge(
+    "command_duration_seconds", "Duration of the last run of a management command", ("command",)
+)
+COMMAND_FINISHED = REGISTRY.gauge(
+    "command_finished_timestamp_seconds",
+    "End of the last run of a management command",
+    ("command", "status"),
+)
+
+
+class DatabaseTimer:
+    """Execute wrapper summing the number and the duration of queries."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += perf_counter() - started
+            self.count += 1
+
+
+def count_cache_lookup(cache_name, hit, count=1):
+    """Count hits or misses of an application cache.
+
+    Args:
+        cache_name (str): e.g. "fragments" or "taxonomy"
+        hit (bool): found in the cache
+        count (int): number of lookups, for get_many
+    """
+    if count:
+        CACHE_REQUESTS.inc(count, cache=cache_name, result="hit" if hit else "miss")
+
+
+def write_textfile(name, content):
+    # written to a temporary file first, the collector never reads half a file
+    path = os.path.join(METRICS_TEXTFILE_DIR, "{}{}.prom".format(METRICS_PREFIX, name))
+    with NamedTemporaryFile("w", dir=METRICS_TEXTFILE_DIR, delete=False, suffix=".tmp") as output:
+        output.write(content)
+    os.chmod(output.name, 0o644)
+    os.replace(output.name, path)
+
+
+@contextmanager
+def command_metrics(name):
+    """Dump the metrics of a management command when it finishes.
+
+    Example:
+        with command_metrics("import_articles"):
+            import_articles()
+
+    Args:
+        name (str): name of the command
+    """
+    started = perf_counter()
+    status = "error"
+    try:
+        yield
+        status = "success"
+    finally:
+        COMMAND_SECONDS.set(perf_counter() - started, command=name)
+        COMMAND_FINISHED.set(time(), command=name, status=status)
+        content = REGISTRY.render()
+        logger.info("metrics of %s:\n%s", name, content)
+        if METRICS_TEXTFILE_DIR:
+            try:
+                write_textfile(name, content)
+            except OSError as e:
+                logger.error("cannot write the metrics of %s: %s", name, e)
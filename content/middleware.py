@@ -1,4 +1,24 @@
+from time import perf_counter
+
+from django.db import connection
 from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
+
+from .appusers import end_request, get_appuser, start_request
+from .metrics import (
+    METRICS_METHODS,
+    REQUEST_DB_SECONDS,
+    REQUEST_QUERIES,
+    REQUEST_SECONDS,
+    DatabaseTimer,
+)
+from .query_budget import (
+    QUERY_BUDGET_ENABLED,
+    QUERY_BUDGET_HEADERS,
+    QueryRecorder,
+    check_query_budget,
+    get_query_budget,
+)
 
 class AccessControlAllowOriginMiddleware(MiddlewareMixin):
     def process_response(self, request, response):
@@ -21,3 +41,75 @@ class AccessControlAllowOriginMiddleware(MiddlewareMixin):
             return response
         
         return response
+
+
+class AppUserMiddleware(MiddlewareMixin):
+    """Resolve the AppUser of the X-Device-ID header at most once per request.
+
+    The AppUser is attached lazily as request.app_user, get_appuser() calls
+    during the request return the same instance without a query.
+    """
+
+    def process_request(self, request):
+        start_request()
+        device_id = request.headers.get("X-Device-ID")
+        request.app_user = SimpleLazyObject(lambda: get_appuser(device_id))
+
+    def process_response(self, request, response):
+        end_request()
+        return response
+
+
+class QueryBudgetMiddleware:
+    """Count the queries of every request and check them against the route's budget.
+
+    See content.query_budget. Rendering happens inside get_response, so the
+    queries of the serializers are counted as well.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not QUERY_BUDGET_ENABLED:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        with recorder.record():
+            response = self.get_response(request)
+
+        resolver_match = getattr(request, "resolver_match", None)
+        route = resolver_match.view_name if resolver_match else request.path
+        check_query_budget(route, recorder, get_query_budget(resolver_match, request.method))
+        if QUERY_BUDGET_HEADERS:
+            response["X-Query-Count"] = str(recorder.count)
+            response["Server-Timing"] = "db;dur={:.2f}".format(recorder.duration * 1000)
+        return response
+
+
+class MetricsMiddleware:
+    """Observe the duration, database time and queries of every request per route.
+
+    Routes are view names like "v4:article-list", so the labels stay few.
+    See content.metrics.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = DatabaseTimer()
+        started = perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        duration = perf_counter() - started
+
+        resolver_match = getattr(request, "resolver_match", None)
+        route = resolver_match.view_name if resolver_match else "unresolved"
+        method = request.method if request.method in METRICS_METHODS else "other"
+        REQUEST_SECONDS.observe(
+            duration, route=route, method=method, status=response.status_code
+        )
+        REQUEST_DB_SECONDS.observe(timer.duration, route=route)
+        REQUEST_QUERIES.observe(timer.count, route=route)
+        return response
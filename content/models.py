@@ -1,6 +1,8 @@
 from datetime import datetime, timedelta
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import HashIndex
 from django.core.exceptions import ValidationError
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
@@ -13,7 +15,7 @@ import re
 
 from recurrence.fields import RecurrenceField
 
-from .choices import ORGANIZATION_TYPE_CHOICES, RECURRING_EVENT_CHOICES
+from .choices import ORGANIZATION_TYPE_CHOICES, QR_PLATFORM_CHOICES, RECURRING_EVENT_CHOICES
 from .signals import EVENT_SAVED
 
 
@@ -280,9 +282,46 @@ class Article(models.Model):
 
     area = models.ManyToManyField(Area, verbose_name=_("area"))
 
+    # copies of the source's state kept by content.visibility
+    visible = models.BooleanField(default=True, editable=False, verbose_name=_("visible"))
+    organization_type = models.CharField(
+        max_length=10,
+        choices=ORGANIZATION_TYPE_CHOICES,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name=_("organization type"),
+    )
+
     class Meta:
         verbose_name = _("article")
         verbose_name_plural = _("articles")
+        # tuned to the feed, hot article, push and importer queries,
+        # see the feed_indexes management command for the query plans
+        indexes = [
+            models.Index(
+                fields=["-date"],
+                name="article_published_date_idx",
+                condition=models.Q(published=True),
+            ),
+            models.Index(
+                fields=["organization_type", "-date"],
+                name="article_visible_type_date_idx",
+                condition=models.Q(published=True, visible=True),
+            ),
+            models.Index(
+                fields=["-date"],
+                name="article_is_hot_date_idx",
+                condition=models.Q(is_hot=True),
+            ),
+            models.Index(
+                fields=["id"],
+                name="article_push_queued_idx",
+                condition=models.Q(push_notification_queued=True),
+            ),
+            HashIndex(fields=["link"], name="article_link_hash_idx"),
+            HashIndex(fields=["title"], name="article_title_hash_idx"),
+        ]
 
     def __str__(self):
         return self.title
@@ -299,6 +338,53 @@ class ArticleDraft(Article):
         verbose_name_plural = _("article drafts")
 
 
+class ArchivedArticle(models.Model):
+    """Aged article moved out of the article table by the age_articles command.
+
+    Tags and areas are kept as plain id lists, so the M2M tables of the
+    article table shrink together with the table itself.
+    """
+
+    article_id = models.IntegerField(unique=True, verbose_name=_("article id"))
+    # the importer looks up entries by title
+    title = models.CharField(max_length=350, db_index=True, verbose_name=_("title"))
+    abstract = models.TextField(null=True, blank=True, verbose_name=_("abstract"))
+    content = models.TextField(blank=True, verbose_name=_("content"))
+    date = models.DateTimeField(db_index=True, verbose_name=_("date"))
+    moddate = models.DateTimeField(null=True, blank=True, verbose_name=_("moddate"))
+    link = models.URLField(
+        max_length=600, null=True, blank=True, db_index=True, verbose_name=_("link")
+    )
+    foreign_id = models.CharField(
+        max_length=600, null=True, blank=True, db_index=True, verbose_name=_("foreign_id")
+    )
+    image_url = models.URLField(
+        max_length=1000, null=True, blank=True, verbose_name=_("image_url")
+    )
+    image = models.CharField(max_length=300, blank=True, default="", verbose_name=_("image_feed"))
+    image_detail = models.CharField(
+        max_length=300, blank=True, default="", verbose_name=_("image_detail")
+    )
+    image_source = models.CharField(
+        max_length=600, null=True, blank=True, verbose_name=_("image_source")
+    )
+    source = models.ForeignKey(
+        Source, null=True, on_delete=models.SET_NULL, verbose_name=_("source")
+    )
+    published = models.BooleanField(default=False, verbose_name=_("published"))
+    request_count = models.PositiveIntegerField(default=0, verbose_name=_("request count"))
+    tag_ids = ArrayField(models.IntegerField(), default=list, blank=True)
+    area_ids = ArrayField(models.IntegerField(), default=list, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name=_("archived at"))
+
+    class Meta:
+        verbose_name = _("archived article")
+        verbose_name_plural = _("archived articles")
+
+    def __str__(self):
+        return self.title
+
+
 EVENT_BASE_PROPERTIES = [
     "title",
     "content",
@@ -355,10 +441,27 @@ class EventV4(models.Model):
     push_notification_queued = models.BooleanField(
         default=False, verbose_name=_("push notification queued")
     )
+    # copies of the source's state kept by content.visibility
+    visible = models.BooleanField(default=True, editable=False, verbose_name=_("visible"))
+    organization_type = models.CharField(
+        max_length=10,
+        choices=ORGANIZATION_TYPE_CHOICES,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name=_("organization type"),
+    )
 
     class Meta:
         verbose_name = _("event")
         verbose_name_plural = _("events")
+        indexes = [
+            models.Index(
+                fields=["organization_type"],
+                name="eventv4_visible_type_idx",
+                condition=models.Q(published=True, visible=True),
+            ),
+        ]
 
 
 class Event_Occurrence(models.Model):
@@ -736,6 +839,14 @@ class AppUser(models.Model):
     )
 
     tags = models.ManyToManyField(Tag, blank=True, related_name="appusers_tags")
+    # Users with sparse preferences select every tag and active organization
+    # by default and only store deviations: deselected_tags,
+    # deselected_organization and organization_all_tags. The other selection
+    # tables stay empty for them, see content.preferences.
+    sparse_preferences = models.BooleanField(default=False)
+    deselected_tags = models.ManyToManyField(
+        Tag, blank=True, related_name="appusers_deselected_tags"
+    )
 
     organization = models.ManyToManyField(
         Organization, blank=True, related_name="appusers_organizations"
@@ -804,3 +915,19 @@ class User(AbstractUser):
     @property
     def is_editor(self):
         return self.groups.filter(id=1).exists()
+
+
+class QrClickCount(models.Model):
+    """Scans of a QR campaign per platform and day, see content.qr_clicks."""
+
+    campaign = models.CharField(max_length=200, blank=True, verbose_name=_("campaign"))
+    platform = models.CharField(
+        max_length=10, choices=QR_PLATFORM_CHOICES, verbose_name=_("platform")
+    )
+    day = models.DateField(verbose_name=_("day"))
+    count = models.PositiveIntegerField(default=0, verbose_name=_("count"))
+
+    class Meta:
+        verbose_name = _("QR click count")
+        verbose_name_plural = _("QR click counts")
+        unique_together = ("campaign", "platform", "day")
@@ -0,0 +1,76 @@
+from logging import getLogger
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Min
+
+from .models import AppUser
+from .versions import bump_version
+
+logger = getLogger(__name__)
+
+# Each chunk of AppUser ids is inserted in its own transaction, so the rows
+# of the through table are only locked for one chunk at a time.
+ORGANIZATION_ROLLOUT_CHUNK_SIZE = getattr(settings, "ORGANIZATION_ROLLOUT_CHUNK_SIZE", 50000)
+
+ROLLOUT_SQL = (
+    "INSERT INTO {through} ({appuser_column}, {organization_column}) "
+    "SELECT id, %s FROM {appuser} WHERE id >= %s AND id < %s AND NOT sparse_preferences "
+    "ON CONFLICT DO NOTHING"
+)
+
+
+def add_organization_to_all_appusers(organization_id, chunk_size=None, progress=None):
+    """Select an organization for every dense AppUser inside the database.
+
+    Sparse AppUsers select active organizations by default and are skipped.
+
+    One INSERT ... SELECT ... ON CONFLICT DO NOTHING per AppUser id range,
+    no AppUser is loaded into Python. m2m_changed is not sent, the cached
+    AppUser summaries are dropped as a whole instead.
+
+    Args:
+        organization_id (int): id of the organization
+        chunk_size (int): AppUser ids per statement, ORGANIZATION_ROLLOUT_CHUNK_SIZE if empty
+        progress (callable): called with (highest id done, highest id, rows inserted so far)
+
+    Returns:
+        int: number of inserted rows
+    """
+    chunk_size = chunk_size or ORGANIZATION_ROLLOUT_CHUNK_SIZE
+    field = AppUser._meta.get_field("organization")
+    quote_name = connection.ops.quote_name
+    sql = ROLLOUT_SQL.format(
+        through=quote_name(field.remote_field.through._meta.db_table),
+        appuser_column=quote_name(field.m2m_column_name()),
+        organization_column=quote_name(field.m2m_reverse_name()),
+        appuser=quote_name(AppUser._meta.db_table),
+    )
+
+    bounds = AppUser.objects.aggregate(min_id=Min("id"), max_id=Max("id"))
+    if bounds["min_id"] is None:
+        return 0
+
+    inserted = 0
+    for start in range(bounds["min_id"], bounds["max_id"] + 1, chunk_size):
+        end = start + chunk_size
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, [organization_id, start, end])
+            inserted += cursor.rowcount
+        if progress is not None:
+            progress(min(end - 1, bounds["max_id"]), bounds["max_id"], inserted)
+
+    bump_version("appuser_summaries")
+    logger.info("organization %s added to %d app users", organization_id, inserted)
+    return inserted
+
+
+def schedule_organization_rollout(organization_id):
+    """Add an organization to all AppUsers in the background after the commit.
+
+    Args:
+        organization_id (int): id of the organization
+    """
+    from .tasks import roll_out_organization
+
+    transaction.on_commit(lambda: roll_out_organization.delay(organization_id))
@@ -0,0 +1,319 @@
+from logging import getLogger
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min, Q
+
+from .models import AppUser, Organization, Tag
+from .versions import bump_version
+
+logger = getLogger(__name__)
+
+# Two representations of the tag and organization selection of an AppUser:
+#
+# dense (sparse_preferences=False): every selected tag and organization has
+#   a row in tags / organization, the complements are stored in
+#   deselected_organization / deselected_organization_all_tags.
+# sparse (sparse_preferences=True): every tag and active organization is
+#   selected by default, only deselected_tags, deselected_organization and
+#   organization_all_tags are stored.
+#
+# Everything reading or writing a selection goes through this module so both
+# give the same feeds, flags and summaries. The sparsify_preferences command
+# converts dense AppUsers.
+SPARSIFY_CHUNK_SIZE = getattr(settings, "SPARSIFY_CHUNK_SIZE", 10000)
+
+# All statements of a chunk only touch dense AppUsers with ids in [%s, %s).
+SPARSIFY_SQL = (
+    # deselect every tag a configured user has no row for
+    "INSERT INTO {deselected_tags} ({dt_user}, {dt_tag}) "
+    "SELECT u.id, t.id FROM {appuser} u CROSS JOIN {tag} t "
+    "WHERE u.id >= %s AND u.id < %s AND NOT u.sparse_preferences "
+    "AND EXISTS (SELECT 1 FROM {tags} s WHERE s.{t_user} = u.id) "
+    "AND NOT EXISTS (SELECT 1 FROM {tags} s WHERE s.{t_user} = u.id AND s.{t_tag} = t.id) "
+    "ON CONFLICT DO NOTHING",
+    # a selected organization wins over a stale deselection
+    "DELETE FROM {deselected_organization} d USING {appuser} u "
+    "WHERE d.{do_user} = u.id AND u.id >= %s AND u.id < %s AND NOT u.sparse_preferences "
+    "AND EXISTS (SELECT 1 FROM {organization} s "
+    "WHERE s.{o_user} = u.id AND s.{o_organization} = d.{do_organization})",
+    # deselect every active organization a configured user has no row for
+    "INSERT INTO {deselected_organization} ({do_user}, {do_organization}) "
+    "SELECT u.id, o.id FROM {appuser} u CROSS JOIN {organization_table} o "
+    "WHERE u.id >= %s AND u.id < %s AND NOT u.sparse_preferences AND o.active "
+    "AND EXISTS (SELECT 1 FROM {organization} s WHERE s.{o_user} = u.id) "
+    "AND NOT EXISTS (SELECT 1 FROM {organization} s "
+    "WHERE s.{o_user} = u.id AND s.{o_organization} = o.id) "
+    "ON CONFLICT DO NOTHING",
+    "DELETE FROM {tags} s USING {appuser} u WHERE s.{t_user} = u.id "
+    "AND u.id >= %s AND u.id < %s AND NOT u.sparse_preferences",
+    "DELETE FROM {organization} s USING {appuser} u WHERE s.{o_user} = u.id "
+    "AND u.id >= %s AND u.id < %s AND NOT u.sparse_preferences",
+    "DELETE FROM {deselected_organization_all_tags} s USING {appuser} u "
+    "WHERE s.{dat_user} = u.id AND u.id >= %s AND u.id < %s AND NOT u.sparse_preferences",
+    "UPDATE {appuser} SET sparse_preferences = true "
+    "WHERE id >= %s AND id < %s AND NOT sparse_preferences",
+)
+
+
+def _get_ids(app_user, m2m_field_name):
+    field = AppUser._meta.get_field(m2m_field_name)
+    return set(
+        field.remote_field.through.objects.filter(
+            **{field.m2m_column_name(): app_user.id}
+        ).values_list(field.m2m_reverse_name(), flat=True)
+    )
+
+
+def get_selected_tag_ids(app_user, exclude_category_ids=()):
+    """Get the ids of the tags an AppUser selected.
+
+    Args:
+        app_user (AppUser): app user
+        exclude_category_ids (iterable): categories whose tags are left out
+
+    Returns:
+        set: tag ids
+    """
+    if app_user.sparse_preferences:
+        tags = Tag.objects.exclude(appusers_deselected_tags=app_user)
+    else:
+        tags = app_user.tags.all()
+    if exclude_category_ids:
+        tags = tags.exclude(category_id__in=exclude_category_ids)
+    return set(tags.values_list("id", flat=True))
+
+
+def is_tag_selected(app_user, tag_id):
+    if app_user.sparse_preferences:
+        return not app_user.deselected_tags.filter(id=tag_id).exists()
+    return app_user.tags.filter(id=tag_id).exists()
+
+
+def set_selected_tag_ids(app_user, tag_ids):
+    """Store the tags an AppUser selected.
+
+    Args:
+        app_user (AppUser): app user
+        tag_ids (iterable): ids of all selected tags
+    """
+    if app_user.sparse_preferences:
+        app_user.deselected_tags.set(Tag.objects.exclude(id__in=tag_ids))
+    else:
+        app_user.tags.set(Tag.objects.filter(id__in=tag_ids))
+
+
+def get_tags_fingerprint(app_user):
+    """Fingerprint of the stored tag selection for ETags.
+
+    Args:
+        app_user (AppUser): app user or None
+
+    Returns:
+        list: [representation, highest through table id, number of rows]
+    """
+    if app_user is None:
+        return [None, 0]
+    field = AppUser._meta.get_field(
+        "deselected_tags" if app_user.sparse_preferences else "tags"
+    )
+    fingerprint = field.remote_field.through.objects.filter(
+        **{field.m2m_column_name(): app_user.id}
+    ).aggregate(max_id=Max("id"), count=Count("id"))
+    return [app_user.sparse_preferences, fingerprint["max_id"], fingerprint["count"]]
+
+
+def get_selected_organization_ids(app_user):
+    """Get the ids of the organizations an AppUser selected by tag.
+
+    Args:
+        app_user (AppUser): app user
+
+    Returns:
+        set: organization ids
+    """
+    if app_user.sparse_preferences:
+        return set(
+            Organization.objects.filter(active=True)
+            .exclude(appusers_deselected_organizations=app_user)
+            .values_list("id", flat=True)
+        )
+    return _get_ids(app_user, "organization")
+
+
+def get_organization_all_tags_ids(app_user):
+    # stored the same way in both representations
+    return _get_ids(app_user, "organization_all_tags")
+
+
+def selected_organizations_q(app_user):
+    """Q matching the organizations an AppUser selected by tag.
+
+    Args:
+        app_user (AppUser): app user
+
+    Returns:
+        Q: condition on Organization
+    """
+    if app_user.sparse_preferences:
+        deselected = AppUser.deselected_organization.through.objects.filter(
+            appuser_id=app_user.id
+        ).values("organization_id")
+        return Q(active=True) & ~Q(id__in=deselected)
+    selected = AppUser.organization.through.objects.filter(
+        appuser_id=app_user.id
+    ).values("organization_id")
+    return Q(id__in=selected)
+
+
+def get_organization_selection(app_user):
+    """Get the organization selection of an AppUser in the dense form.
+
+    Args:
+        app_user (AppUser): app user
+
+    Returns:
+        dict: "selected", "deselected", "selected_all_tags" and
+            "deselected_all_tags" id sets
+    """
+    if not app_user.sparse_preferences:
+        return {
+            "selected": _get_ids(app_user, "organization"),
+            "deselected": _get_ids(app_user, "deselected_organization"),
+            "selected_all_tags": _get_ids(app_user, "organization_all_tags"),
+            "deselected_all_tags": _get_ids(app_user, "deselected_organization_all_tags"),
+        }
+
+    organizations = dict(Organization.objects.values_list("id", "active"))
+    deselected = _get_ids(app_user, "deselected_organization")
+    selected_all_tags = _get_ids(app_user, "organization_all_tags")
+    return {
+        "selected": {
+            organization_id
+            for organization_id, active in organizations.items()
+            if active and organization_id not in deselected
+        },
+        "deselected": deselected,
+        "selected_all_tags": selected_all_tags,
+        "deselected_all_tags": set(organizations) - selected_all_tags,
+    }
+
+
+def set_organization_selection(app_user, organization_ids, organization_all_tags_ids):
+    """Store the organizations an AppUser selected by tag and with all tags.
+
+    Args:
+        app_user (AppUser): app user
+        organization_ids (iterable): organizations selected by tag
+        organization_all_tags_ids (iterable): organizations selected with all tags
+    """
+    app_user.organization_all_tags.set(
+        Organization.objects.filter(id__in=organization_all_tags_ids)
+    )
+    app_user.deselected_organization.set(
+        Organization.objects.exclude(id__in=organization_ids)
+    )
+    if not app_user.sparse_preferences:
+        app_user.organization.set(Organization.objects.filter(id__in=organization_ids))
+        app_user.deselected_organization_all_tags.set(
+            Organization.objects.exclude(id__in=organization_all_tags_ids)
+        )
+
+
+def reset_organization_selection(app_user):
+    """Select all organizations by tag again."""
+    if app_user.sparse_preferences:
+        app_user.deselected_organization.clear()
+    else:
+        app_user.organization.set(Organization.objects.all())
+        app_user.deselected_organization_all_tags.set(Organization.objects.all())
+
+
+def ensure_default_preferences(app_user):
+    """Select all tags and active organizations for an unconfigured dense AppUser.
+
+    Sparse AppUsers select them by default and are left alone, so new
+    devices no longer get users x tags and users x organizations rows.
+
+    Args:
+        app_user (AppUser): app user
+    """
+    if app_user.sparse_preferences:
+        return
+    # one insert per relation, like the add() calls did one per row
+    if not app_user.tags.exists():
+        app_user.tags.add(*Tag.objects.values_list("id", flat=True))
+    if not app_user.organization.exists():
+        app_user.organization.add(
+            *Organization.objects.filter(active=True).values_list("id", flat=True)
+        )
+
+
+def _get_sparsify_statements():
+    quote_name = connection.ops.quote_name
+    names = {
+        "appuser": quote_name(AppUser._meta.db_table),
+        "tag": quote_name(Tag._meta.db_table),
+        "organization_table": quote_name(Organization._meta.db_table),
+    }
+    for key, field_name in (
+        ("tags", "tags"),
+        ("deselected_tags", "deselected_tags"),
+        ("organization", "organization"),
+        ("deselected_organization", "deselected_organization"),
+        ("deselected_organization_all_tags", "deselected_organization_all_tags"),
+    ):
+        field = AppUser._meta.get_field(field_name)
+        names[key] = quote_name(field.remote_field.through._meta.db_table)
+    for prefix, field_name in (
+        ("t", "tags"),
+        ("dt", "deselected_tags"),
+        ("o", "organization"),
+        ("do", "deselected_organization"),
+        ("dat", "deselected_organization_all_tags"),
+    ):
+        field = AppUser._meta.get_field(field_name)
+        names["{}_user".format(prefix)] = quote_name(field.m2m_column_name())
+        names["{}_{}".format(prefix, field.related_model._meta.model_name)] = quote_name(
+            field.m2m_reverse_name()
+        )
+    return [sql.format(**names) for sql in SPARSIFY_SQL]
+
+
+def sparsify_appusers(chunk_size=None, progress=None):
+    """Convert all dense AppUsers to sparse preferences inside the database.
+
+    Every chunk of AppUser ids is converted in its own transaction, no
+    AppUser is loaded into Python. Inactive organizations selected by a dense
+    AppUser are not kept, sparse AppUsers never select them.
+
+    Args:
+        chunk_size (int): AppUser ids per transaction, SPARSIFY_CHUNK_SIZE if empty
+        progress (callable): called with (highest id done, highest id, users converted so far)
+
+    Returns:
+        int: number of converted AppUsers
+    """
+    chunk_size = chunk_size or SPARSIFY_CHUNK_SIZE
+    statements = _get_sparsify_statements()
+
+    bounds = AppUser.objects.filter(sparse_preferences=False).aggregate(
+        min_id=Min("id"), max_id=Max("id")
+    )
+    if bounds["min_id"] is None:
+        return 0
+
+    converted = 0
+    for start in range(bounds["min_id"], bounds["max_id"] + 1, chunk_size):
+        end = start + chunk_size
+        with transaction.atomic(), connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql, [start, end])
+            # the UPDATE comes last
+            converted += cursor.rowcount
+        if progress is not None:
+            progress(min(end - 1, bounds["max_id"]), bounds["max_id"], converted)
+
+    bump_version("appuser_summaries")
+    logger.info("converted %d app users to sparse preferences", converted)
+    return converted
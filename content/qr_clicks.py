@@ -0,0 +1,181 @@
+import atexit
+import json
+from collections import Counter, deque
+from datetime import datetime
+from functools import lru_cache
+from logging import getLogger
+from threading import Lock
+from time import time
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils.timezone import localtime, utc
+
+from .models import QrClickCount
+
+logger = getLogger(__name__)
+# one JSON line per scan, route this logger to a rotating file handler
+click_logger = getLogger("content.qr_clicks.log")
+
+# Scans are kept in a ring buffer and written in batches, a burst of scans
+# never touches the disk or the database per request. If flushing fails the
+# buffer keeps the newest scans.
+QR_CLICK_BUFFER_SIZE = getattr(settings, "QR_CLICK_BUFFER_SIZE", 10000)
+QR_CLICK_FLUSH_SIZE = getattr(settings, "QR_CLICK_FLUSH_SIZE", 200)
+QR_CLICK_FLUSH_INTERVAL = getattr(settings, "QR_CLICK_FLUSH_INTERVAL", 60)
+# known campaign keys, scans of other keys are counted without campaign, None
+# accepts every key up to the length of QrClickCount.campaign
+QR_CAMPAIGNS = getattr(settings, "QR_CAMPAIGNS", None)
+QR_CAMPAIGN_MAX_LENGTH = QrClickCount._meta.get_field("campaign").max_length
+
+_clicks = deque(maxlen=QR_CLICK_BUFFER_SIZE)
+_clicks_lock = Lock()
+_flush_lock = Lock()
+_last_flush = time()
+
+
+@lru_cache(maxsize=2048)
+def classify_platform(user_agent):
+    """Classify a user agent once, scans of a campaign share few of them.
+
+    Args:
+        user_agent (str): User-Agent header, may be empty
+
+    Returns:
+        str: "ios", "android" or "other"
+    """
+    if "iPhone" in user_agent or "iPad" in user_agent:
+        return "ios"
+    if "Android" in user_agent:
+        return "android"
+    return "other"
+
+
+def clean_campaign(key):
+    """Map the first query parameter of a scan to the campaign it is counted for.
+
+    Args:
+        key (str): first query parameter, may be empty
+
+    Returns:
+        str: campaign key, "" for scans without a (known) campaign
+    """
+    if QR_CAMPAIGNS is not None:
+        return key if key in QR_CAMPAIGNS else ""
+    return key[:QR_CAMPAIGN_MAX_LENGTH]
+
+
+def record_click(campaign, platform):
+    """Record a scan, the buffer is flushed once it is full enough or old.
+
+    Args:
+        campaign (str): campaign key from clean_campaign
+        platform (str): platform from classify_platform
+    """
+    with _clicks_lock:
+        _clicks.append((time(), campaign, platform))
+        due = (
+            len(_clicks) >= QR_CLICK_FLUSH_SIZE
+            or time() - _last_flush >= QR_CLICK_FLUSH_INTERVAL
+        )
+    if due:
+        flush_clicks()
+
+
+def flush_clicks():
+    """Write the buffered scans to the log and add them to the daily counts.
+
+    Returns:
+        int: number of flushed scans
+    """
+    global _last_flush
+
+    # only one thread flushes, the others keep recording
+    if not _flush_lock.acquire(blocking=False):
+        return 0
+    try:
+        with _clicks_lock:
+            clicks = list(_clicks)
+            _clicks.clear()
+            _last_flush = time()
+        if not clicks:
+            return 0
+
+        counts = Counter()
+        lines = []
+        for timestamp, campaign, platform in clicks:
+            moment = localtime(datetime.fromtimestamp(timestamp, tz=utc))
+            lines.append({"time": moment.isoformat(), "campaign": campaign, "platform": platform})
+            counts[(campaign, platform, moment.date())] += 1
+
+        try:
+            add_counts(counts)
+        except Exception as e:
+            logger.error("could not store %d QR scans: %s", len(clicks), e)
+            with _clicks_lock:
+                # put them back in front of newer scans, the deque drops the oldest
+                restored = clicks + list(_clicks)
+                _clicks.clear()
+                _clicks.extend(restored)
+            return 0
+
+        # logged once stored, a failed flush is retried with the next one
+        for line in lines:
+            click_logger.info(json.dumps(line))
+        return len(clicks)
+    finally:
+        _flush_lock.release()
+
+
+def add_counts(counts):
+    """Add scans to the daily counts, one statement per campaign, platform and day.
+
+    Every row is written in its own savepoint, a row the database rejects is
+    logged and dropped instead of failing the batch. Other errors, e.g. a lost
+    connection, are raised so the batch is retried.
+
+    Args:
+        counts (Counter): (campaign, platform, day) -> number of scans
+    """
+    with transaction.atomic():
+        for (campaign, platform, day), count in counts.items():
+            lookup = {"campaign": campaign, "platform": platform, "day": day}
+            try:
+                with transaction.atomic():
+                    add_count(lookup, count)
+            except DataError as e:
+                logger.error("dropped %d QR scans of %r: %s", count, lookup, e)
+
+
+def add_count(lookup, count):
+    if QrClickCount.objects.filter(**lookup).update(count=F("count") + count):
+        return
+    try:
+        with transaction.atomic():
+            QrClickCount.objects.create(count=count, **lookup)
+    except IntegrityError:
+        # created by another process in the meantime
+        QrClickCount.objects.filter(**lookup).update(count=F("count") + count)
+
+
+def get_campaign_counts(campaign):
+    """Get the number of scans of a campaign per platform.
+
+    Scans still in the buffer of a process are not included.
+
+    Args:
+        campaign (str): campaign key
+
+    Returns:
+        dict: platform -> number of scans
+    """
+    return dict(
+        QrClickCount.objects.filter(campaign=campaign)
+        .values("platform")
+        .annotate(total=Sum("count"))
+        .values_list("platform", "total")
+    )
+
+
+atexit.register(flush_clicks)
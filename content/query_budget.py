@@ -0,0 +1,206 @@
+import re
+import sys
+from collections import Counter
+from contextlib import contextmanager
+from logging import getLogger
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connection
+
+logger = getLogger(__name__)
+
+# QueryBudgetMiddleware counts the queries and the database time of every
+# request and warns when a route exceeds its budget or when a query shape
+# repeats, which is how N+1 queries show up: the same SELECT with other
+# parameters once per tag, event or organization.
+#
+# The budget of a route is QUERY_BUDGETS[view name] (e.g. "v4:article-list"),
+# else the query_budget attribute of the view, an int or a dict of
+# action -> int, else DEFAULT_QUERY_BUDGET. In tests QUERY_BUDGET_RAISE turns
+# the warnings into QueryBudgetExceeded; assert_max_queries checks a block.
+QUERY_BUDGET_ENABLED = getattr(settings, "QUERY_BUDGET_ENABLED", True)
+QUERY_BUDGETS = getattr(settings, "QUERY_BUDGETS", {})
+DEFAULT_QUERY_BUDGET = getattr(settings, "DEFAULT_QUERY_BUDGET", None)
+# a query shape executed this often within a request is reported
+QUERY_REPEAT_THRESHOLD = getattr(settings, "QUERY_REPEAT_THRESHOLD", 5)
+QUERY_BUDGET_RAISE = getattr(settings, "QUERY_BUDGET_RAISE", False)
+# X-Query-Count and Server-Timing response headers
+QUERY_BUDGET_HEADERS = getattr(settings, "QUERY_BUDGET_HEADERS", settings.DEBUG)
+
+ORIGIN_MODULES = ("api.", "content.")
+IGNORED_ORIGIN_MODULES = (__name__, "content.middleware")
+
+in_list_re = re.compile(r"IN \((?:%s, )*%s\)")
+string_literal_re = re.compile(r"'(?:[^']|'')*'")
+number_literal_re = re.compile(r"\b\d+\b")
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def get_query_shape(sql):
+    """Reduce a query to its shape, i.e. without parameters and literals.
+
+    Args:
+        sql (str): SQL with placeholders
+
+    Returns:
+        str
+    """
+    sql = in_list_re.sub("IN (...)", sql)
+    sql = string_literal_re.sub("?", sql)
+    return number_literal_re.sub("?", sql)
+
+
+def find_origin():
+    """Describe the code of the project that executes the current query.
+
+    Returns:
+        str: innermost serializer method, else innermost function of the project
+    """
+    innermost = None
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith(ORIGIN_MODULES) and module not in IGNORED_ORIGIN_MODULES:
+            owner = frame.f_locals.get("self")
+            name = frame.f_code.co_name
+            if owner is not None:
+                name = "{}.{}".format(type(owner).__name__, name)
+            origin = "{} ({}:{})".format(name, module, frame.f_lineno)
+            if owner is not None and type(owner).__name__.endswith("Serializer"):
+                return origin
+            innermost = innermost or origin
+        frame = frame.f_back
+    return innermost
+
+
+class QueryRecorder:
+    """Execute wrapper counting the queries, their shapes and the database time."""
+
+    def __init__(self, repeat_threshold=QUERY_REPEAT_THRESHOLD):
+        self.repeat_threshold = repeat_threshold
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        # shape -> origin, taken when the shape reaches the threshold
+        self.origins = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += perf_counter() - started
+            self.count += 1
+            shape = get_query_shape(sql)
+            self.shapes[shape] += 1
+            if self.shapes[shape] == self.repeat_threshold:
+                self.origins[shape] = find_origin()
+
+    @contextmanager
+    def record(self, using=connection):
+        with using.execute_wrapper(self):
+            yield self
+
+    def get_repeated(self):
+        """Query shapes executed at least repeat_threshold times.
+
+        Returns:
+            list: dicts with "shape", "count" and "origin", most frequent first
+        """
+        return [
+            {"shape": shape, "count": count, "origin": self.origins.get(shape)}
+            for shape, count in self.shapes.most_common()
+            if count >= self.repeat_threshold
+        ]
+
+    def get_report(self):
+        return {
+            "queries": self.count,
+            "db_ms": round(self.duration * 1000, 2),
+            "repeated": self.get_repeated(),
+        }
+
+
+def get_query_budget(resolver_match, method):
+    """Get the query budget of the route of a request.
+
+    Args:
+        resolver_match (ResolverMatch): resolved route, may be None
+        method (str): HTTP method
+
+    Returns:
+        int or None
+    """
+    if resolver_match is None:
+        return DEFAULT_QUERY_BUDGET
+    if resolver_match.view_name in QUERY_BUDGETS:
+        return QUERY_BUDGETS[resolver_match.view_name]
+    view = getattr(resolver_match.func, "cls", resolver_match.func)
+    budget = getattr(view, "query_budget", None)
+    if isinstance(budget, dict):
+        # view sets map the HTTP methods to their actions
+        actions = getattr(resolver_match.func, "actions", None) or {}
+        budget = budget.get(actions.get(method.lower()))
+    return DEFAULT_QUERY_BUDGET if budget is None else budget
+
+
+def check_query_budget(route, recorder, budget, raise_exception=QUERY_BUDGET_RAISE):
+    """Warn about repeated query shapes and an exceeded budget.
+
+    Args:
+        route (str): name of the route or block for the messages
+        recorder (QueryRecorder): recorded queries
+        budget (int): allowed number of queries, None for no limit
+        raise_exception (bool): raise QueryBudgetExceeded instead of warning
+
+    Raises:
+        QueryBudgetExceeded: budget exceeded and raise_exception is set
+    """
+    report = dict(recorder.get_report(), route=route, budget=budget)
+    for repeated in report["repeated"]:
+        logger.warning(
+            "%s: query repeated %d times from %s: %s",
+            route,
+            repeated["count"],
+            repeated["origin"],
+            repeated["shape"],
+            extra={"query_budget": report},
+        )
+    if budget is None or recorder.count <= budget:
+        return
+    message = "{}: {} queries, budget {}, {} ms in the database".format(
+        route, recorder.count, budget, report["db_ms"]
+    )
+    if raise_exception:
+        details = "".join(
+            "\n  {count}x from {origin}: {shape}".format(**repeated)
+            for repeated in report["repeated"]
+        )
+        raise QueryBudgetExceeded(message + details)
+    logger.warning(message, extra={"query_budget": report})
+
+
+@contextmanager
+def assert_max_queries(budget, route="block", repeat_threshold=QUERY_REPEAT_THRESHOLD):
+    """Fail a test if a block executes more queries than its budget.
+
+    Example:
+        with assert_max_queries(8):
+            client.get("/api/v4/articles/", HTTP_X_DEVICE_ID=device_id)
+
+    Args:
+        budget (int): allowed number of queries
+        route (str): name of the block in the message
+        repeat_threshold (int): repetitions of a query shape listed in the message
+
+    Raises:
+        QueryBudgetExceeded: more queries than budget
+    """
+    recorder = QueryRecorder(repeat_threshold)
+    with recorder.record():
+        yield recorder
+    check_query_budget(route, recorder, budget, raise_exception=True)
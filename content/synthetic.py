@@ -0,0 +1,355 @@
+from datetime import timedelta
+from logging import getLogger
+from random import Random
+
+from django.db import transaction
+from django.utils.timezone import now
+
+from .choices import ORGANIZATION_TYPE_CHOICES
+from .hot_articles import refresh_hot_articles
+from .models import (
+    AppUser,
+    Area,
+    Article,
+    Category,
+    Event_Occurrence,
+    EventV4,
+    Organization,
+    Source,
+    Tag,
+)
+from .taxonomy import TAXONOMY_VERSION
+from .versions import bump_version
+
+logger = getLogger(__name__)
+
+# Synthetic content for load tests and benchmarks. Every generated row is
+# marked with SYNTHETIC_PREFIX, so it can be told apart from real content
+# and removed again. The same seed always gives the same content.
+SYNTHETIC_PREFIX = "synthetic"
+BATCH_SIZE = 1000
+
+DEFAULT_VOLUMES = {
+    "areas": 5,
+    "organizations": 50,
+    "sources_per_organization": 2,
+    "categories": 6,
+    "tags": 60,
+    "articles": 20000,
+    "events": 5000,
+    "occurrences_per_event": 3,
+    "appusers": 1000,
+    "tags_per_item": 3,
+    "bookmarks_per_appuser": 10,
+}
+# a share of the content is unpublished or hidden like in production
+UNPUBLISHED_SHARE = 0.1
+INACTIVE_SOURCE_SHARE = 0.05
+# a share of the app users deselects some tags and organizations
+CONFIGURED_APPUSER_SHARE = 0.3
+
+WORDS = (
+    "stadt quartier verein kultur konzert markt sport schule politik umwelt "
+    "fahrrad park kino theater bibliothek festival nachbarschaft hafen bahn "
+    "garten ausstellung lesung workshop demo rat wahl bau wetter musik kinder"
+).split()
+
+
+def get_device_id(number):
+    return "{}-device-{}".format(SYNTHETIC_PREFIX, number)
+
+
+def _text(random, words):
+    return " ".join(random.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def _name(kind, number):
+    return "{} {} {}".format(SYNTHETIC_PREFIX, kind, number)
+
+
+def _bulk_create(model, objects):
+    return model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+
+
+def _bulk_link(through, rows):
+    through.objects.bulk_create(
+        [through(**row) for row in rows], batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def delete_synthetic_content():
+    """Delete all synthetic content and app users.
+
+    Returns:
+        int: number of deleted rows, including the cascaded ones
+    """
+    deleted = 0
+    for queryset in (
+        AppUser.objects.filter(device_id__startswith=SYNTHETIC_PREFIX),
+        # sources, articles and events cascade
+        Organization.objects.filter(name__startswith=SYNTHETIC_PREFIX),
+        # tags cascade
+        Category.objects.filter(name__startswith=SYNTHETIC_PREFIX),
+        Area.objects.filter(name__startswith=SYNTHETIC_PREFIX),
+    ):
+        deleted += queryset.delete()[0]
+    return deleted
+
+
+def generate_synthetic_content(volumes=None, seed=0, progress=None):
+    """Generate synthetic areas, organizations, sources, tags, content and app users.
+
+    Rows are created in bulk, so the copies content.visibility keeps are
+    filled in here and the versions are bumped once at the end.
+
+    Args:
+        volumes (dict): overrides of DEFAULT_VOLUMES
+        seed (int): seed of the random content
+        progress (callable): called with the name and number of generated rows
+
+    Returns:
+        dict: name -> number of generated rows
+    """
+    volumes = dict(DEFAULT_VOLUMES, **(volumes or {}))
+    random = Random(seed)
+    counts = {}
+
+    def done(name, count):
+        counts[name] = count
+        if progress is not None:
+            progress(name, count)
+
+    with transaction.atomic():
+        areas = _bulk_create(
+            Area,
+            [
+                Area(
+                    name=_name("area", number),
+                    latitude=53 + random.random(),
+                    longitude=8 + random.random(),
+                    zip="{:05d}".format(28000 + number),
+                )
+                for number in range(volumes["areas"])
+            ],
+        )
+        done("areas", len(areas))
+
+        categories = _bulk_create(
+            Category,
+            [
+                Category(name=_name("category", number), title=_text(random, 2), rank=number)
+                for number in range(volumes["categories"])
+            ],
+        )
+        tags = _bulk_create(
+            Tag,
+            [
+                Tag(
+                    name="{} {}".format(SYNTHETIC_PREFIX, number),
+                    color="#{:06x}".format(random.randrange(0x1000000)),
+                    category=categories[number % len(categories)],
+                )
+                for number in range(volumes["tags"])
+            ],
+        )
+        done("tags", len(tags))
+
+        organization_types = [choice for choice, _ in ORGANIZATION_TYPE_CHOICES]
+        organizations = _bulk_create(
+            Organization,
+            [
+                Organization(
+                    name=_name("organization", number),
+                    description=_text(random, 20),
+                    type=random.choice(organization_types),
+                    homepage="https://example.org/{}".format(number),
+                )
+                for number in range(volumes["organizations"])
+            ],
+        )
+        _bulk_link(
+            Organization.area.through,
+            [
+                {"organization_id": organization.id, "area_id": random.choice(areas).id}
+                for organization in organizations
+            ],
+        )
+        done("organizations", len(organizations))
+
+        sources = _bulk_create(
+            Source,
+            [
+                Source(
+                    name=_name("source", number),
+                    type="local",
+                    active=random.random() >= INACTIVE_SOURCE_SHARE,
+                    organization=organization,
+                    default_category=random.choice(categories),
+                )
+                for organization in organizations
+                for number in range(volumes["sources_per_organization"])
+            ],
+        )
+        done("sources", len(sources))
+
+        articles = _generate_articles(random, volumes, sources, areas, tags)
+        done("articles", len(articles))
+        events, occurrences = _generate_events(random, volumes, sources, areas, tags)
+        done("events", len(events))
+        done("occurrences", occurrences)
+        appusers = _generate_appusers(random, volumes, areas, tags, organizations, articles, events)
+        done("appusers", len(appusers))
+
+    bump_version(TAXONOMY_VERSION, "fragments", "articles", "events", "appuser_summaries")
+    refresh_hot_articles([area.id for area in areas])
+    logger.info("generated synthetic content %s", counts)
+    return counts
+
+
+def _pick_links(random, objects, count):
+    return random.sample(objects, min(count, len(objects)))
+
+
+def _generate_articles(random, volumes, sources, areas, tags):
+    current = now()
+    articles = _bulk_create(
+        Article,
+        [
+            Article(
+                title=_text(random, 8),
+                abstract=_text(random, 40),
+                content=_text(random, 300),
+                date=current - timedelta(minutes=random.randrange(90 * 24 * 60)),
+                link="https://example.org/{}/article/{}".format(SYNTHETIC_PREFIX, number),
+                foreign_id="{}-article-{}".format(SYNTHETIC_PREFIX, number),
+                source=source,
+                published=random.random() >= UNPUBLISHED_SHARE,
+                reviewed=True,
+                request_count=random.randrange(500),
+                visible=source.active,
+                organization_type=source.organization.type,
+            )
+            for number, source in (
+                (number, random.choice(sources)) for number in range(volumes["articles"])
+            )
+        ],
+    )
+    _bulk_link(
+        Article.tags.through,
+        [
+            {"article_id": article.id, "tag_id": tag.id}
+            for article in articles
+            for tag in _pick_links(random, tags, volumes["tags_per_item"])
+        ],
+    )
+    article_areas = [(article, random.choice(areas)) for article in articles]
+    _bulk_link(
+        Article.area.through,
+        [{"article_id": article.id, "area_id": area.id} for article, area in article_areas],
+    )
+    # one hot article per area
+    hot_article_ids = {area.id: article.id for article, area in article_areas if article.published}
+    Article.objects.filter(id__in=hot_article_ids.values()).update(is_hot=True)
+    return articles
+
+
+def _generate_events(random, volumes, sources, areas, tags):
+    current = now()
+    events = _bulk_create(
+        EventV4,
+        [
+            EventV4(
+                title=_text(random, 6),
+                content=_text(random, 200),
+                start_date=current + timedelta(hours=random.randrange(60 * 24)),
+                link="https://example.org/{}/event/{}".format(SYNTHETIC_PREFIX, number),
+                foreign_id="{}-event-{}".format(SYNTHETIC_PREFIX, number),
+                source=source,
+                street=_text(random, 2),
+                town=_text(random, 1),
+                published=random.random() >= UNPUBLISHED_SHARE,
+                reviewed=True,
+                visible=source.active,
+                organization_type=source.organization.type,
+            )
+            for number, source in (
+                (number, random.choice(sources)) for number in range(volumes["events"])
+            )
+        ],
+    )
+    occurrences = _bulk_create(
+        Event_Occurrence,
+        [
+            Event_Occurrence(
+                event=event,
+                start_datetime=event.start_date + timedelta(days=7 * number),
+                end_datetime=event.start_date + timedelta(days=7 * number, hours=2),
+            )
+            for event in events
+            for number in range(volumes["occurrences_per_event"])
+        ],
+    )
+    _bulk_link(
+        EventV4.tags.through,
+        [
+            {"eventv4_id": event.id, "tag_id": tag.id}
+            for event in events
+            for tag in _pick_links(random, tags, volumes["tags_per_item"])
+        ],
+    )
+    _bulk_link(
+        EventV4.area.through,
+        [{"eventv4_id": event.id, "area_id": random.choice(areas).id} for event in events],
+    )
+    return events, len(occurrences)
+
+
+def _generate_appusers(random, volumes, areas, tags, organizations, articles, events):
+    # new app users have sparse preferences: everything is selected by default
+    appusers = _bulk_create(
+        AppUser,
+        [
+            AppUser(
+                device_id=get_device_id(number),
+                sparse_preferences=True,
+                area=random.choice(areas),
+            )
+            for number in range(volumes["appusers"])
+        ],
+    )
+    configured = [
+        appuser for appuser in appusers if random.random() < CONFIGURED_APPUSER_SHARE
+    ]
+    _bulk_link(
+        AppUser.deselected_tags.through,
+        [
+            {"appuser_id": appuser.id, "tag_id": tag.id}
+            for appuser in configured
+            for tag in _pick_links(random, tags, len(tags) // 10)
+        ],
+    )
+    _bulk_link(
+        AppUser.deselected_organization.through,
+        [
+            {"appuser_id": appuser.id, "organization_id": organization.id}
+            for appuser in configured
+            for organization in _pick_links(random, organizations, len(organizations) // 10)
+        ],
+    )
+    _bulk_link(
+        AppUser.bookmarked_articles.through,
+        [
+            {"appuser_id": appuser.id, "article_id": article.id}
+            for appuser in appusers
+            for article in _pick_links(random, articles, volumes["bookmarks_per_appuser"])
+        ],
+    )
+    _bulk_link(
+        AppUser.bookmarked_events_v4.through,
+        [
+            {"appuser_id": appuser.id, "eventv4_id": event.id}
+            for appuser in appusers
+            for event in _pick_links(random, events, volumes["bookmarks_per_appuser"] // 2)
+        ],
+    )
+    return appusers
@@ -0,0 +1,69 @@
+from logging import getLogger
+
+from celery import shared_task
+from django.apps import apps
+
+from .images import create_renditions, warm_renditions
+from .mail import send_mail_now
+from .organization_rollout import add_organization_to_all_appusers
+
+logger = getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def create_image_renditions(model_label, pk, original_name):
+    """Generate the feed and detail renditions of an uploaded picture.
+
+    Args:
+        model_label (str): e.g. "content.Article"
+        pk (int): primary key of the instance
+        original_name (str): storage name of the original
+    """
+    create_renditions(model_label, pk, original_name)
+
+
+@shared_task(ignore_result=True)
+def warm_image_renditions(model_label, pk):
+    """Create the feed and detail thumbnails of a saved instance.
+
+    Args:
+        model_label (str): e.g. "content.Article"
+        pk (int): primary key of the instance
+    """
+    instance = apps.get_model(model_label).objects.filter(pk=pk).first()
+    if instance is None:
+        return
+    created, failed = warm_renditions(model_label, instance)
+    if failed:
+        logger.error("could not warm %s of %s %s", failed, model_label, pk)
+
+
+@shared_task(
+    ignore_result=True,
+    autoretry_for=(Exception,),
+    retry_backoff=30,
+    retry_backoff_max=60 * 60,
+    max_retries=8,
+)
+def send_queued_mail(subject, message, recipients, from_email=None, html=False, account="mail_sending"):
+    """Send a mail queued with content.mail.queue_mail, retried with backoff.
+
+    Args:
+        subject (str): subject
+        message (str): body
+        recipients (list): receiver addresses
+        from_email (str): sender, DEFAULT_FROM_EMAIL of the account if empty
+        html (bool): whether the body is html
+        account (str): one of content.mail.MAIL_ACCOUNTS
+    """
+    send_mail_now(subject, message, recipients, from_email, html, account)
+
+
+@shared_task(ignore_result=True)
+def roll_out_organization(organization_id):
+    """Add a new organization to the selection of all AppUsers.
+
+    Args:
+        organization_id (int): id of the organization
+    """
+    add_organization_to_all_appusers(organization_id)
@@ -0,0 +1,99 @@
+import json
+from collections import OrderedDict, namedtuple
+from logging import getLogger
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.signals import post_delete, post_save
+from django.utils.translation import get_language
+
+from .metrics import count_cache_lookup
+from .models import App_urls, Area, Category, Tag
+from .versions import bump_version, get_version
+
+logger = getLogger(__name__)
+
+# tags, categories, areas and app urls share one version
+TAXONOMY_VERSION = "taxonomy"
+TAXONOMY_MODELS = (App_urls, Area, Category, Tag)
+
+# Rendered taxonomy payloads are keyed by the taxonomy version, a change
+# therefore never needs to reach every process: entries of older versions
+# are simply not asked for anymore and drop out of the LRU / expire.
+TAXONOMY_CACHE_KEY = "taxonomy:{}:{}:{}"
+TAXONOMY_CACHE_TIMEOUT = 60 * 60 * 24
+TAXONOMY_LRU_SIZE = getattr(settings, "TAXONOMY_LRU_SIZE", 64)
+
+RenderedTaxonomy = namedtuple("RenderedTaxonomy", ["data", "content"])
+
+_rendered = OrderedDict()
+_rendered_lock = Lock()
+
+
+def get_taxonomy_version():
+    """Get the current taxonomy version.
+
+    Returns:
+        int: timestamp of the last change in milliseconds
+    """
+    return get_version(TAXONOMY_VERSION)
+
+
+def render_json(data):
+    # same output as the compact DRF JSONRenderer
+    return json.dumps(
+        data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def get_rendered_taxonomy(name, build):
+    """Get a taxonomy payload from the process LRU, the cache or build it.
+
+    Args:
+        name (str): name of the payload, e.g. "article_tags"
+        build (callable): returns the json serializable payload
+
+    Returns:
+        RenderedTaxonomy: payload and its JSON bytes
+    """
+    key = (name, get_language(), get_taxonomy_version())
+    with _rendered_lock:
+        rendered = _rendered.get(key)
+        if rendered is not None:
+            _rendered.move_to_end(key)
+            count_cache_lookup("taxonomy", True)
+            return rendered
+
+    cache_key = TAXONOMY_CACHE_KEY.format(*key)
+    content = cache.get(cache_key)
+    count_cache_lookup("taxonomy", content is not None)
+    if content is None:
+        content = render_json(build())
+        cache.set(cache_key, content, TAXONOMY_CACHE_TIMEOUT)
+    rendered = RenderedTaxonomy(json.loads(content.decode("utf-8")), content)
+
+    with _rendered_lock:
+        _rendered[key] = rendered
+        _rendered.move_to_end(key)
+        while len(_rendered) > TAXONOMY_LRU_SIZE:
+            _rendered.popitem(last=False)
+    return rendered
+
+
+def bump_taxonomy_version_on_change(sender, **kwargs):
+    bump_version(TAXONOMY_VERSION)
+
+
+for model in TAXONOMY_MODELS:
+    post_save.connect(
+        bump_taxonomy_version_on_change,
+        sender=model,
+        dispatch_uid="bump_taxonomy_version_save_{}".format(model.__name__),
+    )
+    post_delete.connect(
+        bump_taxonomy_version_on_change,
+        sender=model,
+        dispatch_uid="bump_taxonomy_version_delete_{}".format(model.__name__),
+    )
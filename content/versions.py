@@ -0,0 +1,153 @@
+from datetime import datetime, timezone
+from logging import getLogger
+from time import time
+
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from .models import (
+    Article,
+    ArticleDraft,
+    Event_Occurrence,
+    EventDraftV4,
+    EventV4,
+    Organization,
+    Source,
+    Tag,
+)
+
+logger = getLogger(__name__)
+
+# Versions are millisecond timestamps of the last change, so they double as
+# Last-Modified. A version missing from the cache starts at the current
+# time, a flushed cache therefore never hands out a version already seen.
+VERSION_CACHE_KEY = "version:{}"
+
+
+def get_version(name):
+    """Get the current version of a named piece of content.
+
+    Args:
+        name (str): e.g. "articles", "article:42" or "taxonomy"
+
+    Returns:
+        int: timestamp of the last change in milliseconds
+    """
+    key = VERSION_CACHE_KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def get_versions(names):
+    """Get the current versions of several named pieces of content at once.
+
+    Args:
+        names (iterable): names of the versions
+
+    Returns:
+        dict: name -> timestamp of the last change in milliseconds
+    """
+    keys = {VERSION_CACHE_KEY.format(name): name for name in names}
+    found = cache.get_many(list(keys))
+    versions = {keys[key]: version for key, version in found.items()}
+    for key, name in keys.items():
+        if key not in found:
+            versions[name] = get_version(name)
+    return versions
+
+
+def bump_version(*names):
+    """Mark named pieces of content as changed.
+
+    Args:
+        *names (str): names of the versions to bump
+    """
+    now = int(time() * 1000)
+    for name in names:
+        key = VERSION_CACHE_KEY.format(name)
+        cache.set(key, max(now, (cache.get(key) or 0) + 1), None)
+
+
+def version_datetime(version):
+    """Convert a version into the datetime of the change.
+
+    Args:
+        version (int): version from get_version
+
+    Returns:
+        datetime
+    """
+    return datetime.fromtimestamp(version / 1000, tz=timezone.utc)
+
+
+def is_counter_update(kwargs):
+    # request_count is bumped on every read and is left out of the versions
+    update_fields = kwargs.get("update_fields")
+    return update_fields is not None and set(update_fields) == {"request_count"}
+
+
+def bump_article_version(sender, instance, **kwargs):
+    if not is_counter_update(kwargs):
+        bump_version("articles", "article:{}".format(instance.pk))
+
+
+def bump_article_version_on_m2m(sender, instance, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear") and isinstance(instance, Article):
+        bump_version("articles", "article:{}".format(instance.pk))
+
+
+def bump_event_version(sender, instance, **kwargs):
+    if not is_counter_update(kwargs):
+        bump_version("events", "event:{}".format(instance.pk))
+
+
+def bump_event_version_on_occurrence(sender, instance, **kwargs):
+    bump_version("events", "event:{}".format(instance.event_id))
+
+
+# bookkeeping fields of the importer, the serialized content doesn't show them
+UNSERIALIZED_FIELDS = {"import_date", "import_errors"}
+
+
+def bump_fragments_version(sender, **kwargs):
+    # serialized content shows source, organization and tag details
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and set(update_fields) <= UNSERIALIZED_FIELDS:
+        return
+    bump_version("fragments")
+
+
+for signal in (post_save, post_delete):
+    # proxies send their own signals
+    for model in (Article, ArticleDraft):
+        signal.connect(
+            bump_article_version,
+            sender=model,
+            dispatch_uid="bump_article_version_{}".format(model.__name__),
+        )
+    for model in (EventV4, EventDraftV4):
+        signal.connect(
+            bump_event_version,
+            sender=model,
+            dispatch_uid="bump_event_version_{}".format(model.__name__),
+        )
+    signal.connect(
+        bump_event_version_on_occurrence,
+        sender=Event_Occurrence,
+        dispatch_uid="bump_event_version_on_occurrence",
+    )
+    for model in (Organization, Source, Tag):
+        signal.connect(
+            bump_fragments_version,
+            sender=model,
+            dispatch_uid="bump_fragments_version_{}".format(model.__name__),
+        )
+for through in (Article.tags.through, Article.area.through):
+    m2m_changed.connect(
+        bump_article_version_on_m2m,
+        sender=through,
+        dispatch_uid="bump_article_version_{}".format(through.__name__),
+    )
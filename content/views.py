@@ -1,3 +1,36 @@
-from django.shortcuts import render
+from hmac import compare_digest
 
-# Create your views here.
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+
+from .metrics import METRICS_ALLOWED_IPS, METRICS_TOKEN, REGISTRY
+
+PROXY_HEADERS = ("HTTP_X_FORWARDED_FOR", "HTTP_X_REAL_IP", "HTTP_FORWARDED")
+
+
+def is_metrics_request_allowed(request):
+    """Check the scraper token or, for direct connections, the IP allowlist.
+
+    Args:
+        request (HttpRequest): request
+
+    Returns:
+        bool
+    """
+    if METRICS_TOKEN:
+        authorization = request.META.get("HTTP_AUTHORIZATION", "")
+        if compare_digest(authorization.encode(), "Bearer {}".format(METRICS_TOKEN).encode()):
+            return True
+    if any(header in request.META for header in PROXY_HEADERS):
+        return False
+    return request.META.get("REMOTE_ADDR") in METRICS_ALLOWED_IPS
+
+
+@require_GET
+def metrics_view(request):
+    """Metrics of this process in the Prometheus text format."""
+    if not METRICS_TOKEN and not METRICS_ALLOWED_IPS:
+        raise Http404()
+    if not is_metrics_request_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
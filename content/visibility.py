@@ -0,0 +1,140 @@
+from logging import getLogger
+
+from django.db.models import Q
+from django.db.models.signals import post_save, pre_save
+
+from .hot_articles import refresh_hot_articles
+from .models import Article, ArticleDraft, EventDraftV4, EventV4, Organization, Source
+from .versions import bump_version
+
+logger = getLogger(__name__)
+
+# Article and EventV4 carry copies of their source's visibility and
+# organization type, so the feeds filter on their own indexed columns
+# instead of joining source and organization. pre_save fills them in per
+# row, Source and Organization changes are copied with one UPDATE per model.
+DENORMALIZED_MODELS = (Article, EventV4)
+# proxies send their own signals
+DENORMALIZED_SENDERS = (Article, ArticleDraft, EventV4, EventDraftV4)
+VERSION_NAMES = {Article: "articles", EventV4: "events"}
+
+
+def is_denormalized(model):
+    return issubclass(model, DENORMALIZED_MODELS)
+
+
+def get_source_visibility(source):
+    """Get the visibility and organization type content of a source inherits.
+
+    Content is hidden once its source or the source's organization is
+    inactive, like SourceActiveFilter did on the joined tables.
+
+    Args:
+        source (Source): source with its organization
+
+    Returns:
+        tuple: (visible, organization type or None)
+    """
+    organization = source.organization
+    if organization is None:
+        return source.active, None
+    return source.active and organization.active, organization.type
+
+
+def update_source_content(source):
+    """Copy the visibility of a source to all of its articles and events.
+
+    Args:
+        source (Source): source with its organization
+
+    Returns:
+        int: number of updated rows
+    """
+    visible, organization_type = get_source_visibility(source)
+    updated = 0
+    for model in DENORMALIZED_MODELS:
+        model_updated = (
+            model.objects.filter(source=source)
+            .exclude(Q(visible=visible) & Q(organization_type=organization_type))
+            .update(visible=visible, organization_type=organization_type)
+        )
+        if model_updated:
+            bump_version(VERSION_NAMES[model])
+            if model is Article:
+                refresh_hot_articles()
+        updated += model_updated
+    return updated
+
+
+def update_all_content():
+    """Copy the visibility of every source, e.g. after adding the columns.
+
+    Returns:
+        int: number of updated rows
+    """
+    updated = 0
+    for source in Source.objects.select_related("organization").order_by("id"):
+        updated += update_source_content(source)
+    logger.info("updated the visibility of %d articles and events", updated)
+    return updated
+
+
+def set_visibility_on_save(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or (update_fields is not None and "source" not in update_fields):
+        return
+    source = Source.objects.select_related("organization").filter(id=instance.source_id).first()
+    if source is not None:
+        instance.visible, instance.organization_type = get_source_visibility(source)
+
+
+def save_visibility_on_update(sender, instance, update_fields=None, raw=False, **kwargs):
+    # save(update_fields=[..., "source"]) only writes the listed columns, so
+    # the copies set in pre_save are written here
+    if raw or update_fields is None or "source" not in update_fields:
+        return
+    if {"visible", "organization_type"} <= set(update_fields):
+        return
+    sender._base_manager.filter(pk=instance.pk).update(
+        visible=instance.visible, organization_type=instance.organization_type
+    )
+
+
+def changes_visibility(update_fields, fields):
+    return update_fields is None or not set(fields).isdisjoint(update_fields)
+
+
+def update_content_on_source_save(sender, instance, update_fields=None, raw=False, **kwargs):
+    if not raw and changes_visibility(update_fields, ("active", "organization")):
+        update_source_content(instance)
+
+
+def update_content_on_organization_save(
+    sender, instance, update_fields=None, raw=False, **kwargs
+):
+    if raw or not changes_visibility(update_fields, ("active", "type")):
+        return
+    # organizations have few sources
+    for source in instance.source_set.all():
+        source.organization = instance
+        update_source_content(source)
+
+
+for model in DENORMALIZED_SENDERS:
+    pre_save.connect(
+        set_visibility_on_save,
+        sender=model,
+        dispatch_uid="set_visibility_{}".format(model.__name__),
+    )
+    post_save.connect(
+        save_visibility_on_update,
+        sender=model,
+        dispatch_uid="save_visibility_{}".format(model.__name__),
+    )
+post_save.connect(
+    update_content_on_source_save, sender=Source, dispatch_uid="update_content_on_source_save"
+)
+post_save.connect(
+    update_content_on_organization_save,
+    sender=Organization,
+    dispatch_uid="update_content_on_organization_save",
+)
@@ -3,6 +3,7 @@ from transformers import AutoTokenizer
 import onnxruntime as ort
 from bs4 import BeautifulSoup, MarkupResemblesLocatorWarning
 import warnings
+from content.metrics import TAGGING_INFERENCE_SECONDS
 warnings.filterwarnings("ignore", category=MarkupResemblesLocatorWarning, module='bs4')
 
 class MlTagging:
@@ -52,7 +53,7 @@ class MlTagging:
         "Stau",
     ]
 
-    def predict_categories(self, model, categories, num_categories, input_ids, attention_mask):
+    def predict_categories(self, model, categories, num_categories, input_ids, attention_mask, model_name="model"):
         """
         This method takes care of the prediction of the the tags
         :param model: the ml model
@@ -60,15 +61,17 @@ class MlTagging:
         :param num_categories: the amount of categories that will be predicted
         :param input ids: ???
         :param attention_mask: ==
+        :param model_name: name of the model in the metrics
         return: predicted tags
         """
-        outputs = model.run(
-            None,
-            {
-                "input_ids": input_ids.astype(np.int32),
-                "attention_mask": attention_mask.astype(np.int32),
-            },
-        )
+        with TAGGING_INFERENCE_SECONDS.time(model=model_name):
+            outputs = model.run(
+                None,
+                {
+                    "input_ids": input_ids.astype(np.int32),
+                    "attention_mask": attention_mask.astype(np.int32),
+                },
+            )
         outputs = np.asarray(outputs[0][0])
 
         idxs = np.flip(np.argsort(outputs))[:num_categories]
@@ -105,9 +108,9 @@ class MlTagging:
 
         attention_mask = np.expand_dims(tokenized_inputs["attention_mask"][0], axis=0)
 
-        first = self.predict_categories(self.model_categories_first_ressort,self.categories_first_ressort,2,input_ids, attention_mask)
+        first = self.predict_categories(self.model_categories_first_ressort,self.categories_first_ressort,2,input_ids, attention_mask, "first_ressort")
 
-        second = self.predict_categories(self.model_categories_second_third_ressort,self.categories_second_third_ressort,1,input_ids,attention_mask)
+        second = self.predict_categories(self.model_categories_second_third_ressort,self.categories_second_third_ressort,1,input_ids,attention_mask, "second_third_ressort")
         
         # Corona aus der Liste löschen
 
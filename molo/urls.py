@@ -6,6 +6,7 @@ from django.conf.urls.static import static
 from django.views.i18n import JavaScriptCatalog
 
 from content.admin import moloadmin
+from content.views import metrics_view
 
 urlpatterns = [
     re_path(r"^jet/", include("jet.urls", "jet")),
@@ -20,6 +21,8 @@ urlpatterns += [
     path("api/v4/", include("api.urls_v4", namespace="v4")),
 ]
 
+urlpatterns += [path("metrics", metrics_view, name="metrics")]
+
 urlpatterns += [path("", include("loginas.urls"))]
 
 # django-recurrence